@@ -0,0 +1,202 @@
+import logging
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+
+from config import (HORARIO_PREGAO, ABERTURA_QUARTA_CINZAS, VALIDADE_PREGAO, VALIDADE_CONFORME_PREGAO,
+                    INTERVALO_AGENDADOR, LOTE_AGENDADOR)
+
+# Horário de Brasília (sem horário de verão desde 2019)
+FUSO_B3 = timezone(timedelta(hours=-3))
+
+# 24 e 31/12 não são feriados nacionais, mas a B3 não abre
+FERIADOS_FIXOS = [(1, 1), (4, 21), (5, 1), (9, 7), (10, 12), (11, 2), (11, 15),
+                  (12, 24), (12, 25), (12, 31)]
+
+
+def pascoa(ano):
+    # Algoritmo de Meeus/Jones/Butcher (calendário gregoriano)
+    a = ano % 19
+    b, c = divmod(ano, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(ano, mes, dia + 1)
+
+
+def _hora(texto):
+    horas, minutos = texto.split(":")
+    return time(int(horas), int(minutos))
+
+
+def para_horario_b3(instante):
+    # Datetime sem fuso é tratado como horário local da máquina (o de datetime.now())
+    return instante.astimezone(FUSO_B3).replace(tzinfo=None)
+
+
+class CalendarioB3:
+    # Dias e horário de pregão da B3, calculados localmente (sem consulta à rede).
+    # Os instantes devolvidos estão em horário de Brasília, sem fuso.
+    def __init__(self, abertura=HORARIO_PREGAO[0], fechamento=HORARIO_PREGAO[1],
+                 abertura_cinzas=ABERTURA_QUARTA_CINZAS):
+        self.abertura = _hora(abertura)
+        self.fechamento = _hora(fechamento)
+        self.abertura_cinzas = _hora(abertura_cinzas)
+        self._feriados = {}
+
+    def feriados(self, ano):
+        if ano not in self._feriados:
+            p = pascoa(ano)
+            dias = {date(ano, mes, dia) for mes, dia in FERIADOS_FIXOS}
+            dias |= {p - timedelta(days=48), p - timedelta(days=47),  # Carnaval
+                     p - timedelta(days=2),                            # Sexta-feira Santa
+                     p + timedelta(days=60)}                           # Corpus Christi
+            if ano >= 2024:
+                dias.add(date(ano, 11, 20))  # Consciência Negra, feriado nacional desde 2024
+            self._feriados[ano] = frozenset(dias)
+        return self._feriados[ano]
+
+    def dia_de_pregao(self, dia):
+        return dia.weekday() < 5 and dia not in self.feriados(dia.year)
+
+    def horario(self, dia):
+        # Na Quarta-feira de Cinzas o pregão só abre à tarde
+        cinzas = pascoa(dia.year) - timedelta(days=46)
+        abertura = self.abertura_cinzas if dia == cinzas else self.abertura
+        return datetime.combine(dia, abertura), datetime.combine(dia, self.fechamento)
+
+    def aberto(self, instante):
+        instante = para_horario_b3(instante)
+        if not self.dia_de_pregao(instante.date()):
+            return False
+        abertura, fechamento = self.horario(instante.date())
+        return abertura <= instante < fechamento
+
+    def proxima_abertura(self, instante):
+        # Primeira abertura depois de "instante"
+        instante = para_horario_b3(instante)
+        dia = instante.date()
+        while True:
+            if self.dia_de_pregao(dia):
+                abertura = self.horario(dia)[0]
+                if abertura > instante:
+                    return abertura
+            dia += timedelta(days=1)
+
+    def ultimo_fechamento(self, instante):
+        # Último fechamento até "instante" (inclusive)
+        instante = para_horario_b3(instante)
+        dia = instante.date()
+        while True:
+            if self.dia_de_pregao(dia):
+                fechamento = self.horario(dia)[1]
+                if fechamento <= instante:
+                    return fechamento
+            dia -= timedelta(days=1)
+
+
+class PoliticaValidadePregao:
+    # Validade das cotações do CotacaoCache conforme o pregão: durante o pregão,
+    # a validade curta de VALIDADE_PREGAO; com o mercado fechado, a cotação
+    # buscada depois do último fechamento vale até a próxima abertura.
+    # Classes negociadas fora da B3 (câmbio, cripto) ficam com a validade do cache.
+    def __init__(self, calendario=None, validade_pregao=VALIDADE_PREGAO):
+        self.calendario = calendario or CalendarioB3()
+        self.validade_pregao = {k: timedelta(minutes=v) for k, v in validade_pregao.items()}
+        self._situacao = (None, None)
+
+    def situacao(self, agora):
+        # (aberto, último fechamento), guardados por minuto: o cache consulta
+        # a política uma vez por ticker
+        minuto = para_horario_b3(agora).replace(second=0, microsecond=0, tzinfo=FUSO_B3)
+        chave, situacao = self._situacao
+        if chave != minuto:
+            situacao = (self.calendario.aberto(minuto), self.calendario.ultimo_fechamento(minuto))
+            self._situacao = (minuto, situacao)
+        return situacao
+
+    def fresca(self, classe, instante, agora):
+        # None: a política não se aplica à classe
+        validade = self.validade_pregao.get(classe)
+        if validade is None:
+            return None
+        aberto, ultimo_fechamento = self.situacao(agora)
+        if aberto:
+            return agora - instante < validade
+        return para_horario_b3(instante) >= ultimo_fechamento
+
+
+def politica_validade_padrao():
+    return PoliticaValidadePregao() if VALIDADE_CONFORME_PREGAO else None
+
+
+class AgendadorCotacoes:
+    # Atualiza em segundo plano só as cotações vencidas da carteira, das maiores
+    # posições para as menores. Com o mercado fechado e as cotações de fechamento
+    # já no cache, nada vence e nada é buscado até a próxima abertura.
+    ESPERA_MAXIMA = 3600
+
+    def __init__(self, cache, pesos, calendario=None, intervalo=INTERVALO_AGENDADOR, lote=LOTE_AGENDADOR):
+        self.cache = cache
+        # pesos(): {ticker: peso da posição}, lido a cada ciclo
+        self.pesos = pesos
+        self.calendario = calendario or getattr(cache.politica, "calendario", None) or CalendarioB3()
+        self.intervalo = intervalo
+        self.lote = lote
+        self.ciclos = 0
+        self.buscados = 0
+        self._parar = threading.Event()
+        self._thread = None
+
+    def pendentes(self, agora=None):
+        pesos = self.pesos()
+        vencidos = self.cache.vencidos(list(pesos), agora)
+        return sorted(vencidos, key=lambda t: -pesos[t])
+
+    def executar_ciclo(self, agora=None, ao_receber=None):
+        # Devolve os tickers atualizados neste ciclo; ao_receber({ticker: dados})
+        # recebe cada parte das cotações assim que ela chega
+        pendentes = self.pendentes(agora)
+        self.ciclos += 1
+        atualizados = []
+        for i in range(0, len(pendentes), self.lote):
+            if self._parar.is_set():
+                break
+            lote = pendentes[i:i + self.lote]
+            self.cache.obter_cotacoes(lote, ao_receber=ao_receber)
+            atualizados += lote
+        self.buscados += len(atualizados)
+        return atualizados
+
+    def espera(self, agora=None):
+        # Segundos até o próximo ciclo. Com o mercado fechado, até a abertura,
+        # limitado a ESPERA_MAXIMA (ativos fora da B3, relógio da máquina ajustado)
+        agora = agora or datetime.now(FUSO_B3)
+        if self.calendario.aberto(agora):
+            return self.intervalo
+        ate_abertura = (self.calendario.proxima_abertura(agora) - para_horario_b3(agora)).total_seconds()
+        return max(self.intervalo, min(ate_abertura, self.ESPERA_MAXIMA))
+
+    def iniciar(self, ao_atualizar=None, ao_receber=None):
+        # ao_atualizar(tickers) é chamado na thread do agendador após cada ciclo
+        # com buscas; ao_receber, a cada parte das cotações durante o ciclo
+        def laco():
+            while not self._parar.wait(self.espera()):
+                try:
+                    atualizados = self.executar_ciclo(ao_receber=ao_receber)
+                    if atualizados and ao_atualizar is not None:
+                        ao_atualizar(atualizados)
+                except Exception as e:
+                    logging.error(f"Erro no agendador de cotações: {str(e)}", exc_info=True)
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=laco, daemon=True, name="agendador_cotacoes")
+            self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
@@ -0,0 +1,176 @@
+import math
+import threading
+from bisect import bisect_left, insort
+
+import numpy as np
+import pandas as pd
+
+COLUNAS_NUMERICAS = ["Total Investido", "Valor Atual", "Rentabilidade", "Dividendos"]
+
+
+def _vazio(valor):
+    return valor is None or (isinstance(valor, float) and math.isnan(valor))
+
+
+class _Ranking:
+    # Valores em ordem decrescente numa lista ordenada (bisect); empates pela
+    # ordem de entrada na carteira, como um sort_values estável. NaN vai ao fim.
+    def __init__(self):
+        self._itens = []
+        self._vazios = {}
+
+    def inserir(self, chave, valor, ordem):
+        if _vazio(valor):
+            self._vazios[chave] = ordem
+        else:
+            insort(self._itens, (-valor, ordem, chave))
+
+    def remover(self, chave, valor, ordem):
+        if _vazio(valor):
+            self._vazios.pop(chave, None)
+        else:
+            del self._itens[bisect_left(self._itens, (-valor, ordem, chave))]
+
+    def topo(self, k):
+        chaves = [chave for _, _, chave in self._itens[:k]]
+        if len(chaves) < k and self._vazios:
+            chaves += sorted(self._vazios, key=self._vazios.get)[:k - len(chaves)]
+        return chaves
+
+
+class AgregadosCarteira:
+    # Totais, contagens e rankings da "Análise Geral" mantidos incrementalmente.
+    # sincronizar(df) compara a carteira com a última versão vista (vetorizado)
+    # e aplica só as linhas alteradas; as leituras não percorrem a carteira.
+    def __init__(self, k=3):
+        self.k = k
+        self._lock = threading.RLock()
+        self._linhas = {}
+        self._proxima_ordem = 0
+        self._ultima = None
+        self.total_investido = 0.0
+        self.valor_atual = 0.0
+        self._soma_rentabilidade = 0.0
+        self._contagem_rentabilidade = 0
+        self.positivos = 0
+        self.negativos = 0
+        self._top_rentabilidade = _Ranking()
+        self._top_dividendos = _Ranking()
+
+    @property
+    def rentabilidade_media(self):
+        if not self._contagem_rentabilidade:
+            return float("nan")
+        return self._soma_rentabilidade / self._contagem_rentabilidade
+
+    def _aplicar(self, linha, sinal):
+        papel, investido, valor, rentabilidade, dividendos, ordem = linha
+        if not _vazio(investido):
+            self.total_investido += sinal * investido
+        if not _vazio(valor):
+            self.valor_atual += sinal * valor
+        if not _vazio(rentabilidade):
+            self._soma_rentabilidade += sinal * rentabilidade
+            self._contagem_rentabilidade += sinal
+            if rentabilidade > 0:
+                self.positivos += sinal
+            else:
+                self.negativos += sinal
+
+    def atualizar_linha(self, chave, papel, total_investido, valor_atual, rentabilidade, dividendos):
+        with self._lock:
+            anterior = self._linhas.get(chave)
+            if anterior is not None:
+                ordem = anterior[5]
+                self._aplicar(anterior, -1)
+                self._top_rentabilidade.remover(chave, anterior[3], ordem)
+                self._top_dividendos.remover(chave, anterior[4], ordem)
+            else:
+                ordem = self._proxima_ordem
+                self._proxima_ordem += 1
+            linha = (papel, total_investido, valor_atual, rentabilidade, dividendos, ordem)
+            self._linhas[chave] = linha
+            self._aplicar(linha, 1)
+            self._top_rentabilidade.inserir(chave, rentabilidade, ordem)
+            self._top_dividendos.inserir(chave, dividendos, ordem)
+
+    def atualizar_linhas(self, df):
+        # Só as linhas recebidas (ex.: as que ganharam cotação nova), pelo rótulo:
+        # O(k log N) para k linhas, sem comparar o resto da carteira
+        numeros = [pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float) for c in COLUNAS_NUMERICAS]
+        with self._lock:
+            for i, (chave, papel) in enumerate(zip(df.index, df["Papel"])):
+                self.atualizar_linha(chave, papel, *(coluna[i] for coluna in numeros))
+        return len(df)
+
+    def remover(self, chave):
+        with self._lock:
+            anterior = self._linhas.pop(chave, None)
+            if anterior is None:
+                return
+            self._aplicar(anterior, -1)
+            self._top_rentabilidade.remover(chave, anterior[3], anterior[5])
+            self._top_dividendos.remover(chave, anterior[4], anterior[5])
+
+    def sincronizar(self, df):
+        # Devolve quantas linhas foram aplicadas (alteradas, novas ou removidas)
+        atual = pd.DataFrame({"Papel": df["Papel"].to_numpy()}, index=df.index)
+        for coluna in COLUNAS_NUMERICAS:
+            atual[coluna] = pd.to_numeric(df[coluna], errors="coerce").to_numpy(dtype=float)
+
+        with self._lock:
+            anterior = self._ultima
+            if anterior is None:
+                alteradas = atual.index
+                removidas = []
+            else:
+                # Linhas comparadas pelo rótulo: entrar ou sair um ativo não
+                # obriga a reaplicar as demais
+                if anterior.index.equals(atual.index):
+                    comuns, base = atual, anterior
+                    novas = atual.index[:0]
+                    removidas = []
+                else:
+                    presentes = atual.index.isin(anterior.index)
+                    comuns = atual[presentes]
+                    base = anterior.loc[comuns.index]
+                    novas = atual.index[~presentes]
+                    removidas = anterior.index[~anterior.index.isin(atual.index)]
+                numeros_atuais = comuns[COLUNAS_NUMERICAS].to_numpy()
+                numeros_anteriores = base[COLUNAS_NUMERICAS].to_numpy()
+                iguais = (numeros_atuais == numeros_anteriores) | (np.isnan(numeros_atuais) & np.isnan(numeros_anteriores))
+                mudou = ~iguais.all(axis=1) | (comuns["Papel"].to_numpy() != base["Papel"].to_numpy())
+                alteradas = comuns.index[mudou].append(novas)
+
+            for chave in removidas:
+                self.remover(chave)
+            for chave, papel, investido, valor, rentabilidade, dividendos in atual.loc[alteradas].itertuples(name=None):
+                self.atualizar_linha(chave, papel, investido, valor, rentabilidade, dividendos)
+            self._ultima = atual
+            return len(alteradas) + len(removidas)
+
+    def top_rentabilidade(self):
+        with self._lock:
+            return [(self._linhas[c][0], self._linhas[c][3]) for c in self._top_rentabilidade.topo(self.k)]
+
+    def top_dividendos(self):
+        with self._lock:
+            return [(self._linhas[c][0], self._linhas[c][4]) for c in self._top_dividendos.topo(self.k)]
+
+    def texto(self):
+        # Mesmo texto de graficos.calcular_analise, sem reler a carteira
+        with self._lock:
+            top_rent = pd.DataFrame(self.top_rentabilidade(), columns=["Papel", "Rentabilidade"])
+            top_div = pd.DataFrame(self.top_dividendos(), columns=["Papel", "Dividendos"])
+            return f"""📊 ANÁLISE GERAL
+
+💰 Total Investido: R$ {self.total_investido:,.2f}
+📈 Valor Atual: R$ {self.valor_atual:,.2f}
+📊 Rent. Média: {self.rentabilidade_media:.2f}%
+🟢 Positivos: {self.positivos} | 🔴 Negativos: {self.negativos}
+
+🥇 Top Rentabilidade:
+{top_rent.to_string(index=False)}
+
+💵 Top Dividendos:
+{top_div.to_string(index=False)}"""
@@ -0,0 +1,108 @@
+import math
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+import numpy as np
+import pandas as pd
+
+from config import HISTERESE_ALERTA_BAZIN
+
+
+def razoes_bazin(df):
+    # Preço Atual / PT Bazin por linha; NaN sem preço ou sem PT Bazin positivo
+    preco = pd.to_numeric(df["Preço Atual"], errors="coerce").to_numpy(dtype=float)
+    pt_bazin = pd.to_numeric(df["PT Bazin"], errors="coerce").to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(pt_bazin > 0, preco / pt_bazin, np.nan), preco, pt_bazin
+
+
+class MotorAlertasBazin:
+    # Alerta quando o preço cruza para baixo do PT Bazin (razão preço/PT <= 1).
+    # Um ativo já alertado só volta a alertar depois de subir acima de
+    # 1 + histerese: o preço oscilando em volta do teto não repete o alerta.
+    # O estado de alerta é por Papel, então um ativo repetido alerta uma vez.
+    # As razões ficam numa lista ordenada, e só as linhas passadas a
+    # atualizar() são examinadas: o custo acompanha os preços que mudaram.
+    def __init__(self, histerese=HISTERESE_ALERTA_BAZIN):
+        self.histerese = histerese
+        self._lock = threading.Lock()
+        self._razoes = {}
+        self._indice = []
+        self._papeis = {}
+        self._linhas_por_papel = {}
+        self._abaixo = set()
+
+    def _reindexar(self, chave, razao):
+        anterior = self._razoes.pop(chave, None)
+        if anterior is not None:
+            del self._indice[bisect_left(self._indice, (anterior, chave))]
+        if not math.isnan(razao):
+            self._razoes[chave] = razao
+            insort(self._indice, (razao, chave))
+
+    def _associar(self, chave, papel):
+        anterior = self._papeis.get(chave)
+        if anterior == papel:
+            return
+        if anterior is not None:
+            self._desassociar(chave)
+        self._papeis[chave] = papel
+        self._linhas_por_papel[papel] = self._linhas_por_papel.get(papel, 0) + 1
+
+    def _desassociar(self, chave):
+        papel = self._papeis.pop(chave, None)
+        if papel is None:
+            return
+        restantes = self._linhas_por_papel.pop(papel) - 1
+        if restantes:
+            self._linhas_por_papel[papel] = restantes
+        else:
+            self._abaixo.discard(papel)
+
+    def atualizar(self, df):
+        # df: só as linhas alteradas (rótulos do índice como chave). Devolve os
+        # alertas novos, um por Papel: [(papel, preço, pt_bazin)]
+        razoes, precos, pts = razoes_bazin(df)
+        alertas = []
+        with self._lock:
+            for chave, papel, razao, preco, pt in zip(df.index, df["Papel"], razoes, precos, pts):
+                self._associar(chave, papel)
+                self._reindexar(chave, razao)
+                if math.isnan(razao):
+                    continue
+                if razao <= 1.0:
+                    if papel not in self._abaixo:
+                        self._abaixo.add(papel)
+                        alertas.append((papel, preco, pt))
+                elif razao > 1.0 + self.histerese:
+                    self._abaixo.discard(papel)
+        return alertas
+
+    def remover(self, chaves):
+        with self._lock:
+            for chave in chaves:
+                self._reindexar(chave, math.nan)
+                self._desassociar(chave)
+
+    def abaixo_de(self, limite=1.0):
+        # Chaves com razão preço/PT Bazin <= limite, da mais barata para a mais cara
+        with self._lock:
+            fim = bisect_right(self._indice, limite, key=lambda item: item[0])
+            return [chave for _, chave in self._indice[:fim]]
+
+    def papeis_abaixo_de(self, limite=1.0):
+        # [(papel, razão)] abaixo do limite, um por Papel, do mais barato ao mais
+        # caro; percorre só o começo do índice, não a carteira
+        chaves = self.abaixo_de(limite)
+        papeis = {}
+        with self._lock:
+            for chave in chaves:
+                if chave in self._razoes:
+                    papeis.setdefault(self._papeis.get(chave), self._razoes[chave])
+        return list(papeis.items())
+
+
+def texto_alerta(alerta):
+    papel, preco, pt_bazin = alerta
+    return f"{papel} (Atual: R$ {preco:.2f} | Teto Bazin: R$ {pt_bazin:.2f})"
+
@@ -0,0 +1,183 @@
+import os
+import json
+import logging
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+
+# Interface comum dos armazenamentos do cache de cotações.
+# As entradas são (dados, timestamp), com timestamp em datetime.
+class ArmazenamentoCotacoes:
+    def obter(self, ticker):
+        return self.obter_varios([ticker]).get(ticker)
+
+    def obter_varios(self, tickers):
+        raise NotImplementedError
+
+    def salvar(self, entradas):
+        raise NotImplementedError
+
+    def limpar(self):
+        raise NotImplementedError
+
+    def fechar(self):
+        pass
+
+
+class ArmazenamentoMemoria(ArmazenamentoCotacoes):
+    def __init__(self):
+        self._entradas = {}
+
+    def obter_varios(self, tickers):
+        return {t: self._entradas[t] for t in tickers if t in self._entradas}
+
+    def salvar(self, entradas):
+        self._entradas.update(entradas)
+
+    def limpar(self):
+        self._entradas = {}
+
+
+class ArmazenamentoJSON(ArmazenamentoCotacoes):
+    # Formato original: um único arquivo JSON, lido e reescrito por inteiro
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._entradas = None
+        self._lock = threading.Lock()
+
+    def _carregar(self):
+        if self._entradas is not None:
+            return self._entradas
+        self._entradas = {}
+        if not os.path.exists(self.caminho):
+            return self._entradas
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                raw_cache = json.load(f)
+                for k, v in raw_cache.items():
+                    dados = v["dados"]
+                    timestamp = datetime.fromisoformat(v["timestamp"])
+                    self._entradas[k] = (dados, timestamp)
+        except Exception as e:
+            logging.warning(f"Erro ao carregar cache salvo: {str(e)}")
+        return self._entradas
+
+    def obter_varios(self, tickers):
+        with self._lock:
+            entradas = self._carregar()
+            return {t: entradas[t] for t in tickers if t in entradas}
+
+    def salvar(self, entradas):
+        with self._lock:
+            self._carregar().update(entradas)
+            self._escrever()
+
+    def limpar(self):
+        with self._lock:
+            self._entradas = {}
+            self._escrever()
+
+    def _escrever(self):
+        serializavel = {
+            k: {
+                "dados": v[0],
+                "timestamp": v[1].isoformat()
+            } for k, v in self._entradas.items()
+        }
+        # Escreve em arquivo temporário e renomeia: o arquivo nunca fica pela metade
+        diretorio = os.path.dirname(os.path.abspath(self.caminho))
+        fd, temporario = tempfile.mkstemp(dir=diretorio, prefix=".cotacoes_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(serializavel, f, separators=(",", ":"))
+            os.replace(temporario, self.caminho)
+        except BaseException:
+            os.remove(temporario)
+            raise
+
+
+class ArmazenamentoSQLite(ArmazenamentoCotacoes):
+    # Consultas pontuais por ticker: nada é lido na inicialização, e o modo WAL
+    # permite que o app Tk e o Streamlit leiam e gravem o mesmo arquivo ao mesmo tempo.
+    LOTE_CONSULTA = 500
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._conexoes = []
+        self._lock = threading.Lock()
+        conexao = self._conexao()
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS cotacoes (
+                ticker TEXT PRIMARY KEY,
+                timestamp TEXT NOT NULL,
+                dados TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cotacoes_ticker_timestamp ON cotacoes (ticker, timestamp);
+        """)
+
+    def _conexao(self):
+        # sqlite3 não compartilha conexões entre threads: uma por thread
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=10, check_same_thread=False)
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+            with self._lock:
+                self._conexoes.append(conexao)
+        return conexao
+
+    def obter_varios(self, tickers):
+        tickers = list(tickers)
+        conexao = self._conexao()
+        resultado = {}
+        for i in range(0, len(tickers), self.LOTE_CONSULTA):
+            lote = tickers[i:i + self.LOTE_CONSULTA]
+            marcadores = ",".join("?" * len(lote))
+            linhas = conexao.execute(
+                f"SELECT ticker, dados, timestamp FROM cotacoes WHERE ticker IN ({marcadores})", lote)
+            for ticker, dados, timestamp in linhas:
+                resultado[ticker] = (json.loads(dados), datetime.fromisoformat(timestamp))
+        return resultado
+
+    def salvar(self, entradas):
+        conexao = self._conexao()
+        with conexao:
+            # Não sobrescreve uma cotação mais nova gravada por outro processo
+            conexao.executemany(
+                """INSERT INTO cotacoes (ticker, timestamp, dados) VALUES (?, ?, ?)
+                   ON CONFLICT(ticker) DO UPDATE SET timestamp = excluded.timestamp, dados = excluded.dados
+                   WHERE excluded.timestamp >= cotacoes.timestamp""",
+                [(t, ts.isoformat(), json.dumps(dados)) for t, (dados, ts) in entradas.items()])
+
+    def limpar(self):
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute("DELETE FROM cotacoes")
+
+    def fechar(self):
+        with self._lock:
+            for conexao in self._conexoes:
+                conexao.close()
+            self._conexoes = []
+        self._local = threading.local()
+
+
+def criar_armazenamento(tipo, caminho_json, caminho_sqlite):
+    if tipo == "json":
+        return ArmazenamentoJSON(caminho_json)
+    if tipo == "memoria":
+        return ArmazenamentoMemoria()
+    if tipo == "sqlite":
+        novo = not os.path.exists(caminho_sqlite)
+        armazenamento = ArmazenamentoSQLite(caminho_sqlite)
+        if novo and os.path.exists(caminho_json):
+            # Migra o cache JSON existente na primeira execução com SQLite
+            antigo = ArmazenamentoJSON(caminho_json)
+            armazenamento.salvar(antigo._carregar())
+            logging.info(f"Cache migrado de {caminho_json} para {caminho_sqlite}")
+        return armazenamento
+    raise ValueError(f"Armazenamento de cotações desconhecido: {tipo}")
@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class LimitadorTaxa:
+    def __init__(self, requisicoes_por_segundo):
+        self.intervalo = 1.0 / requisicoes_por_segundo if requisicoes_por_segundo else 0.0
+        self._proximo = 0.0
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            horario = max(agora, self._proximo)
+            self._proximo = horario + self.intervalo
+        if horario > agora:
+            time.sleep(horario - agora)
+
+
+class RelatorioAtualizacao:
+    def __init__(self):
+        self.tempo_total = 0.0
+        self.latencias = {}
+        self.falhas = {}
+        self.expirados = []
+
+    def resumo(self):
+        if self.latencias:
+            lat = sorted(self.latencias.values())
+            media = sum(lat) / len(lat)
+            maxima = lat[-1]
+        else:
+            media = maxima = 0.0
+        return (f"{len(self.latencias)} ok, {len(self.falhas)} falhas, {len(self.expirados)} expirados "
+                f"em {self.tempo_total:.2f}s (latência média {media:.2f}s, máx {maxima:.2f}s)")
+
+
+def buscar_em_paralelo(buscar, tickers, max_concorrencia=8, requisicoes_por_segundo=None, timeout=10.0):
+    # Executa buscar(ticker) para cada ticker com concorrência limitada.
+    # O prazo de cada ticker conta a partir de quando ele entra na fila do
+    # executor, então esperar na fila também conta; um ticker lento não atrasa
+    # os demais. Ao expirar, a tarefa ainda na fila é cancelada e a que já
+    # roda é abandonada: o resultado dela é descartado e o relatório, já
+    # devolvido, não é mais alterado.
+    relatorio = RelatorioAtualizacao()
+    resultados = {}
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return resultados, relatorio
+
+    limitador = LimitadorTaxa(requisicoes_por_segundo)
+    lock_relatorio = threading.Lock()
+    encerrados = set()
+    finalizado = False
+
+    def tarefa(ticker):
+        limitador.aguardar()
+        inicio = time.monotonic()
+        resultado = buscar(ticker)
+        with lock_relatorio:
+            if not finalizado and ticker not in encerrados:
+                relatorio.latencias[ticker] = time.monotonic() - inicio
+        return resultado
+
+    inicio_total = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=max_concorrencia, thread_name_prefix="cotacoes")
+    try:
+        pendentes = {}
+        prazos = {}
+        for ticker in tickers:
+            futuro = executor.submit(tarefa, ticker)
+            pendentes[futuro] = ticker
+            prazos[futuro] = time.monotonic() + timeout
+        while pendentes:
+            concluidos, _ = wait(pendentes, timeout=0.05, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                ticker = pendentes.pop(futuro)
+                try:
+                    resultados[ticker] = futuro.result()
+                except Exception as e:
+                    relatorio.falhas[ticker] = str(e)
+                    logging.warning(f"Falha ao buscar {ticker}: {str(e)}")
+
+            agora = time.monotonic()
+            for futuro, ticker in list(pendentes.items()):
+                if agora > prazos[futuro] and not futuro.done():
+                    pendentes.pop(futuro)
+                    futuro.cancel()
+                    with lock_relatorio:
+                        encerrados.add(ticker)
+                        relatorio.expirados.append(ticker)
+                    logging.warning(f"Tempo esgotado ao buscar {ticker} ({timeout}s)")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        with lock_relatorio:
+            finalizado = True
+            relatorio.tempo_total = time.monotonic() - inicio_total
+
+    logging.info(f"Atualização paralela: {relatorio.resumo()}")
+    return resultados, relatorio
@@ -0,0 +1,183 @@
+
+# Benchmark do ciclo importar/carregar -> atualizar cotações -> formatar -> analisar -> exportar PDF
+# com carteiras sintéticas, sem rede (ProvedorReplay).
+#
+#   python benchmark.py --tamanhos 10 1000 100000 1000000 --saida benchmark_baseline.json
+#   python benchmark.py --comparar benchmark_baseline.json
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import ArmazenamentoMemoria
+from cotacoes import CotacaoCache
+from dados import carregar_dados, atualizar_dados_financeiros, importar_json, salvar_snapshot
+from diario import DiarioCarteira
+from estado import EstadoCarteira
+from graficos import calcular_analise
+from provedores import ProvedorReplay
+from relatorio import gerar_pdf
+from utils import formatar_colunas
+
+TAMANHOS_PADRAO = [10, 1000, 100000, 1000000]
+VERSAO_RESULTADOS = 1
+
+
+def gerar_carteira(n, semente=0):
+    rng = np.random.default_rng(semente)
+    preco_medio = rng.uniform(1, 200, n).round(2)
+    quantidade = rng.integers(1, 5000, n)
+    dividendos_acao = np.where(rng.random(n) < 0.2, np.nan, rng.uniform(0, 10, n).round(2))
+    return pd.DataFrame({
+        "Papel": [f"A{i:07d}" for i in range(n)],
+        "Empresa": [f"Empresa {i}" for i in range(n)],
+        "Preço Médio": preco_medio,
+        "Preço Atual": np.nan,
+        "Preço Teto": (preco_medio * rng.uniform(0.8, 1.5, n)).round(2),
+        "Quantidade": quantidade,
+        "Total Investido": (preco_medio * quantidade).round(2),
+        "Valor Atual": 0.0,
+        "Dividendos": (np.nan_to_num(dividendos_acao) * quantidade).round(2),
+        "Dividendos/Ação": dividendos_acao,
+        "Rentabilidade": 0.0,
+    })
+
+
+def _etapas(diretorio, n, max_linhas_pdf):
+    caminho_json = os.path.join(diretorio, f"carteira_{n}.json")
+    caminho_snapshot = os.path.join(diretorio, f"carteira_{n}.arrow")
+    carteira = gerar_carteira(n)
+    carteira.to_json(caminho_json, orient="records", indent=2)
+    salvar_snapshot(carteira, caminho_snapshot)
+    estado = {}
+
+    def importar():
+        importar_json(caminho_json)
+
+    def carregar():
+        estado["df"] = carregar_dados(caminho_snapshot, caminho_json, os.path.join(diretorio, "diario.jsonl"))
+
+    def atualizar():
+        cache = CotacaoCache(armazenamento=ArmazenamentoMemoria(), provedor=ProvedorReplay())
+        atualizar_dados_financeiros(estado["df"], cache)
+
+    def formatar():
+        formatar_colunas(estado["df"])
+
+    def analisar():
+        calcular_analise(estado["df"])
+
+    # Edições: diário e índice por Papel montados fora da medição, como na carga do app Tk
+    diario = DiarioCarteira(os.path.join(diretorio, f"diario_{n}.jsonl"), caminho_snapshot,
+                            limite_compactacao=float("inf"))
+    diario.indexar(carteira)
+    editada = EstadoCarteira(carteira)
+
+    def editar():
+        # Uma edição de cada tipo (a carteira volta ao que era)
+        editada.alterar(lambda df: diario.adicionar(df, {"Papel": "NOVO3", "Quantidade": 1, "Preço Médio": 1.0}))
+        editada.alterar(lambda df: diario.atualizar(df, "NOVO3", Quantidade=2))
+        editada.alterar(lambda df: diario.remover(df, "NOVO3"))
+        diario.fechar()
+
+    def exportar():
+        gerar_pdf(estado["df"], os.path.join(diretorio, "relatorio.pdf"))
+
+    etapas = [("importar_json", importar), ("carregar_dados", carregar),
+              ("atualizar_dados_financeiros", atualizar), ("formatar_valores", formatar),
+              ("analise", analisar), ("editar_carteira", editar)]
+    if n <= max_linhas_pdf:
+        etapas.append(("exportar_pdf", exportar))
+    return etapas
+
+
+def _medir(funcao, memoria):
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    funcao()
+    segundos = time.perf_counter() - inicio
+    pico = None
+    if memoria:
+        pico = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    return segundos, pico
+
+
+def executar(tamanhos, max_linhas_pdf=100000, repeticoes=1, memoria=True):
+    resultados = {}
+    with tempfile.TemporaryDirectory() as diretorio:
+        for n in tamanhos:
+            resultados[str(n)] = {}
+            for nome, funcao in _etapas(diretorio, n, max_linhas_pdf):
+                # Tempo: melhor de N execuções sem tracemalloc; memória: uma execução à parte
+                segundos = min(_medir(funcao, False)[0] for _ in range(repeticoes))
+                pico = _medir(funcao, True)[1] if memoria else None
+                resultados[str(n)][nome] = {
+                    "segundos": round(segundos, 6),
+                    "linhas_por_segundo": round(n / segundos, 1) if segundos else None,
+                    "pico_memoria_mb": round(pico, 2) if pico is not None else None,
+                }
+                print(f"{n:>9} {nome:<28} {segundos:>10.4f}s "
+                      f"{resultados[str(n)][nome]['linhas_por_segundo'] or 0:>14,.0f} linhas/s"
+                      + (f" {pico:>9.1f} MB" if pico is not None else ""))
+    return {
+        "versao": VERSAO_RESULTADOS,
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "resultados": resultados,
+    }
+
+
+def comparar(atual, base, tolerancia=0.2):
+    # Devolve a lista de regressões: etapas mais lentas que a base além da tolerância
+    regressoes = []
+    for n, etapas in atual["resultados"].items():
+        for nome, medida in etapas.items():
+            anterior = base.get("resultados", {}).get(n, {}).get(nome)
+            if not anterior or not anterior.get("segundos"):
+                continue
+            razao = medida["segundos"] / anterior["segundos"]
+            marca = "REGRESSÃO" if razao > 1 + tolerancia else ""
+            print(f"{n:>9} {nome:<28} {anterior['segundos']:>10.4f}s -> {medida['segundos']:>10.4f}s "
+                  f"({razao:>5.2f}x) {marca}")
+            if marca:
+                regressoes.append((n, nome, razao))
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do Monitor de Investimentos")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO)
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--max-linhas-pdf", type=int, default=100000)
+    parser.add_argument("--sem-memoria", action="store_true", help="não mede o pico de memória")
+    parser.add_argument("--saida", help="grava os resultados neste JSON (ex.: benchmark_baseline.json)")
+    parser.add_argument("--comparar", help="compara com um JSON gerado anteriormente")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    atual = executar(args.tamanhos, args.max_linhas_pdf, args.repeticoes, not args.sem_memoria)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(atual, f, indent=2)
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if comparar(atual, base, args.tolerancia):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
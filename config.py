@@ -1,3 +1,86 @@
 CAMINHO_PLANILHA = "CONTROLE DE ATIVOS.xlsx"
 CAMINHO_DADOS = "dados_salvos.json"
+CAMINHO_SNAPSHOT = "dados_salvos.arrow"
+CAMINHO_DIARIO = "dados_salvos.diario.jsonl"
+LIMITE_DIARIO = 500
 LOG_FILE = "investimentos.log"
+
+# Atualização de cotações em paralelo
+MAX_CONCORRENCIA_COTACOES = 8
+REQUISICOES_POR_SEGUNDO = 5
+TIMEOUT_COTACAO = 10
+
+# Persistência do cache de cotações (write-behind)
+INTERVALO_FLUSH_COTACOES = 5
+
+# Armazenamento do cache de cotações: "sqlite", "json" ou "memoria"
+ARMAZENAMENTO_COTACOES = "sqlite"
+CAMINHO_BANCO_COTACOES = "cotacoes_cache.db"
+
+# Cache de cotações em memória: limite de entradas (LRU) e validade por classe, em minutos
+MAX_ENTRADAS_COTACOES = 5000
+VALIDADE_POR_CLASSE = {
+    "acao": 30,
+    "fii": 60,
+    "bdr": 30,
+    "indice": 15,
+    "cambio": 15,
+    "cripto": 5,
+}
+# Cotação vencida é devolvida na hora e atualizada em segundo plano (stale-while-revalidate)
+SERVIR_COTACOES_VENCIDAS = False
+
+# Provedor de cotações: "yfinance" ou "replay" (séries locais, sem rede)
+PROVEDOR_COTACOES = "yfinance"
+CAMINHO_REPLAY = "cotacoes_replay.json"
+
+# Tabela: acima deste número de linhas só a parte visível é formatada e desenhada
+# (Treeview virtual no app Tk, paginação no Streamlit)
+LIMITE_TABELA_VIRTUAL = 5000
+LINHAS_POR_PAGINA = 100
+
+# Gráficos: acima deste número de ativos o restante vira "Outros".
+# As imagens renderizadas ficam em cache neste diretório, pelo hash dos dados.
+LIMITE_ATIVOS_GRAFICO = 15
+CAMINHO_CACHE_GRAFICOS = "graficos_cache"
+
+# Histórico diário de preços (OHLCV), um .npy por ticker; na primeira
+# atualização de um ticker são buscados estes dias para trás
+CAMINHO_HISTORICO = "historico_precos"
+DIAS_HISTORICO_INICIAL = 365
+# Atualiza o histórico dos tickers da carteira a cada atualização de cotações
+ATUALIZAR_HISTORICO = False
+
+# Validade das cotações conforme o pregão da B3 (horário de Brasília).
+# Durante o pregão vale VALIDADE_PREGAO (minutos, por classe); fora dele, a
+# cotação buscada depois do fechamento vale até a próxima abertura.
+# O fechamento inclui o call e o atraso de ~15 min das cotações gratuitas.
+VALIDADE_CONFORME_PREGAO = True
+HORARIO_PREGAO = ("10:00", "18:30")
+ABERTURA_QUARTA_CINZAS = "13:00"
+VALIDADE_PREGAO = {
+    "acao": 5,
+    "fii": 10,
+    "bdr": 5,
+    "indice": 2,
+}
+# Agendador: segundos entre verificações durante o pregão e tickers por lote
+INTERVALO_AGENDADOR = 60
+LOTE_AGENDADOR = 50
+
+# Atualização incremental da interface: as cotações chegam em partes deste
+# tamanho e a janela consome a fila a cada INTERVALO_FILA_INTERFACE ms
+LOTE_ENTREGA_COTACOES = 20
+INTERVALO_FILA_INTERFACE = 100
+
+# Alertas de PT Bazin: depois de alertado, um ativo só volta a alertar quando
+# o preço sobe acima do PT Bazin mais esta fração (0.02 = 2%) e cai de novo
+HISTERESE_ALERTA_BAZIN = 0.02
+
+# Servidor local de cotações (python servidor_cotacoes.py): um único processo
+# busca e guarda as cotações para todas as janelas e sessões do Streamlit.
+# Endereço "host:porta" (TCP) ou caminho de um socket Unix. Se o servidor não
+# estiver no ar, cada aplicação usa o próprio provedor.
+USAR_SERVIDOR_COTACOES = False
+ENDERECO_SERVIDOR_COTACOES = "127.0.0.1:8765"
+TIMEOUT_SERVIDOR_COTACOES = 60
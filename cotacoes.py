@@ -1,69 +1,393 @@
 
-import yfinance as yf
 import os
-import json
+import atexit
 import logging
+import weakref
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+from armazenamento import ArmazenamentoMemoria, criar_armazenamento
+from atualizacao_paralela import buscar_em_paralelo
+from config import (MAX_CONCORRENCIA_COTACOES, REQUISICOES_POR_SEGUNDO, TIMEOUT_COTACAO,
+                    INTERVALO_FLUSH_COTACOES, ARMAZENAMENTO_COTACOES, CAMINHO_BANCO_COTACOES,
+                    MAX_ENTRADAS_COTACOES, VALIDADE_POR_CLASSE, SERVIR_COTACOES_VENCIDAS,
+                    PROVEDOR_COTACOES, CAMINHO_REPLAY,
+                    LOTE_ENTREGA_COTACOES, USAR_SERVIDOR_COTACOES, ENDERECO_SERVIDOR_COTACOES)
+from provedores import criar_provedor
+
 CACHE_FILE = "cotacoes_cache.json"
 
+# Caches ainda abertos, gravados uma última vez na saída do programa. A
+# referência é fraca: um cache descartado pode ser coletado normalmente.
+_caches_abertos = weakref.WeakSet()
+
+
+def _flush_caches_abertos():
+    for cache in list(_caches_abertos):
+        cache.flush()
+
+
+atexit.register(_flush_caches_abertos)
+
+
+def classificar_ticker(ticker):
+    ticker = str(ticker).upper()
+    if ticker.startswith("^"):
+        return "indice"
+    if ticker.endswith("=X"):
+        return "cambio"
+    if ticker.endswith(("-USD", "-BRL")):
+        return "cripto"
+    base = ticker[:-3] if ticker.endswith(".SA") else ticker
+    if base.endswith("11"):
+        return "fii"
+    if base[-2:] in ("32", "33", "34", "35", "39"):
+        return "bdr"
+    return "acao"
+
+
 class CotacaoCache:
-    def __init__(self):
-        self._cache = {}
+    def __init__(self, write_behind=True, armazenamento=None, stale_while_revalidate=False, provedor=None,
+                 politica=None, fallback_individual=True):
+        self._cache = OrderedDict()
+        if provedor is None:
+            opcoes = {}
+            if PROVEDOR_COTACOES == "replay" and os.path.exists(CAMINHO_REPLAY):
+                opcoes["caminho"] = CAMINHO_REPLAY
+            provedor = criar_provedor(PROVEDOR_COTACOES, **opcoes)
+        self._provedor = provedor
+        if armazenamento is None:
+            armazenamento = criar_armazenamento(ARMAZENAMENTO_COTACOES, CACHE_FILE, CAMINHO_BANCO_COTACOES)
+        self._armazenamento = armazenamento
         self.CACHE_VALIDADE = timedelta(minutes=30)
-        self._carregar_cache()
+        self.validade_por_classe = {k: timedelta(minutes=v) for k, v in VALIDADE_POR_CLASSE.items()}
+        # Política de validade opcional (ex.: agendador.PoliticaValidadePregao);
+        # quando não se aplica a um ticker, vale a validade fixa por classe
+        self.politica = politica
+        # Busca individual do que o lote não trouxe; desligada no modo cliente,
+        # em que o servidor de cotações já fez essa segunda tentativa
+        self.fallback_individual = fallback_individual
+        self.max_entradas = MAX_ENTRADAS_COTACOES
+        self.lote_entrega = LOTE_ENTREGA_COTACOES
+        self.stale_while_revalidate = stale_while_revalidate
+        self._revalidador = None
+        self._lock_lru = threading.Lock()
+        self._lock_estatisticas = threading.Lock()
+        self._estatisticas = {"acertos": 0, "faltas": 0, "obsoletas_servidas": 0,
+                              "revalidacoes": 0, "despejos": 0}
+        self.max_concorrencia = MAX_CONCORRENCIA_COTACOES
+        self.requisicoes_por_segundo = REQUISICOES_POR_SEGUNDO
+        self.timeout = TIMEOUT_COTACAO
+        self.ultimo_relatorio = None
+        self.write_behind = write_behind
+        self.intervalo_flush = INTERVALO_FLUSH_COTACOES
+        self._sujos = {}
+        self._lock_sujos = threading.Lock()
+        self._timer_flush = None
+        # Locks por faixa de tickers e buscas em andamento (single-flight)
+        self._locks = [threading.Lock() for _ in range(16)]
+        self._em_voo = {}
+        _caches_abertos.add(self)
+
+    @property
+    def provedor(self):
+        return self._provedor
+
+    def _lock_para(self, ticker):
+        return self._locks[hash(ticker) % len(self._locks)]
+
+    def _carregar_entradas(self, tickers):
+        # Leitura sob demanda: só consulta o armazenamento o que não está em memória
+        ausentes = [t for t in tickers if t not in self._cache]
+        if not ausentes:
+            return
+        try:
+            salvas = self._armazenamento.obter_varios(ausentes)
+        except Exception as e:
+            logging.warning(f"Erro ao carregar cache salvo: {str(e)}")
+            return
+        for ticker, entrada in salvas.items():
+            with self._lock_para(ticker):
+                if ticker not in self._cache:
+                    self._guardar(ticker, entrada)
+
+    def validade_para(self, ticker):
+        return self.validade_por_classe.get(classificar_ticker(ticker), self.CACHE_VALIDADE)
+
+    def _valida(self, ticker, instante, agora):
+        if self.politica is not None:
+            fresca = self.politica.fresca(classificar_ticker(ticker), instante, agora)
+            if fresca is not None:
+                return fresca
+        return agora - instante < self.validade_para(ticker)
+
+    def _fresca(self, ticker, agora):
+        entrada = self._cache.get(ticker)
+        if entrada is not None and self._valida(ticker, entrada[1], agora):
+            return entrada
+        return None
+
+    def vencidos(self, tickers, agora=None):
+        # Tickers sem cotação ou com a cotação vencida; não busca nada
+        agora = agora or datetime.now()
+        tickers = list(dict.fromkeys(tickers))
+        self._carregar_entradas(tickers)
+        return [t for t in tickers if self._fresca(t, agora) is None]
+
+    def _guardar(self, ticker, entrada):
+        # LRU: a entrada mais recente vai para o fim; as mais antigas saem pelo início
+        with self._lock_lru:
+            self._cache[ticker] = entrada
+            self._cache.move_to_end(ticker)
+            despejos = 0
+            while len(self._cache) > self.max_entradas:
+                self._cache.popitem(last=False)
+                despejos += 1
+        if despejos:
+            self._contar(despejos=despejos)
+
+    def _tocar(self, tickers):
+        with self._lock_lru:
+            for ticker in tickers:
+                if ticker in self._cache:
+                    self._cache.move_to_end(ticker)
+
+    def _contar(self, **valores):
+        with self._lock_estatisticas:
+            for chave, valor in valores.items():
+                self._estatisticas[chave] += valor
+
+    def obter_estatisticas(self):
+        with self._lock_estatisticas:
+            estatisticas = dict(self._estatisticas)
+        estatisticas["entradas"] = len(self._cache)
+        estatisticas["em_voo"] = len(self._em_voo)
+        return estatisticas
+
+    def _reservar(self, tickers):
+        # Single-flight: cada ticker tem no máximo uma busca em andamento.
+        # Devolve as buscas que cabem a esta thread, as que já estão em
+        # andamento em outra thread e as que ficaram frescas nesse meio tempo.
+        proprias, alheias, frescas = {}, {}, {}
+        agora = datetime.now()
+        for ticker in tickers:
+            with self._lock_para(ticker):
+                voo = self._em_voo.get(ticker)
+                if voo is not None:
+                    alheias[ticker] = voo
+                    continue
+                entrada = self._fresca(ticker, agora)
+                if entrada is not None:
+                    frescas[ticker] = entrada[0]
+                    continue
+                voo = Future()
+                self._em_voo[ticker] = voo
+                proprias[ticker] = voo
+        return proprias, alheias, frescas
+
+    def _concluir(self, proprias, novas, agora):
+        # Publica o resultado (ou a cotação antiga) para todas as threads à espera
+        for ticker, voo in proprias.items():
+            with self._lock_para(ticker):
+                if ticker in novas:
+                    self._guardar(ticker, (novas[ticker], agora))
+                dados = self._cache.get(ticker, (None, None))[0]
+                del self._em_voo[ticker]
+            voo.set_result(dados)
 
     def obter_cotacao(self, ticker):
         agora = datetime.now()
-        if ticker in self._cache:
-            dados, timestamp = self._cache[ticker]
-            if agora - timestamp < self.CACHE_VALIDADE:
-                return dados
+        self._carregar_entradas([ticker])
+        entrada = self._fresca(ticker, agora)
+        if entrada is not None:
+            self._tocar([ticker])
+            self._contar(acertos=1)
+            return entrada[0]
+        entrada = self._cache.get(ticker)
+        if entrada is not None and self.stale_while_revalidate:
+            self._contar(obsoletas_servidas=1)
+            self._revalidar_em_segundo_plano([ticker])
+            return entrada[0]
+        self._contar(faltas=1)
 
+        proprias, alheias, frescas = self._reservar([ticker])
+        if ticker in frescas:
+            return frescas[ticker]
+        if ticker in alheias:
+            return alheias[ticker].result()
+
+        novas = {}
         try:
-            nova_cotacao = self._buscar_yfinance(ticker)
-            self._cache[ticker] = (nova_cotacao, agora)
-            self._salvar_cache()
-            return nova_cotacao
+            novas[ticker] = self._provedor.buscar(ticker)
         except Exception as e:
             logging.warning(f"Falha ao buscar {ticker}: {str(e)}")
-            return self._cache.get(ticker, (None, None))[0]
+        finally:
+            self._concluir(proprias, novas, agora)
+        if novas:
+            self._marcar_sujos({ticker: (novas[ticker], agora)})
+        return proprias[ticker].result()
+
+    def obter_cotacoes(self, tickers, ao_receber=None):
+        # ao_receber({ticker: dados}) é chamado na thread de quem pediu a cada
+        # parte pronta: primeiro as que já estavam no cache, depois cada lote
+        # de lote_entrega tickers buscados. Tickers sem cotação não são entregues.
+        agora = datetime.now()
+        resultado = {}
+        faltantes = []
+        obsoletas = []
+        tickers = list(dict.fromkeys(tickers))
+        self._carregar_entradas(tickers)
+        for ticker in tickers:
+            entrada = self._cache.get(ticker)
+            if entrada is None:
+                faltantes.append(ticker)
+            elif self._valida(ticker, entrada[1], agora):
+                resultado[ticker] = entrada[0]
+            elif self.stale_while_revalidate:
+                resultado[ticker] = entrada[0]
+                obsoletas.append(ticker)
+            else:
+                faltantes.append(ticker)
+
+        self._tocar(resultado)
+        self._contar(acertos=len(resultado) - len(obsoletas), faltas=len(faltantes),
+                     obsoletas_servidas=len(obsoletas))
+        if obsoletas:
+            self._revalidar_em_segundo_plano(obsoletas)
+        if ao_receber is None:
+            if faltantes:
+                resultado.update(self._atualizar(faltantes))
+            return {t: resultado[t] for t in tickers}
+
+        if resultado:
+            ao_receber(dict(resultado))
+        for i in range(0, len(faltantes), self.lote_entrega):
+            parte = self._atualizar(faltantes[i:i + self.lote_entrega])
+            resultado.update(parte)
+            recebidas = {t: d for t, d in parte.items() if d is not None}
+            if recebidas:
+                ao_receber(recebidas)
+        return {t: resultado[t] for t in tickers}
 
-    @staticmethod
-    def _buscar_yfinance(ticker):
-        dados = yf.Ticker(ticker).history(period="1d")
-        return {
-            'preco': round(dados['Close'].iloc[-1], 2),
-            'variacao': round(dados['Close'].pct_change().iloc[-1] * 100, 2)
-        }
+    def _revalidar_em_segundo_plano(self, tickers):
+        # Stale-while-revalidate: quem pediu já recebeu a cotação antiga;
+        # a atualização roda numa thread à parte (e o single-flight evita repetições)
+        with self._lock_lru:
+            if self._revalidador is None:
+                self._revalidador = ThreadPoolExecutor(max_workers=1, thread_name_prefix="revalidacao")
+        self._contar(revalidacoes=len(tickers))
+        self._revalidador.submit(self._atualizar, list(tickers))
+
+    def _atualizar(self, tickers):
+        agora = datetime.now()
+        resultado = {}
+        proprias, alheias, frescas = self._reservar(tickers)
+        resultado.update(frescas)
+        novas = {}
+        try:
+            if proprias:
+                novas = self._buscar_lote(list(proprias))
+        finally:
+            self._concluir(proprias, novas, agora)
+
+        for ticker, voo in proprias.items():
+            if ticker not in novas:
+                logging.warning(f"Sem cotação para {ticker}")
+            resultado[ticker] = voo.result()
+        # Tickers que outra thread já estava buscando: espera o resultado dela
+        for ticker, voo in alheias.items():
+            resultado[ticker] = voo.result()
+
+        if novas:
+            # Fim do lote: uma única escrita para todos os tickers novos
+            self._marcar_sujos({t: (d, agora) for t, d in novas.items()})
+            self.flush()
+        return resultado
+
+    def _buscar_lote(self, tickers):
+        try:
+            novas = self._provedor.buscar_lote(tickers)
+        except Exception as e:
+            logging.warning(f"Falha ao buscar lote de {len(tickers)} tickers: {str(e)}")
+            novas = {}
+
+        # O que o lote não trouxe é buscado individualmente, em paralelo
+        restantes = [t for t in tickers if t not in novas]
+        if restantes and self.fallback_individual:
+            individuais, self.ultimo_relatorio = buscar_em_paralelo(
+                self._provedor.buscar, restantes,
+                max_concorrencia=self.max_concorrencia,
+                requisicoes_por_segundo=self.requisicoes_por_segundo,
+                timeout=self.timeout)
+            novas.update(individuais)
+        return novas
 
     def limpar_cache(self):
-        self._cache = {}
-        self._salvar_cache()
+        self._cache = OrderedDict()
+        with self._lock_sujos:
+            self._sujos.clear()
+        try:
+            self._armazenamento.limpar()
+        except Exception as e:
+            logging.error(f"Erro ao limpar cache: {str(e)}")
         logging.info("Cache limpo")
 
-    def _salvar_cache(self):
+    def _marcar_sujos(self, entradas):
+        # Guarda as próprias entradas: uma cotação despejada da memória
+        # antes do flush ainda chega ao armazenamento
+        with self._lock_sujos:
+            self._sujos.update(entradas)
+            if not self.write_behind:
+                agendar = False
+            elif self._timer_flush is None:
+                self._timer_flush = threading.Timer(self.intervalo_flush, self.flush)
+                self._timer_flush.daemon = True
+                agendar = True
+            else:
+                return
+        if agendar:
+            self._timer_flush.start()
+        else:
+            self.flush()
+
+    def flush(self):
+        with self._lock_sujos:
+            if self._timer_flush is not None:
+                self._timer_flush.cancel()
+                self._timer_flush = None
+            if not self._sujos:
+                return
+            entradas = self._sujos
+            self._sujos = {}
         try:
-            serializavel = {
-                k: {
-                    "dados": v[0],
-                    "timestamp": v[1].isoformat()
-                } for k, v in self._cache.items()
-            }
-            with open(CACHE_FILE, "w", encoding="utf-8") as f:
-                json.dump(serializavel, f, indent=2)
+            self._armazenamento.salvar(entradas)
         except Exception as e:
             logging.error(f"Erro ao salvar cache: {str(e)}")
 
-    def _carregar_cache(self):
-        if not os.path.exists(CACHE_FILE):
-            return
-        try:
-            with open(CACHE_FILE, "r", encoding="utf-8") as f:
-                raw_cache = json.load(f)
-                for k, v in raw_cache.items():
-                    dados = v["dados"]
-                    timestamp = datetime.fromisoformat(v["timestamp"])
-                    self._cache[k] = (dados, timestamp)
-        except Exception as e:
-            logging.warning(f"Erro ao carregar cache salvo: {str(e)}")
+    def fechar(self):
+        # Grava o que falta, fecha o armazenamento e sai da lista gravada na
+        # saída do programa
+        self.flush()
+        self._armazenamento.fechar()
+        _caches_abertos.discard(self)
+
+
+def criar_cache():
+    # Cache usado pelas interfaces. Com USAR_SERVIDOR_COTACOES e o servidor no
+    # ar, é um cliente dele (cache só em memória, buscas pelo servidor);
+    # senão, o cache completo com o próprio provedor.
+    from agendador import politica_validade_padrao
+    politica = politica_validade_padrao()
+    if USAR_SERVIDOR_COTACOES:
+        from servidor_cotacoes import ProvedorServidor
+        provedor = ProvedorServidor(ENDERECO_SERVIDOR_COTACOES)
+        if provedor.disponivel():
+            logging.info(f"Usando o servidor de cotações em {ENDERECO_SERVIDOR_COTACOES}")
+            return CotacaoCache(armazenamento=ArmazenamentoMemoria(), provedor=provedor,
+                                stale_while_revalidate=SERVIR_COTACOES_VENCIDAS,
+                                politica=politica, fallback_individual=False)
+        logging.warning(f"Servidor de cotações indisponível em {ENDERECO_SERVIDOR_COTACOES}; "
+                        f"usando o provedor local")
+    return CotacaoCache(stale_while_revalidate=SERVIR_COTACOES_VENCIDAS, politica=politica)
@@ -1,27 +1,108 @@
 import os
+import json
+import tempfile
 import pandas as pd
 import numpy as np
 from tkinter import messagebox
-from config import CAMINHO_DADOS, CAMINHO_PLANILHA
+from config import CAMINHO_DADOS, CAMINHO_PLANILHA, CAMINHO_SNAPSHOT, CAMINHO_DIARIO
+from diario import reaplicar_diario
 import logging
 
-def carregar_dados():
-    try:
-        if os.path.exists(CAMINHO_DADOS):
-            df = pd.read_json(CAMINHO_DADOS)
+VERSAO_SNAPSHOT = 1
+
+# Tipos fixos das colunas numéricas no snapshot; as demais são gravadas como texto
+TIPOS_SNAPSHOT = {
+    "Preço Médio": "float64", "Preço Atual": "float64", "Preço Teto": "float64",
+    "Quantidade": "int64", "Total Investido": "float64", "Valor Atual": "float64",
+    "Dividendos": "float64", "Dividendos/Ação": "float64", "Rentabilidade": "float64",
+    "PT Bazin": "float64",
+}
+
+def _tipar(df):
+    df = df.copy()
+    for coluna in df.columns:
+        tipo = TIPOS_SNAPSHOT.get(coluna)
+        if tipo == "int64":
+            df[coluna] = pd.to_numeric(df[coluna], errors="coerce").fillna(0).astype("int64")
+        elif tipo:
+            df[coluna] = pd.to_numeric(df[coluna], errors="coerce").astype("float64")
         else:
-            df = pd.read_excel(CAMINHO_PLANILHA, sheet_name="AÇÕES", header=1)
-            df = df.dropna(how="all").reset_index(drop=True)
-            colunas_renomeadas = {
-                "PAPEL": "Papel", "EMPRESA": "Empresa", "P MÉD": "Preço Médio",
-                "P ATUAL $": "Preço Atual", "P TETO $": "Preço Teto",
-                "TOTAL": "Quantidade", "APORTADO": "Total Investido",
-                "ATUAL": "Valor Atual", "TOTAIS": "Dividendos",
-                "POR AÇÃO": "Dividendos/Ação", "TOTAL %": "Rentabilidade"
-            }
-            df = df.rename(columns=colunas_renomeadas)
-            df = df[list(colunas_renomeadas.values())].copy()
-            df.to_json(CAMINHO_DADOS, orient="records", indent=2)
+            df[coluna] = df[coluna].astype("string")
+    return df
+
+def salvar_snapshot(df, caminho=CAMINHO_SNAPSHOT, metadados=None):
+    # Arrow IPC (formato de arquivo), colunar e tipado, com a versão do schema
+    # nos metadados; gravado em arquivo temporário e renomeado no fim.
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    tabela = pa.Table.from_pandas(_tipar(df), preserve_index=False)
+    meta = {b"versao_schema": str(VERSAO_SNAPSHOT).encode()}
+    for chave, valor in (metadados or {}).items():
+        meta[chave.encode()] = json.dumps(valor).encode()
+    tabela = tabela.replace_schema_metadata(meta)
+
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    fd, temporario = tempfile.mkstemp(dir=diretorio, prefix=".snapshot_", suffix=".tmp")
+    os.close(fd)
+    try:
+        with pa.OSFile(temporario, "wb") as destino:
+            with ipc.new_file(destino, tabela.schema) as escritor:
+                escritor.write_table(tabela)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+def ler_snapshot(caminho=CAMINHO_SNAPSHOT):
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    with pa.memory_map(caminho, "r") as fonte:
+        leitor = ipc.open_file(fonte)
+        meta = leitor.schema.metadata or {}
+        versao = int(meta.get(b"versao_schema", b"0"))
+        if versao != VERSAO_SNAPSHOT:
+            raise ValueError(f"Versão de snapshot não suportada: {versao}")
+        df = leitor.read_all().to_pandas()
+    for chave, valor in meta.items():
+        if chave != b"versao_schema" and not chave.startswith(b"pandas"):
+            df.attrs[chave.decode()] = json.loads(valor)
+    return df
+
+def importar_json(caminho=CAMINHO_DADOS):
+    return pd.read_json(caminho)
+
+def exportar_json(df, caminho=CAMINHO_DADOS):
+    df.to_json(caminho, orient="records", indent=2)
+
+def ler_carteira(caminho=CAMINHO_SNAPSHOT, caminho_json=CAMINHO_DADOS, caminho_diario=CAMINHO_DIARIO):
+    # Snapshot binário primeiro; o JSON antigo e a planilha só servem para importar.
+    # As edições do diário posteriores ao snapshot são reaplicadas por cima.
+    if os.path.exists(caminho):
+        df = ler_snapshot(caminho)
+        return reaplicar_diario(df, caminho_diario, df.attrs.get("seq_diario", 0))
+    if os.path.exists(caminho_json):
+        logging.info(f"Importando {caminho_json} para {caminho}")
+        df = importar_json(caminho_json)
+    else:
+        df = pd.read_excel(CAMINHO_PLANILHA, sheet_name="AÇÕES", header=1)
+        df = df.dropna(how="all").reset_index(drop=True)
+        colunas_renomeadas = {
+            "PAPEL": "Papel", "EMPRESA": "Empresa", "P MÉD": "Preço Médio",
+            "P ATUAL $": "Preço Atual", "P TETO $": "Preço Teto",
+            "TOTAL": "Quantidade", "APORTADO": "Total Investido",
+            "ATUAL": "Valor Atual", "TOTAIS": "Dividendos",
+            "POR AÇÃO": "Dividendos/Ação", "TOTAL %": "Rentabilidade"
+        }
+        df = df.rename(columns=colunas_renomeadas)
+        df = df[list(colunas_renomeadas.values())].copy()
+    salvar_snapshot(df, caminho)
+    return reaplicar_diario(ler_snapshot(caminho), caminho_diario)
+
+def carregar_dados(caminho=CAMINHO_SNAPSHOT, caminho_json=CAMINHO_DADOS, caminho_diario=CAMINHO_DIARIO):
+    try:
+        df = ler_carteira(caminho, caminho_json, caminho_diario)
 
         df["Quantidade"] = pd.to_numeric(df["Quantidade"], errors="coerce").fillna(0).astype(int)
         df["Total Investido"] = pd.to_numeric(df["Total Investido"], errors="coerce").fillna(0)
@@ -37,27 +118,66 @@ def carregar_dados():
         messagebox.showerror("Erro", f"Falha ao carregar dados:\n{str(e)}")
         raise
 
-def salvar_dados(df):
+def salvar_dados(df, caminho=CAMINHO_SNAPSHOT):
     try:
-        df.to_json(CAMINHO_DADOS, orient="records", indent=2)
+        salvar_snapshot(df, caminho, metadados={"seq_diario": df.attrs.get("seq_diario", 0)})
         logging.info("Dados salvos com sucesso")
     except Exception as e:
         logging.error(f"Erro ao salvar dados: {str(e)}", exc_info=True)
         messagebox.showerror("Erro", f"Falha ao salvar:\n{str(e)}")
 
-def atualizar_dados_financeiros(df, cache):
-    for idx, row in df.iterrows():
-        papel = row["Papel"]
-        ticker = f"{papel}.SA" if not str(papel).endswith(".SA") else papel
-        try:
-            cotacao = cache.obter_cotacao(ticker)
-            if cotacao and cotacao['preco']:
-                preco_atual = cotacao['preco']
-                df.at[idx, "Preço Atual"] = preco_atual
-                df.at[idx, "Valor Atual"] = round(row["Quantidade"] * preco_atual, 2)
-                if row["Total Investido"] > 0:
-                    rentabilidade = ((df.at[idx, "Valor Atual"] - row["Total Investido"]) / row["Total Investido"]) * 100
-                    df.at[idx, "Rentabilidade"] = round(rentabilidade, 2)
-        except Exception as e:
-            logging.error(f"Erro ao atualizar {ticker}: {str(e)}")
+def tickers_da_carteira(df):
+    papeis = df["Papel"].astype(str)
+    return papeis.where(papeis.str.endswith(".SA"), papeis + ".SA")
+
+def pesos_da_carteira(df):
+    # Peso de cada ticker pelo Valor Atual (Total Investido enquanto não há cotação)
+    valor = pd.to_numeric(df["Valor Atual"], errors="coerce")
+    investido = pd.to_numeric(df["Total Investido"], errors="coerce")
+    peso = valor.where(valor > 0, investido).fillna(0)
+    return peso.groupby(tickers_da_carteira(df).to_numpy()).sum().to_dict()
+
+def aplicar_cotacoes(df, precos):
+    # Calcula Preço Atual, Valor Atual e Rentabilidade de uma vez, a partir
+    # de um mapeamento ticker -> preço. Linhas sem preço válido ficam como estão.
+    preco = tickers_da_carteira(df).map(pd.Series(precos, dtype=float))
+    validos = preco.notna() & (preco != 0)
+
+    quantidade = pd.to_numeric(df["Quantidade"], errors="coerce")
+    investido = pd.to_numeric(df["Total Investido"], errors="coerce")
+    valor_atual = (quantidade * preco).round(2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rentabilidade = ((valor_atual - investido) / investido * 100).round(2)
+    com_base = validos & (investido > 0)
+
+    df["Preço Atual"] = preco.where(validos, df["Preço Atual"])
+    df["Valor Atual"] = valor_atual.where(validos, df["Valor Atual"])
+    df["Rentabilidade"] = rentabilidade.where(com_base, df["Rentabilidade"])
     return df
+
+def posicoes_por_ticker(df):
+    # {ticker: posições (iloc) das linhas do ticker na carteira}
+    tickers = tickers_da_carteira(df)
+    return tickers.groupby(tickers.to_numpy(), sort=False).indices
+
+def aplicar_cotacoes_parciais(df, precos, posicoes=None):
+    # Como aplicar_cotacoes, mas só nas linhas dos tickers recebidos.
+    # Devolve as posições (iloc) das linhas alteradas.
+    if posicoes is None:
+        posicoes = posicoes_por_ticker(df)
+    linhas = [posicoes[t] for t in precos if t in posicoes]
+    if not linhas:
+        return np.empty(0, dtype=int)
+    linhas = np.unique(np.concatenate(linhas))
+    parte = aplicar_cotacoes(df.iloc[linhas].copy(), precos)
+    for coluna in ["Preço Atual", "Valor Atual", "Rentabilidade"]:
+        if df[coluna].dtype.kind in "iub":
+            df[coluna] = df[coluna].astype(float)
+        df.iloc[linhas, df.columns.get_loc(coluna)] = parte[coluna].to_numpy()
+    return linhas
+
+def atualizar_dados_financeiros(df, cache):
+    tickers = tickers_da_carteira(df)
+    cotacoes = cache.obter_cotacoes(tickers.unique())
+    precos = {t: c['preco'] for t, c in cotacoes.items() if c and c.get('preco')}
+    return aplicar_cotacoes(df, precos)
@@ -0,0 +1,239 @@
+import os
+import json
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import CAMINHO_DIARIO, CAMINHO_SNAPSHOT, LIMITE_DIARIO
+
+
+# Diário de alterações da carteira: um registro JSON por linha, só acrescentado.
+# Cada registro é idempotente e identificado pelo Papel:
+#   {"seq": 7, "op": "adicionar", "papel": "PETR4", "campos": {...}}  (insere; reaplicado, sobrescreve)
+#   {"seq": 8, "op": "atualizar", "papel": "PETR4", "campos": {"Quantidade": 200}}
+#   {"seq": 9, "op": "remover", "papel": "PETR4"}
+# Por isso reaplicar um registro que o snapshot já contém não causa dano.
+# Custo de uma edição: o registro no disco e a busca do Papel não dependem do
+# tamanho da carteira, mas inserir ou remover uma linha do DataFrame realoca
+# as colunas (cópia proporcional ao número de linhas; ver "editar_carteira"
+# no benchmark.py). Alterar campos de uma linha copia só as colunas tocadas.
+
+def _sufixo_compactacao(caminho):
+    return caminho + ".compactando"
+
+
+def ler_registros(caminho):
+    registros = []
+    for arquivo in (_sufixo_compactacao(caminho), caminho):
+        if not os.path.exists(arquivo):
+            continue
+        with open(arquivo, "r", encoding="utf-8") as f:
+            for linha in f:
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    registros.append(json.loads(linha))
+                except json.JSONDecodeError:
+                    # Última linha incompleta de uma gravação interrompida
+                    logging.warning(f"Registro inválido ignorado em {arquivo}")
+    return registros
+
+
+def indexar_papeis(df):
+    # Papel -> rótulo da primeira linha com esse Papel (de trás para a frente,
+    # a primeira ocorrência é a última a ser gravada)
+    return dict(zip(df["Papel"].to_numpy()[::-1].tolist(), df.index[::-1].tolist()))
+
+
+def _rotulo(df, papel, indices=None):
+    # Com indices a busca não percorre a carteira
+    if indices is not None:
+        return indices.get(papel)
+    encontrados = df.index[df["Papel"] == papel]
+    return encontrados[0] if len(encontrados) else None
+
+
+def _novo_rotulo(df):
+    # Rótulos só crescem (a carteira só recebe linhas no fim): o último é o maior
+    if not len(df):
+        return 0
+    rotulo = df.index[-1] + 1
+    return rotulo if rotulo not in df.index else df.index.max() + 1
+
+
+def aplicar_registro(df, registro, indices=None):
+    # Altera df no lugar; indices (Papel -> rótulo) é mantido junto, se informado
+    papel = registro["papel"]
+    rotulo = _rotulo(df, papel, indices)
+    op = registro["op"]
+    if op == "remover":
+        if rotulo is not None:
+            df.drop(index=rotulo, inplace=True)
+            if indices is not None:
+                indices.pop(papel, None)
+        return df
+
+    campos = dict(registro.get("campos", {}))
+    if rotulo is None:
+        if op != "adicionar":
+            return df
+        rotulo = _novo_rotulo(df)
+        campos["Papel"] = papel
+        linha = {c: np.nan for c in df.columns}
+        linha.update(campos)
+        df.loc[rotulo] = pd.Series(linha)
+        if indices is not None:
+            indices[papel] = rotulo
+        return df
+
+    for coluna, valor in campos.items():
+        df.at[rotulo, coluna] = valor
+    return df
+
+
+def reaplicar_diario(df, caminho=CAMINHO_DIARIO, a_partir_de=0):
+    ultimo = a_partir_de
+    indices = indexar_papeis(df)
+    for registro in ler_registros(caminho):
+        seq = registro.get("seq", 0)
+        if seq > a_partir_de:
+            aplicar_registro(df, registro, indices)
+        ultimo = max(ultimo, seq)
+    df.attrs["seq_diario"] = ultimo
+    return df
+
+
+class DiarioCarteira:
+    def __init__(self, caminho=CAMINHO_DIARIO, caminho_snapshot=CAMINHO_SNAPSHOT,
+                 limite_compactacao=LIMITE_DIARIO):
+        self.caminho = caminho
+        self.caminho_snapshot = caminho_snapshot
+        self.limite_compactacao = limite_compactacao
+        self._lock = threading.Lock()
+        self._arquivo = None
+        self._seq = 0
+        self._registros = 0
+        self._indices = {}
+        self._compactacao = None
+
+    def carregar(self):
+        from dados import ler_carteira
+        df = ler_carteira(self.caminho_snapshot, caminho_diario=self.caminho)
+        self.indexar(df)
+        with self._lock:
+            self._seq = df.attrs.get("seq_diario", 0)
+            self._registros = len(ler_registros(self.caminho))
+        return df
+
+    def indexar(self, df):
+        self._indices = indexar_papeis(df)
+
+    def rotulo(self, papel):
+        # Rótulo da linha do Papel na carteira, ou None
+        return self._indices.get(papel)
+
+    def contem(self, df, papel):
+        return _rotulo(df, papel, self._indices) is not None
+
+    def _registrar(self, registro):
+        # Acrescenta uma linha e força a ida ao disco: a edição está confirmada
+        # assim que este método retorna, mesmo que o programa caia em seguida
+        with self._lock:
+            self._seq += 1
+            registro = {"seq": self._seq, **registro}
+            if self._arquivo is None:
+                self._arquivo = _abrir_para_acrescentar(self.caminho)
+            self._arquivo.write(json.dumps(registro, default=_serializar, separators=(",", ":")) + "\n")
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self._registros += 1
+        return registro
+
+    def adicionar(self, df, campos):
+        # Recusa antes de gravar: o registro só sobrescreve ao ser reaplicado
+        campos = dict(campos)
+        papel = campos.pop("Papel", None)
+        if not isinstance(papel, str) or not papel.strip():
+            raise ValueError("Informe o Papel do ativo")
+        if self.contem(df, papel):
+            raise ValueError(f"{papel} já está na carteira")
+        return self._aplicar(df, {"op": "adicionar", "papel": papel, "campos": campos})
+
+    def atualizar(self, df, papel, **campos):
+        return self._aplicar(df, {"op": "atualizar", "papel": papel, "campos": campos})
+
+    def remover(self, df, papel):
+        return self._aplicar(df, {"op": "remover", "papel": papel})
+
+    def _aplicar(self, df, registro):
+        registro = self._registrar(registro)
+        aplicar_registro(df, registro, self._indices)
+        if self._registros >= self.limite_compactacao:
+            self.compactar(df, em_segundo_plano=True)
+        return df
+
+    def compactar(self, df, em_segundo_plano=False):
+        # O diário atual é renomeado e novas edições vão para um arquivo novo;
+        # o snapshot é gravado a partir de uma cópia e só então o diário antigo é apagado
+        with self._lock:
+            if self._compactacao is not None and self._compactacao.is_alive():
+                if not em_segundo_plano:
+                    self._compactacao.join()
+                else:
+                    return
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+            rotacionado = _sufixo_compactacao(self.caminho)
+            if os.path.exists(self.caminho) and not os.path.exists(rotacionado):
+                os.replace(self.caminho, rotacionado)
+            self._registros = 0
+            copia = df.copy()
+            seq = self._seq
+
+        if em_segundo_plano:
+            self._compactacao = threading.Thread(target=self._gravar_snapshot, args=(copia, seq), daemon=True)
+            self._compactacao.start()
+        else:
+            self._gravar_snapshot(copia, seq)
+
+    def _gravar_snapshot(self, copia, seq):
+        from dados import salvar_snapshot
+        try:
+            salvar_snapshot(copia, self.caminho_snapshot, metadados={"seq_diario": seq})
+            rotacionado = _sufixo_compactacao(self.caminho)
+            if os.path.exists(rotacionado):
+                os.remove(rotacionado)
+            logging.info(f"Diário compactado no snapshot (seq {seq})")
+        except Exception as e:
+            logging.error(f"Erro ao compactar diário: {str(e)}", exc_info=True)
+
+    def fechar(self):
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+        if self._compactacao is not None:
+            self._compactacao.join()
+
+
+def _abrir_para_acrescentar(caminho):
+    # Se a última linha ficou pela metade numa queda, começa o próximo registro numa linha nova
+    precisa_quebra = False
+    if os.path.exists(caminho) and os.path.getsize(caminho):
+        with open(caminho, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            precisa_quebra = f.read(1) != b"\n"
+    arquivo = open(caminho, "a", encoding="utf-8")
+    if precisa_quebra:
+        arquivo.write("\n")
+    return arquivo
+
+
+def _serializar(valor):
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"Valor não serializável no diário: {valor!r}")
@@ -0,0 +1,59 @@
+import threading
+
+import pandas as pd
+
+# Com copy-on-write (sempre ligado a partir do pandas 3) a cópia rasa de um
+# DataFrame só duplica as colunas que forem alteradas depois
+_COPY_ON_WRITE = int(pd.__version__.split(".")[0]) >= 3 or pd.get_option("mode.copy_on_write") is True
+
+
+def copiar_carteira(df):
+    return df.copy(deep=not _COPY_ON_WRITE)
+
+
+class SnapshotCarteira:
+    # Uma versão publicada da carteira. Por convenção o DataFrame de um
+    # snapshot nunca é alterado: quem precisa mudar algo cria a próxima versão.
+    __slots__ = ("df", "versao")
+
+    def __init__(self, df, versao=0):
+        self.df = df
+        self.versao = versao
+
+
+class EstadoCarteira:
+    # Referência para a versão atual da carteira. Leitores pegam "atual" (uma
+    # leitura de atributo, atômica) e trabalham com aquela versão até o fim,
+    # sem locks. Escritores alteram uma cópia e publicam a nova versão com uma
+    # única troca de referência; o lock só ordena os escritores entre si.
+    def __init__(self, df):
+        self._atual = SnapshotCarteira(df)
+        self._lock_escrita = threading.Lock()
+
+    @property
+    def atual(self):
+        return self._atual
+
+    @property
+    def df(self):
+        return self._atual.df
+
+    @property
+    def versao(self):
+        return self._atual.versao
+
+    def alterar(self, funcao):
+        # funcao(df) altera no lugar a cópia recebida; o retorno dela é devolvido.
+        # Se funcao falhar, a versão atual continua publicada.
+        with self._lock_escrita:
+            base = self._atual
+            df = copiar_carteira(base.df)
+            resultado = funcao(df)
+            self._atual = SnapshotCarteira(df, base.versao + 1)
+        return resultado
+
+    def publicar(self, df):
+        # Troca a carteira inteira por um DataFrame novo (que não deve mais ser alterado)
+        with self._lock_escrita:
+            self._atual = SnapshotCarteira(df, self._atual.versao + 1)
+        return self._atual
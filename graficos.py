@@ -1,44 +1,330 @@
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import io
+import os
+import math
+import base64
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+import tkinter as tk
 from tkinter import ttk
 
-def atualizar_graficos(frame, df):
-    for widget in frame.winfo_children():
-        widget.destroy()
+from config import LIMITE_ATIVOS_GRAFICO, CAMINHO_CACHE_GRAFICOS
 
-    notebook = ttk.Notebook(frame)
-    notebook.pack(fill="both", expand=True)
-
-    # Gráfico de Rentabilidade
-    frame_rent = ttk.Frame(notebook)
-    fig1 = plt.Figure(figsize=(10, 4), dpi=100)
-    ax1 = fig1.add_subplot(111)
-    df.plot.bar(x='Papel', y='Rentabilidade', ax=ax1)
-    ax1.set_title('Rentabilidade por Ativo (%)')
-    ax1.tick_params(axis='x', rotation=45)
-    canvas1 = FigureCanvasTkAgg(fig1, master=frame_rent)
-    canvas1.draw()
-    canvas1.get_tk_widget().pack(fill='both', expand=True)
-    notebook.add(frame_rent, text="Rentabilidade")
-
-    # Gráfico de Distribuição
-    frame_dist = ttk.Frame(notebook)
-    fig2 = plt.Figure(figsize=(10, 4), dpi=100)
-    ax2 = fig2.add_subplot(111)
-    df.plot.pie(y='Valor Atual', labels=df['Papel'], ax=ax2, autopct='%1.1f%%')
-    ax2.set_title('Distribuição da Carteira')
-    ax2.set_ylabel('')
-    canvas2 = FigureCanvasTkAgg(fig2, master=frame_dist)
-    canvas2.draw()
-    canvas2.get_tk_widget().pack(fill='both', expand=True)
-    notebook.add(frame_dist, text="Distribuição")
+OUTROS = "Outros"
+COR_BARRAS = "skyblue"
+FRACAO_MINIMA_ROTULO = 0.02
+COLUNAS_GRAFICOS = ["Papel", "Rentabilidade", "Valor Atual"]
+
+
+def agregar_top_n(papeis, rentabilidade, valor_atual, limite):
+    # Mantém os "limite" maiores ativos por Valor Atual, na ordem original, e
+    # junta o resto em "Outros" (rentabilidade média ponderada pelo valor)
+    if limite is None or len(papeis) <= limite:
+        return papeis, rentabilidade, valor_atual
+    ordem = np.argsort(-valor_atual, kind="stable")
+    topo = np.sort(ordem[:limite])
+    resto = ordem[limite:]
+    pesos = valor_atual[resto]
+    if pesos.sum() > 0:
+        rentabilidade_outros = np.average(rentabilidade[resto], weights=pesos)
+    else:
+        rentabilidade_outros = rentabilidade[resto].mean()
+    return ([papeis[i] for i in topo] + [OUTROS],
+            np.append(rentabilidade[topo], rentabilidade_outros),
+            np.append(valor_atual[topo], pesos.sum()))
+
+
+def _dados_graficos(df, limite=None):
+    papeis = df["Papel"].astype(str).tolist()
+    rentabilidade = pd.to_numeric(df["Rentabilidade"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    # Pizza não aceita valores negativos nem NaN
+    valor_atual = pd.to_numeric(df["Valor Atual"], errors="coerce").fillna(0).clip(lower=0).to_numpy(dtype=float)
+    return agregar_top_n(papeis, rentabilidade, valor_atual, limite)
+
+
+def chave_graficos(df, limite=LIMITE_ATIVOS_GRAFICO):
+    # Hash dos dados que aparecem nos gráficos: mesma chave, mesma imagem
+    hashes = pd.util.hash_pandas_object(df[COLUNAS_GRAFICOS], index=False).to_numpy()
+    chave = hashlib.sha1(hashes.tobytes())
+    chave.update(f"{limite}:{len(df)}".encode())
+    return chave.hexdigest()[:20]
+
+
+class GraficosCarteira:
+    # Figuras criadas uma única vez. atualizar() muda a altura das barras e os
+    # ângulos das fatias no lugar e devolve False, sem tocar em nada, se Papel,
+    # Rentabilidade e Valor Atual não mudaram desde a última chamada.
+    # Acima de "limite" ativos, o restante é agregado em "Outros".
+    def __init__(self, cor_barras=None, limite=LIMITE_ATIVOS_GRAFICO):
+        self.cor_barras = cor_barras
+        self.limite = limite
+        self.fig_rent = Figure(figsize=(10, 4), dpi=100)
+        self.ax_rent = self.fig_rent.add_subplot(111)
+        self.fig_dist = Figure(figsize=(10, 4), dpi=100)
+        self.ax_dist = self.fig_dist.add_subplot(111)
+        self._papeis = None
+        self._assinatura = None
+        self._barras = []
+        self._fatias = ([], [], [])
+        self._aviso = None
+
+    def atualizar(self, df):
+        papeis, rentabilidade, valor_atual = _dados_graficos(df, self.limite)
+        assinatura = (papeis, rentabilidade.tobytes(), valor_atual.tobytes())
+        if assinatura == self._assinatura:
+            return False
+
+        # Só recria os artistas quando a lista de ativos muda
+        if papeis != self._papeis:
+            self._montar(papeis)
+            self._papeis = papeis
+        self._atualizar_barras(rentabilidade)
+        self._atualizar_fatias(valor_atual)
+
+        self._assinatura = assinatura
+        return True
+
+    def _montar(self, papeis):
+        n = len(papeis)
+        self.ax_rent.clear()
+        self._barras = self.ax_rent.bar(range(n), np.zeros(n), color=self.cor_barras, label="Rentabilidade")
+        self.ax_rent.set_xticks(range(n), papeis, rotation=45, ha="right")
+        self.fig_rent.subplots_adjust(bottom=0.25)
+        self.ax_rent.set_xlabel("Papel")
+        self.ax_rent.set_title('Rentabilidade por Ativo (%)')
+        self.ax_rent.legend()
+
+        self.ax_dist.clear()
+        self._fatias = tuple(self.ax_dist.pie(np.ones(n), labels=papeis, autopct='%1.1f%%')) if n else ([], [], [])
+        self._aviso = self.ax_dist.text(0, 0, "Sem valores para exibir", ha="center", va="center", visible=False)
+        self.ax_dist.set_title('Distribuição da Carteira')
+        self.ax_dist.set_ylabel('')
+
+    def _atualizar_barras(self, rentabilidade):
+        for barra, altura in zip(self._barras, rentabilidade):
+            barra.set_height(altura)
+        self.ax_rent.relim()
+        self.ax_rent.autoscale_view()
+
+    def _atualizar_fatias(self, valor_atual):
+        fatias, rotulos, percentuais = self._fatias
+        total = valor_atual.sum()
+        self._aviso.set_visible(total <= 0)
+        for fatia in fatias:
+            fatia.set_visible(total > 0)
+        if total <= 0:
+            for texto in (*rotulos, *percentuais):
+                texto.set_visible(False)
+            return
+
+        # Mesma geometria do ax.pie: início em 0°, sentido anti-horário, raio 1,
+        # rótulos a 1.1 e percentuais a 0.6 do centro
+        fracoes = valor_atual / total
+        fim = np.cumsum(fracoes) * 360
+        inicio = fim - fracoes * 360
+        for fatia, rotulo, percentual, t1, t2, fracao in zip(fatias, rotulos, percentuais, inicio, fim, fracoes):
+            fatia.set_theta1(t1)
+            fatia.set_theta2(t2)
+            meio = math.radians((t1 + t2) / 2)
+            x, y = math.cos(meio), math.sin(meio)
+            rotulo.set_position((1.1 * x, 1.1 * y))
+            rotulo.set_horizontalalignment('left' if x > 0 else 'right')
+            percentual.set_position((0.6 * x, 0.6 * y))
+            percentual.set_text(f"{fracao * 100:.1f}%")
+            # Fatias muito finas ficam sem texto, senão os rótulos se sobrepõem
+            rotulo.set_visible(fracao >= FRACAO_MINIMA_ROTULO)
+            percentual.set_visible(fracao >= FRACAO_MINIMA_ROTULO)
+
+
+    def png(self):
+        imagens = {}
+        for tipo, figura in [("rentabilidade", self.fig_rent), ("distribuicao", self.fig_dist)]:
+            buffer = io.BytesIO()
+            figura.savefig(buffer, format="png")
+            imagens[tipo] = buffer.getvalue()
+        return imagens
 
-def atualizar_analise(frame, df):
-    for widget in frame.winfo_children():
-        widget.destroy()
 
+class CacheImagensGraficos:
+    # PNGs dos gráficos renderizados com Agg numa thread própria, indexados
+    # pelo hash dos dados. A mesma imagem serve ao app Tk, ao Streamlit e ao PDF;
+    # com um diretório, também é reaproveitada entre execuções e processos.
+    def __init__(self, diretorio=CAMINHO_CACHE_GRAFICOS, limite=LIMITE_ATIVOS_GRAFICO,
+                 cor_barras=COR_BARRAS, max_memoria=8, max_arquivos=50):
+        self.diretorio = diretorio
+        self.limite = limite
+        self.cor_barras = cor_barras
+        self.max_memoria = max_memoria
+        self.max_arquivos = max_arquivos
+        self.renderizacoes = 0
+        self._memoria = OrderedDict()
+        self._pendentes = {}
+        self._lock = threading.Lock()
+        # Uma única thread: as figuras são reaproveitadas e nunca usadas em paralelo
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="graficos")
+        self._graficos = None
+
+    def chave(self, df):
+        return chave_graficos(df, self.limite)
+
+    def _arquivo(self, chave, tipo):
+        return os.path.join(self.diretorio, f"{chave}_{tipo}.png")
+
+    def obter(self, df, chave=None):
+        chave = chave or self.chave(df)
+        with self._lock:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return self._memoria[chave]
+        if not self.diretorio:
+            return None
+        try:
+            imagens = {}
+            for tipo in ("rentabilidade", "distribuicao"):
+                with open(self._arquivo(chave, tipo), "rb") as f:
+                    imagens[tipo] = f.read()
+        except OSError:
+            return None
+        self._guardar_memoria(chave, imagens)
+        return imagens
+
+    def _guardar_memoria(self, chave, imagens):
+        with self._lock:
+            self._memoria[chave] = imagens
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.max_memoria:
+                self._memoria.popitem(last=False)
+
+    def renderizar_em_segundo_plano(self, df):
+        # Devolve um Future com {tipo: png}; pedidos iguais em andamento são compartilhados
+        chave = self.chave(df)
+        imagens = self.obter(df, chave)
+        if imagens is not None:
+            futuro = Future()
+            futuro.set_result(imagens)
+            return futuro
+        with self._lock:
+            futuro = self._pendentes.get(chave)
+            if futuro is None:
+                # Cópia só das colunas usadas: a carteira pode mudar durante a renderização
+                futuro = self._executor.submit(self._renderizar, chave, df[COLUNAS_GRAFICOS].copy())
+                self._pendentes[chave] = futuro
+        return futuro
+
+    def renderizar(self, df):
+        return self.renderizar_em_segundo_plano(df).result()
+
+    def _renderizar(self, chave, dados):
+        try:
+            if self._graficos is None:
+                self._graficos = GraficosCarteira(self.cor_barras, self.limite)
+            self._graficos.atualizar(dados)
+            imagens = self._graficos.png()
+            self.renderizacoes += 1
+            self._guardar_memoria(chave, imagens)
+            if self.diretorio:
+                self._gravar(chave, imagens)
+            return imagens
+        finally:
+            with self._lock:
+                self._pendentes.pop(chave, None)
+
+    def _gravar(self, chave, imagens):
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            for tipo, png in imagens.items():
+                fd, temporario = tempfile.mkstemp(dir=self.diretorio, prefix=".grafico_", suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(png)
+                os.replace(temporario, self._arquivo(chave, tipo))
+            # Mantém só os arquivos mais recentes
+            arquivos = sorted((os.path.join(self.diretorio, n) for n in os.listdir(self.diretorio)
+                               if n.endswith(".png")), key=os.path.getmtime)
+            for antigo in arquivos[:-self.max_arquivos]:
+                os.remove(antigo)
+        except OSError as e:
+            logging.warning(f"Erro ao gravar cache de gráficos: {str(e)}")
+
+
+_cache_padrao = None
+_lock_cache_padrao = threading.Lock()
+
+
+def cache_imagens_padrao():
+    global _cache_padrao
+    with _lock_cache_padrao:
+        if _cache_padrao is None:
+            _cache_padrao = CacheImagensGraficos()
+        return _cache_padrao
+
+
+class PainelGraficos:
+    # Abas com as imagens do CacheImagensGraficos. A renderização acontece fora
+    # da thread da interface; o painel verifica o resultado com after() e só
+    # troca as imagens quando os dados mudaram.
+    def __init__(self, frame, cache=None):
+        self.frame = frame
+        self.cache = cache or cache_imagens_padrao()
+        self.redesenhos = 0
+        self._chave = None
+        self._pedido = None
+        self._fotos = {}
+        notebook = ttk.Notebook(frame)
+        notebook.pack(fill="both", expand=True)
+        self.rotulos = {}
+        for tipo, titulo in [("rentabilidade", "Rentabilidade"), ("distribuicao", "Distribuição")]:
+            aba = ttk.Frame(notebook)
+            rotulo = ttk.Label(aba, text="Gerando gráfico...", anchor="center")
+            rotulo.pack(fill='both', expand=True)
+            notebook.add(aba, text=titulo)
+            self.rotulos[tipo] = rotulo
+
+    def atualizar(self, df):
+        chave = self.cache.chave(df)
+        if chave in (self._chave, self._pedido):
+            return False
+        self._pedido = chave
+        self._acompanhar(chave, self.cache.renderizar_em_segundo_plano(df))
+        return True
+
+    def _acompanhar(self, chave, futuro):
+        if chave != self._pedido:
+            return  # Substituído por um pedido mais novo
+        if not futuro.done():
+            self.frame.after(50, self._acompanhar, chave, futuro)
+            return
+        self._pedido = None
+        try:
+            imagens = futuro.result()
+        except Exception as e:
+            logging.error(f"Erro ao renderizar gráficos: {str(e)}", exc_info=True)
+            return
+        for tipo, png in imagens.items():
+            foto = tk.PhotoImage(data=base64.b64encode(png))
+            self.rotulos[tipo].configure(image=foto, text="")
+            self._fotos[tipo] = foto  # Referência mantida, senão o Tk descarta a imagem
+        self._chave = chave
+        self.redesenhos += 1
+
+
+def atualizar_graficos(frame, df):
+    # O painel fica guardado no próprio frame e é reaproveitado nas próximas visitas
+    painel = getattr(frame, "painel_graficos", None)
+    if painel is None:
+        painel = PainelGraficos(frame)
+        frame.painel_graficos = painel
+    painel.atualizar(df)
+    return painel
+
+
+def calcular_analise(df):
     total_investido = df["Total Investido"].sum()
     valor_atual = df["Valor Atual"].sum()
     rentabilidade_media = df["Rentabilidade"].mean()
@@ -47,7 +333,7 @@ def atualizar_analise(frame, df):
     top_rent = df.sort_values("Rentabilidade", ascending=False).head(3)[["Papel", "Rentabilidade"]]
     top_div = df.sort_values("Dividendos", ascending=False).head(3)[["Papel", "Dividendos"]]
 
-    resumo = f"""📊 ANÁLISE GERAL
+    return f"""📊 ANÁLISE GERAL
 
 💰 Total Investido: R$ {total_investido:,.2f}
 📈 Valor Atual: R$ {valor_atual:,.2f}
@@ -60,4 +346,9 @@ def atualizar_analise(frame, df):
 💵 Top Dividendos:
 {top_div.to_string(index=False)}"""
 
+def atualizar_analise(frame, df):
+    for widget in frame.winfo_children():
+        widget.destroy()
+
+    resumo = calcular_analise(df)
     tk.Label(frame, text=resumo, justify="left", font=("Courier New", 10)).pack(padx=20, pady=20)
@@ -0,0 +1,201 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+from config import CAMINHO_HISTORICO, DIAS_HISTORICO_INICIAL
+
+# Uma linha por pregão, ordenada por data
+TIPO_HISTORICO = np.dtype([
+    ("data", "datetime64[D]"),
+    ("abertura", "f8"),
+    ("maxima", "f8"),
+    ("minima", "f8"),
+    ("fechamento", "f8"),
+    ("volume", "f8"),
+])
+
+_INDICE = "indice.json"
+
+
+def _data(valor):
+    return np.datetime64(valor, "D")
+
+
+def _nome_arquivo(ticker):
+    # Tickers como ^BVSP ou BRL=X viram nomes de arquivo válidos
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in ticker) + ".npy"
+
+
+def para_registros(dados):
+    # Converte o DataFrame de um provedor (índice de datas; colunas Open, High,
+    # Low, Close, Volume) para o formato do histórico
+    registros = np.zeros(len(dados), dtype=TIPO_HISTORICO)
+    if not len(dados):
+        return registros
+    indice = dados.index
+    if getattr(indice, "tz", None) is not None:
+        indice = indice.tz_localize(None)
+    registros["data"] = indice.to_numpy().astype("datetime64[D]")
+    for campo, coluna in [("abertura", "Open"), ("maxima", "High"), ("minima", "Low"),
+                          ("fechamento", "Close"), ("volume", "Volume")]:
+        registros[campo] = dados[coluna].to_numpy(dtype=float)
+    return registros
+
+
+def mesclar(existentes, novos):
+    # Datas repetidas ficam com o valor novo (o pregão do dia pode ter mudado)
+    if not len(existentes):
+        return np.sort(novos, order="data")
+    combinados = np.concatenate([novos, existentes])
+    _, primeiros = np.unique(combinados["data"], return_index=True)
+    return combinados[primeiros]
+
+
+class HistoricoPrecos:
+    # Histórico diário (OHLCV) por ticker em arquivos .npy lidos com mmap.
+    # O índice guarda o intervalo de datas já consultado no provedor, para que
+    # cada atualização só peça as datas que faltam. Um intervalo sem dados só
+    # conta como consultado se o calendário da B3 não tem pregão nele (fins de
+    # semana e feriados não são pedidos de novo; uma falha do provedor, sim).
+    # Consultas por intervalo nunca usam o provedor.
+    def __init__(self, diretorio=CAMINHO_HISTORICO, provedor=None, dias_iniciais=DIAS_HISTORICO_INICIAL,
+                 calendario=None):
+        from agendador import CalendarioB3
+        self.diretorio = diretorio
+        self.provedor = provedor
+        self.dias_iniciais = dias_iniciais
+        self.calendario = calendario or CalendarioB3()
+        self._lock = threading.Lock()
+        self._mapas = {}
+        os.makedirs(diretorio, exist_ok=True)
+        self._indice = self._ler_indice()
+
+    def _ler_indice(self):
+        try:
+            with open(os.path.join(self.diretorio, _INDICE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logging.warning(f"Índice do histórico ilegível, será refeito: {str(e)}")
+            return {}
+
+    def _gravar_atomico(self, nome, escrever):
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, prefix=".historico_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                escrever(f)
+            os.replace(temporario, os.path.join(self.diretorio, nome))
+        except BaseException:
+            os.remove(temporario)
+            raise
+
+    def _carregar(self, ticker):
+        mapa = self._mapas.get(ticker)
+        if mapa is None:
+            caminho = os.path.join(self.diretorio, _nome_arquivo(ticker))
+            if not os.path.exists(caminho):
+                return np.zeros(0, dtype=TIPO_HISTORICO)
+            mapa = np.load(caminho, mmap_mode="r")
+            self._mapas[ticker] = mapa
+        return mapa
+
+    def intervalo_coberto(self, ticker):
+        coberto = self._indice.get(ticker)
+        if not coberto:
+            return None
+        return date.fromisoformat(coberto[0]), date.fromisoformat(coberto[1])
+
+    def consultar(self, ticker, inicio=None, fim=None):
+        # Fatia [inicio, fim] (datas inclusivas) do arquivo mapeado em memória.
+        # Só a fatia é copiada: no Windows um arquivo mapeado não pode ser substituído.
+        with self._lock:
+            registros = self._carregar(ticker)
+            datas = registros["data"]
+            a = 0 if inicio is None else np.searchsorted(datas, _data(inicio), side="left")
+            b = len(registros) if fim is None else np.searchsorted(datas, _data(fim), side="right")
+            return np.array(registros[a:b])
+
+    def _sem_pregao(self, inicio, fim):
+        if fim < inicio:
+            return False
+        dias = (inicio + timedelta(days=i) for i in range((fim - inicio).days + 1))
+        return not any(self.calendario.dia_de_pregao(dia) for dia in dias)
+
+    def faltantes(self, ticker, inicio, fim):
+        # Intervalos a buscar para cobrir [inicio, fim]. O intervalo coberto é
+        # sempre contínuo: um pedido além dele também preenche o buraco no meio.
+        coberto = self.intervalo_coberto(ticker)
+        if coberto is None:
+            return [(inicio, fim)] if inicio <= fim else []
+        primeiro, ultimo = coberto
+        intervalos = []
+        if inicio < primeiro:
+            intervalos.append((inicio, primeiro - timedelta(days=1)))
+        if fim > ultimo:
+            intervalos.append((ultimo + timedelta(days=1), fim))
+        return intervalos
+
+    def atualizar(self, ticker, inicio=None, fim=None, hoje=None):
+        # Busca só as datas que faltam até "fim" (padrão: hoje). O dia corrente
+        # nunca é dado como coberto: o pregão ainda pode mudar.
+        hoje = hoje or date.today()
+        fim = fim or hoje
+        if inicio is None:
+            coberto = self.intervalo_coberto(ticker)
+            inicio = coberto[0] if coberto else fim - timedelta(days=self.dias_iniciais)
+
+        intervalos = self.faltantes(ticker, inicio, fim)
+        if fim >= hoje and not any(b >= hoje for _, b in intervalos):
+            intervalos.append((hoje, hoje))
+        if not intervalos:
+            return 0
+
+        ontem = hoje - timedelta(days=1)
+        buscados = [(a, b, para_registros(self.provedor.buscar_historico(ticker, a, b))) for a, b in intervalos]
+        # Entram na cobertura os intervalos que trouxeram dados e os vazios
+        # sem nenhum pregão; como cada um encosta no intervalo já coberto, ela
+        # continua contínua. Vazio com pregão (falha do provedor) é pedido de novo.
+        cobertos = [(a, b) for a, b, parte in buscados if len(parte) or self._sem_pregao(a, min(b, ontem))]
+        novos = np.concatenate([registros for _, _, registros in buscados])
+        if not cobertos:
+            return 0
+
+        with self._lock:
+            if len(novos):
+                existentes = np.array(self._carregar(ticker))
+                registros = mesclar(existentes, novos)
+                self._mapas.pop(ticker, None)
+                self._gravar_atomico(_nome_arquivo(ticker), lambda f: np.save(f, registros))
+
+            coberto = self.intervalo_coberto(ticker)
+            primeiro, ultimo = coberto if coberto else (None, None)
+            for a, b in cobertos:
+                b = min(b, ontem)
+                primeiro = a if primeiro is None else min(primeiro, a)
+                ultimo = b if ultimo is None else max(ultimo, b)
+            # Intervalo vazio (ultimo < primeiro) quando só o dia corrente foi buscado
+            self._indice[ticker] = [primeiro.isoformat(), max(ultimo, primeiro - timedelta(days=1)).isoformat()]
+            self._gravar_atomico(_INDICE, lambda f: f.write(json.dumps(self._indice).encode("utf-8")))
+        return len(novos)
+
+    def atualizar_varios(self, tickers, **opcoes):
+        novos = {}
+        for ticker in tickers:
+            try:
+                novos[ticker] = self.atualizar(ticker, **opcoes)
+            except Exception as e:
+                logging.warning(f"Falha ao atualizar histórico de {ticker}: {str(e)}")
+        return novos
+
+    def variacao(self, ticker):
+        # Variação (%) do último fechamento sobre o anterior, a partir do histórico local
+        fechamentos = self.consultar(ticker)["fechamento"][-2:]
+        if len(fechamentos) < 2 or not fechamentos[0]:
+            return float("nan")
+        return round((fechamentos[1] / fechamentos[0] - 1) * 100, 2)
@@ -5,10 +5,14 @@ import pandas as pd
 import numpy as np
 import threading
 
-from utils import formatar_valores
-from graficos import atualizar_graficos, atualizar_analise
-from relatorio import exportar_pdf
-from dados import salvar_dados
+from perfil_inicializacao import perfil
+from agregados import AgregadosCarteira
+from config import LIMITE_TABELA_VIRTUAL, LINHAS_POR_PAGINA
+from tabela import fatia_pagina
+from utils import FormatadorValores, formatar_colunas
+from dados import salvar_dados, exportar_json
+
+# graficos (matplotlib) e relatorio (reportlab) são importados no primeiro uso
 
 def iniciar_interface(df, cache):
     # Carregar larguras de colunas do JSON externo
@@ -42,10 +46,17 @@ def iniciar_interface(df, cache):
             salvar_dados(df)
             st.success("Dados salvos com sucesso!")
 
-        # Botão Exportar PDF
+        # Exportar JSON (o arquivo principal agora é o snapshot binário)
+        if st.button("🗂️ Exportar JSON"):
+            exportar_json(df)
+            st.success("Dados exportados para JSON!")
+
+        # Botão Exportar PDF: gera em segundo plano, acompanhado abaixo do título
         if st.button("📄 Exportar PDF"):
-            exportar_pdf(df)
-            st.success("PDF exportado com sucesso!")
+            from relatorio import ExportacaoPDF
+            exportacao = st.session_state.get("exportacao_pdf")
+            if exportacao is None or exportacao.concluida():
+                st.session_state["exportacao_pdf"] = ExportacaoPDF(df).iniciar()
 
         # Botão Atualizar Cotações
         def inicializar_precos():
@@ -58,6 +69,13 @@ def iniciar_interface(df, cache):
             # Executar a atualização em uma thread para não bloquear a interface
             threading.Thread(target=inicializar_precos, daemon=True).start()
 
+    exportacao = st.session_state.get("exportacao_pdf")
+    if exportacao is not None:
+        if exportacao.concluida():
+            mostrar_resultado_exportacao(exportacao)
+        else:
+            acompanhar_exportacao(exportacao)
+
     # Abas da interface
     tab_names = ["Ações", "Gráficos", "Análise Geral"]
     tabs = st.tabs(tab_names)
@@ -66,7 +84,16 @@ def iniciar_interface(df, cache):
     with tabs[0]:
         # Tabela
         colunas_para_mostrar = list(col_widths.keys())
-        df_exibicao = df.apply(formatar_valores, axis=1)
+        if len(df) > LIMITE_TABELA_VIRTUAL:
+            # Carteiras muito grandes: só a página exibida é formatada e enviada
+            paginas = fatia_pagina(len(df), 1, LINHAS_POR_PAGINA)[2]
+            pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=1)
+            inicio, fim, _ = fatia_pagina(len(df), int(pagina), LINHAS_POR_PAGINA)
+            st.caption(f"Linhas {inicio + 1} a {fim} de {len(df)}")
+            df_exibicao = formatar_colunas(df.iloc[inicio:fim])
+        else:
+            formatador = st.session_state.setdefault("formatador", FormatadorValores())
+            df_exibicao = formatador.formatar(df)
         df_exibicao = df_exibicao[colunas_para_mostrar]
 
         # Exibir a tabela com Streamlit
@@ -75,23 +102,50 @@ def iniciar_interface(df, cache):
             use_container_width=True,
             column_config={col: st.column_config.Column(width=col_widths.get(col, 80)) for col in colunas_para_mostrar}
         )
+        perfil.marcar("primeira_tabela_visivel")
 
     # Seção Gráficos
     with tabs[1]:
-        # Placeholder para os gráficos
-        graficos_placeholder = st.empty()
-        atualizar_graficos(graficos_placeholder, df)
+        # As mesmas imagens (cache por hash dos dados) usadas pelo app Tk e pelo PDF
+        from graficos import cache_imagens_padrao
+        imagens = cache_imagens_padrao().renderizar(df)
+        aba_rent, aba_dist = st.tabs(["Rentabilidade", "Distribuição"])
+        with aba_rent:
+            st.image(imagens["rentabilidade"], use_container_width=True)
+        with aba_dist:
+            st.image(imagens["distribuicao"], use_container_width=True)
 
     # Seção Análise Geral
     with tabs[2]:
-        # Placeholder para a análise
-        analise_placeholder = st.empty()
-        atualizar_analise(analise_placeholder, df)
+        # Agregados mantidos na sessão: a cada rerun só linhas alteradas são reprocessadas
+        agregados = st.session_state.setdefault("agregados", AgregadosCarteira())
+        agregados.sincronizar(df)
+        st.text(agregados.texto())
 
     # Barra de status
     status_var = st.session_state.get("status", "Pronto")
     st.info(f"Status: {status_var}")
 
+
+@st.fragment(run_every=1)
+def acompanhar_exportacao(exportacao):
+    # Só este trecho é reexecutado enquanto o PDF é gerado
+    if exportacao.concluida():
+        st.rerun()
+    st.progress(exportacao.progresso, text=f"Exportando PDF... {exportacao.progresso:.0%}")
+    if st.button("✖ Cancelar PDF"):
+        exportacao.cancelar()
+
+
+def mostrar_resultado_exportacao(exportacao):
+    if exportacao.erro is not None:
+        st.error(f"Falha ao exportar PDF: {exportacao.erro}")
+    elif exportacao.caminho:
+        st.success(f"PDF exportado para {exportacao.caminho}")
+    else:
+        st.warning("Exportação do PDF cancelada")
+
+
 # Para garantir que o status persista entre interações
 if "status" not in st.session_state:
     st.session_state["status"] = "Pronto"
@@ -1,10 +1,18 @@
+from perfil_inicializacao import perfil  # antes dos demais imports, para medi-los
+
+import streamlit as st
 
 from interface import iniciar_interface
 from dados import carregar_dados
-from cotacoes import CotacaoCache
+from cotacoes import criar_cache
 
 if __name__ == "__main__":
-    print("Iniciando aplicação...")
-    df = carregar_dados()
-    cache = CotacaoCache()
-    iniciar_interface(df, cache)
+    # O Streamlit reexecuta este script a cada interação: carteira e cache
+    # ficam na sessão para não serem recarregados a cada clique
+    if "df" not in st.session_state:
+        print("Iniciando aplicação...")
+        st.session_state["df"] = carregar_dados()
+        st.session_state["cache"] = criar_cache()
+        perfil.marcar("dados_carregados")
+    iniciar_interface(st.session_state["df"], st.session_state["cache"])
+    perfil.finalizar()
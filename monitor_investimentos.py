@@ -1,20 +1,27 @@
-import os
+from perfil_inicializacao import perfil  # antes dos demais imports, para medi-los
+
 import tkinter as tk
 from tkinter import ttk, messagebox
 import pandas as pd
-import yfinance as yf
+import queue
 import threading
 import numpy as np
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from datetime import datetime, timedelta
 import logging
+from datetime import datetime
 from logging.handlers import RotatingFileHandler
-import matplotlib
 
-matplotlib.use('TkAgg')  # Definir backend antes de importar pyplot
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+# matplotlib e reportlab são carregados só no primeiro uso (gráficos e PDF)
+from agendador import AgendadorCotacoes
+from agregados import AgregadosCarteira
+from alertas import MotorAlertasBazin, texto_alerta
+from config import CAMINHO_SNAPSHOT, LIMITE_TABELA_VIRTUAL, ATUALIZAR_HISTORICO, INTERVALO_FILA_INTERFACE
+from cotacoes import criar_cache
+from dados import (tickers_da_carteira, pesos_da_carteira, posicoes_por_ticker,
+                   aplicar_cotacoes_parciais)
+from diario import DiarioCarteira
+from estado import EstadoCarteira
+from tabela import TabelaIncremental, TabelaVirtual, calcular_tags
+from utils import FormatadorValores
 
 
 # ====================== CONFIGURAÇÃO INICIAL ======================
@@ -31,73 +38,28 @@ def setup_logging():
 
 
 setup_logging()
+perfil.marcar("imports")
 
 
-# ====================== CLASSE DE CACHE ======================
-class CotacaoCache:
-    def __init__(self):
-        self._cache = {}
-        self.CACHE_VALIDADE = timedelta(minutes=30)
-
-    def obter_cotacao(self, ticker):
-        agora = datetime.now()
-        if ticker in self._cache:
-            dados, timestamp = self._cache[ticker]
-            if agora - timestamp < self.CACHE_VALIDADE:
-                return dados
-
-        try:
-            nova_cotacao = self._buscar_yfinance(ticker)
-            self._cache[ticker] = (nova_cotacao, agora)
-            return nova_cotacao
-        except Exception as e:
-            logging.warning(f"Falha ao buscar {ticker}: {str(e)}")
-            return self._cache.get(ticker, (None, None))[0]
-
-    @staticmethod
-    def _buscar_yfinance(ticker):
-        try:
-            dados = yf.Ticker(ticker).history(period="1d")
-            return {
-                'preco': round(dados['Close'].iloc[-1], 2),
-                'variacao': round(dados['Close'].pct_change().iloc[-1] * 100, 2)
-            }
-        except Exception as e:
-            raise Exception(f"Erro Yahoo Finance para {ticker}: {str(e)}")
-
-    def limpar_cache(self):
-        self._cache = {}
-        logging.info("Cache limpo")
-
+# ====================== CACHE DE COTAÇÕES ======================
+# Cliente do servidor de cotações, se configurado e no ar (ver config.py)
+cache_cotacoes = criar_cache()
 
-cache_cotacoes = CotacaoCache()
+# ====================== HISTÓRICO DE PREÇOS ======================
+historico_precos = None
+if ATUALIZAR_HISTORICO:
+    from historico import HistoricoPrecos
+    historico_precos = HistoricoPrecos(provedor=cache_cotacoes.provedor)
 
-# ====================== CONFIGURAÇÕES GERAIS ======================
-CAMINHO_PLANILHA = "CONTROLE DE ATIVOS.xlsx"
-CAMINHO_DADOS = "dados_salvos.json"
+# ====================== DIÁRIO DE ALTERAÇÕES ======================
+diario_carteira = DiarioCarteira()
 
 
 # ====================== FUNÇÕES PRINCIPAIS ======================
 def carregar_dados():
     try:
-        if os.path.exists(CAMINHO_DADOS):
-            logging.info(f"Carregando dados de {CAMINHO_DADOS}")
-            df = pd.read_json(CAMINHO_DADOS)
-        else:
-            logging.warning(f"{CAMINHO_DADOS} não encontrado, usando planilha Excel")
-            df = pd.read_excel(CAMINHO_PLANILHA, sheet_name="AÇÕES", header=1)
-            df = df.dropna(how="all").reset_index(drop=True)
-            colunas_renomeadas = {
-                "PAPEL": "Papel", "EMPRESA": "Empresa", "P MÉD": "Preço Médio",
-                "P ATUAL $": "Preço Atual", "P TETO $": "Preço Teto",
-                "TOTAL": "Quantidade", "APORTADO": "Total Investido",
-                "ATUAL": "Valor Atual", "TOTAIS": "Dividendos",
-                "POR AÇÃO": "Dividendos/Ação", "TOTAL %": "Rentabilidade"
-            }
-            df = df.rename(columns=colunas_renomeadas)
-            df = df[list(colunas_renomeadas.values())].copy()
-            df.to_json(CAMINHO_DADOS, orient="records", indent=2)
-
+        logging.info(f"Carregando dados de {CAMINHO_SNAPSHOT}")
+        df = diario_carteira.carregar()
         logging.info(f"Dados carregados com {len(df)} ativos")
         return df
     except Exception as e:
@@ -108,7 +70,7 @@ def carregar_dados():
 
 def salvar_dados():
     try:
-        df.to_json(CAMINHO_DADOS, orient="records", indent=2)
+        diario_carteira.compactar(estado_carteira.df)
         logging.info("Dados salvos com sucesso")
         messagebox.showinfo("Salvo", "Alterações salvas com sucesso!")
     except Exception as e:
@@ -116,76 +78,40 @@ def salvar_dados():
         messagebox.showerror("Erro", f"Falha ao salvar:\n{str(e)}")
 
 
+exportacao_pdf = None
+
+
 def exportar_pdf():
+    # O PDF é gerado numa thread; clicar de novo durante a exportação cancela
+    global exportacao_pdf
+    if exportacao_pdf is not None and not exportacao_pdf.concluida():
+        exportacao_pdf.cancelar()
+        status_var.set("Cancelando exportação do PDF...")
+        return
     try:
-        df_exportar = df.copy()
-        df_exportar = df_exportar[["Papel", "Empresa", "Preço Médio", "Preço Atual",
-                                   "Quantidade", "Total Investido", "Valor Atual",
-                                   "Dividendos", "Dividendos/Ação", "Rentabilidade"]]
-
-        pdf_path = "relatorio_acoes.pdf"
-        c = canvas.Canvas(pdf_path, pagesize=A4)
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(50, 800, "Relatório de Ações")
-
-        # Cabeçalho
-        c.setFont("Helvetica-Bold", 10)
-        headers = df_exportar.columns
-        for i, header in enumerate(headers):
-            c.drawString(50 + i * 100, 770, header)
-
-        # Dados
-        c.setFont("Helvetica", 8)
-        y = 750
-        for _, row in df_exportar.iterrows():
-            for i, val in enumerate(row):
-                c.drawString(50 + i * 100, y, str(val))
-            y -= 20
-            if y < 50:
-                c.showPage()
-                y = 800
-
-        c.save()
-        messagebox.showinfo("Sucesso", f"PDF exportado para:\n{pdf_path}")
+        from relatorio import ExportacaoPDF
+        exportacao_pdf = ExportacaoPDF(estado_carteira.df).iniciar()
     except Exception as e:
         messagebox.showerror("Erro", f"Falha ao exportar PDF:\n{str(e)}")
-
-
-def formatar_valores(row):
-    row["Preço Médio"] = f"R$ {row['Preço Médio']:.2f}"
-    row["Preço Atual"] = f"R$ {row['Preço Atual']:.2f}"
-    row["Preço Teto"] = f"R$ {row['Preço Teto']:.2f}"
-    row["Total Investido"] = f"R$ {row['Total Investido']:.2f}"
-    row["Valor Atual"] = f"R$ {row['Valor Atual']:.2f}"
-    row["Dividendos"] = f"R$ {pd.to_numeric(row['Dividendos'], errors='coerce'):.2f}" if pd.notna(
-        row['Dividendos']) else "R$ 0.00"
-    row["Rentabilidade"] = f"{row['Rentabilidade']:.2f}%"
-    row["Dividendos/Ação"] = f"R$ {pd.to_numeric(row['Dividendos/Ação'], errors='coerce'):.2f}" if pd.notna(
-        row['Dividendos/Ação']) else "R$ 0.00"
-    return row
-
-
-def atualizar_dados_financeiros(df):
-    for idx, row in df.iterrows():
-        papel = row["Papel"]
-        ticker = f"{papel}.SA" if not str(papel).endswith(".SA") else papel
-
-        try:
-            cotacao = cache_cotacoes.obter_cotacao(ticker)
-            if cotacao and cotacao['preco']:
-                preco_atual = cotacao['preco']
-                df.at[idx, "Preço Atual"] = preco_atual
-                df.at[idx, "Valor Atual"] = round(row["Quantidade"] * preco_atual, 2)
-
-                if row["Total Investido"] > 0:
-                    rentabilidade = ((df.at[idx, "Valor Atual"] - row["Total Investido"]) / row[
-                        "Total Investido"]) * 100
-                    df.at[idx, "Rentabilidade"] = round(rentabilidade, 2)
-        except Exception as e:
-            logging.error(f"Erro ao processar {ticker}: {str(e)}")
-            continue
-
-    return df
+        return
+    btn_exportar.config(text="✖ Cancelar PDF")
+    acompanhar_exportacao()
+
+
+def acompanhar_exportacao():
+    if not exportacao_pdf.concluida():
+        status_var.set(f"Exportando PDF... {exportacao_pdf.progresso:.0%}")
+        janela.after(200, acompanhar_exportacao)
+        return
+    btn_exportar.config(text="📄 Exportar PDF")
+    if exportacao_pdf.erro is not None:
+        status_var.set("Falha ao exportar PDF")
+        messagebox.showerror("Erro", f"Falha ao exportar PDF:\n{str(exportacao_pdf.erro)}")
+    elif exportacao_pdf.caminho:
+        status_var.set("PDF exportado")
+        messagebox.showinfo("Sucesso", f"PDF exportado para:\n{exportacao_pdf.caminho}")
+    else:
+        status_var.set("Exportação do PDF cancelada")
 
 
 # ====================== INTERFACE GRÁFICA ======================
@@ -203,6 +129,13 @@ df["Valor Atual"] = 0
 df["Rentabilidade"] = 0.0
 df["PT Bazin"] = pd.to_numeric(df["Dividendos/Ação"], errors="coerce") * (100 / 6)
 df["PT Bazin"] = df["PT Bazin"].round(2)
+diario_carteira.indexar(df)
+# A partir daqui a carteira só é lida pelo snapshot atual e alterada com
+# estado_carteira.alterar: threads de fundo nunca veem uma versão pela metade
+estado_carteira = EstadoCarteira(df)
+agregados_carteira = AgregadosCarteira()
+agregados_carteira.sincronizar(df)
+perfil.marcar("dados_carregados")
 
 # Interface principal
 janela = tk.Tk()
@@ -229,7 +162,7 @@ btn_exportar = tk.Button(frame_botoes, text="📄 Exportar PDF", command=exporta
 btn_exportar.pack(fill="x", pady=5)
 
 btn_atualizar = tk.Button(frame_botoes, text="🔄 Atualizar Cotações",
-                          command=lambda: threading.Thread(target=inicializar_precos, daemon=True).start(),
+                          command=lambda: inicializar_precos(),
                           bg="#1f2937", fg="white", relief="flat", font=("Segoe UI", 10))
 btn_atualizar.pack(fill="x", pady=5)
 
@@ -293,51 +226,193 @@ tabela_acoes.pack(side="left", fill="both", expand=True)
 scroll_y.pack(side="right", fill="y")
 scroll_x.pack(side="bottom", fill="x")
 
+formatador_tabela = FormatadorValores()
+tabela_incremental = TabelaIncremental(tabela_acoes, colunas_para_mostrar)
+# Carteiras muito grandes: só as linhas visíveis existem no Treeview
+tabela_virtual = None
+if len(estado_carteira.df) > LIMITE_TABELA_VIRTUAL:
+    tabela_virtual = TabelaVirtual(tabela_acoes, scroll_y, colunas_para_mostrar)
+
 
 def atualizar_tabela():
-    for i in tabela_acoes.get_children():
-        tabela_acoes.delete(i)
-    df_exibicao = df.apply(formatar_valores, axis=1)
-    for idx, row in df_exibicao.iterrows():
-        valores = [row[col] for col in colunas_para_mostrar]
-        rentabilidade_valor = df.loc[idx, "Rentabilidade"]
-        preco_atual = pd.to_numeric(df.loc[idx, "Preço Atual"], errors="coerce")
-        pt_bazin = pd.to_numeric(df.loc[idx, "PT Bazin"], errors="coerce")
-        if not pd.isna(preco_atual) and not pd.isna(pt_bazin) and preco_atual < pt_bazin:
-            tag = "barato"
-        else:
-            tag = "positivo" if rentabilidade_valor > 0 else "negativo"
-        tabela_acoes.insert("", "end", values=valores, tags=(tag,))
-
-
-def verificar_alertas_bazin():
-    oportunidades = []
-    for idx, row in df.iterrows():
-        preco_atual = pd.to_numeric(row["Preço Atual"], errors="coerce")
-        pt_bazin = pd.to_numeric(row["PT Bazin"], errors="coerce")
-        if not pd.isna(preco_atual) and not pd.isna(pt_bazin) and preco_atual <= pt_bazin:
-            oportunidades.append(f"{row['Papel']} (Atual: R$ {preco_atual:.2f} | Teto Bazin: R$ {pt_bazin:.2f})")
-    if oportunidades:
-        mensagem = "Atenção! Oportunidades abaixo do PT Bazin:\n\n" + "\n".join(oportunidades)
-        janela.after(0, lambda: messagebox.showinfo("Oportunidade", mensagem))
+    df = estado_carteira.df
+    if tabela_virtual is not None:
+        tabela_virtual.atualizar(df)
+        return
+    # Só as linhas cujo valor ou cor mudou são tocadas no Treeview
+    df_exibicao = formatador_tabela.formatar(df)
+    tabela_incremental.atualizar(df_exibicao, calcular_tags(df))
+
+
+# Alertas de PT Bazin: só as linhas com preço novo são examinadas, e cada
+# ativo alerta uma vez ao cruzar o teto, numa janela única e não modal
+motor_alertas = MotorAlertasBazin()
+
+
+class NotificacaoAlertas:
+    # Uma única janela não modal com os alertas; os novos entram no topo
+    # da lista em vez de abrir uma caixa de mensagem por atualização. Embaixo,
+    # os ativos abaixo do teto agora, do mais barato ao mais caro (índice do motor).
+    def __init__(self, janela, titulo="Oportunidade"):
+        self.janela = janela
+        self.titulo = titulo
+        self._topo = None
+        self._lista = None
+        self._abaixo = None
+
+    def _criar(self):
+        self._topo = tk.Toplevel(self.janela)
+        self._topo.title(self.titulo)
+        self._topo.geometry("480x420")
+        tk.Label(self._topo, text="Atenção! Oportunidades abaixo do PT Bazin:",
+                 font=("Segoe UI", 10, "bold")).pack(padx=10, pady=(10, 5), anchor="w")
+        self._lista = tk.Listbox(self._topo, font=("Segoe UI", 9))
+        self._lista.pack(fill="both", expand=True, padx=10)
+        tk.Label(self._topo, text="Abaixo do teto agora (preço / PT Bazin):",
+                 font=("Segoe UI", 10, "bold")).pack(padx=10, pady=(10, 5), anchor="w")
+        self._abaixo = tk.Listbox(self._topo, font=("Segoe UI", 9))
+        self._abaixo.pack(fill="both", expand=True, padx=10)
+        tk.Button(self._topo, text="Fechar", command=self._topo.destroy).pack(pady=8)
+
+    def mostrar(self, alertas, abaixo=()):
+        # Sem alertas novos, só atualiza a lista de baixo se a janela estiver aberta
+        aberta = self._topo is not None and self._topo.winfo_exists()
+        if not alertas and not aberta:
+            return
+        if not aberta:
+            self._criar()
+        hora = datetime.now().strftime("%H:%M")
+        for alerta in alertas:
+            self._lista.insert(0, f"{hora}  {texto_alerta(alerta)}")
+        self._abaixo.delete(0, tk.END)
+        for papel, razao in abaixo:
+            self._abaixo.insert(tk.END, f"{papel}  {razao:.0%}")
+        if alertas:
+            self._topo.deiconify()
+            self._topo.lift()
+
+
+notificacao_alertas = NotificacaoAlertas(janela)
+
+
+# ====================== FILA DE COTAÇÕES ======================
+# A thread de atualização só produz: põe na fila cada parte de cotações que
+# chega. A thread do Tk consome a fila a cada INTERVALO_FILA_INTERFACE ms e
+# redesenha só as linhas dos tickers recebidos.
+fila_interface = queue.Queue()
+posicoes_tickers = None  # (índice da carteira, {ticker: posições})
 
 
 def inicializar_precos():
+    status_var.set("Atualizando cotações...")
+    tickers = tickers_da_carteira(estado_carteira.df).unique()
+
     def tarefa():
         try:
-            global df
-            df = atualizar_dados_financeiros(df)
-            janela.after(0, atualizar_tabela)
-            janela.after(0, verificar_alertas_bazin)
-            janela.after(0, lambda: status_var.set("Cotações atualizadas!"))
+            cache_cotacoes.obter_cotacoes(tickers, ao_receber=lambda parte: fila_interface.put(("cotacoes", parte)))
+            fila_interface.put(("fim", None))
             logging.info("Cotações atualizadas")
+            if historico_precos is not None:
+                # Só os pregões que faltam desde a última atualização
+                historico_precos.atualizar_varios(tickers)
         except Exception as e:
             logging.error(f"Erro ao atualizar cotações: {str(e)}", exc_info=True)
-            janela.after(0, lambda: messagebox.showerror("Erro", "Erro ao atualizar dados"))
+            fila_interface.put(("erro", str(e)))
 
     threading.Thread(target=tarefa, daemon=True).start()
 
 
+def receber_do_agendador(parte):
+    # Thread do agendador: cada parte das cotações vai para a fila assim que chega
+    fila_interface.put(("cotacoes", parte))
+
+
+def fim_do_ciclo_agendador(tickers):
+    fila_interface.put(("fim", None))
+
+
+def aplicar_cotacoes_recebidas(cotacoes):
+    # Uma nova versão da carteira com as cotações recebidas; devolve as linhas alteradas
+    precos = {t: c['preco'] for t, c in cotacoes.items() if c and c.get('preco')}
+
+    def aplicar(df):
+        global posicoes_tickers
+        # O mapa ticker -> linhas só é refeito quando linhas entram ou saem da carteira
+        if posicoes_tickers is None or not posicoes_tickers[0].equals(df.index):
+            posicoes_tickers = (df.index, posicoes_por_ticker(df))
+        return aplicar_cotacoes_parciais(df, precos, posicoes_tickers[1])
+
+    return estado_carteira.alterar(aplicar)
+
+
+def atualizar_linhas_tabela(linhas):
+    df = estado_carteira.df
+    if tabela_virtual is not None:
+        tabela_virtual.atualizar(df)  # só a fatia visível é formatada
+    elif len(tabela_incremental) != len(df):
+        atualizar_tabela()
+    else:
+        parte = df.iloc[linhas]
+        tabela_incremental.atualizar_linhas(linhas, formatador_tabela.formatar_linhas(parte),
+                                            calcular_tags(parte))
+
+
+def acrescentar_linha_tabela():
+    # Ativo adicionado: só a última linha da carteira entra no Treeview
+    df = estado_carteira.df
+    if tabela_virtual is not None:
+        tabela_virtual.atualizar(df)
+    elif len(tabela_incremental) != len(df) - 1:
+        atualizar_tabela()
+    else:
+        parte = df.iloc[[-1]]
+        tabela_incremental.acrescentar(formatador_tabela.formatar_linhas(parte), calcular_tags(parte))
+
+
+def remover_linha_tabela(posicao):
+    df = estado_carteira.df
+    if tabela_virtual is not None:
+        tabela_virtual.atualizar(df)
+    elif len(tabela_incremental) != len(df) + 1:
+        atualizar_tabela()
+    else:
+        tabela_incremental.remover_linha(posicao)
+
+
+def processar_fila_interface():
+    # Tudo o que chegou desde o último tique vira uma única versão da carteira
+    recebidas = {}
+    finalizada = False
+    try:
+        while True:
+            tipo, conteudo = fila_interface.get_nowait()
+            if tipo == "cotacoes":
+                recebidas.update(conteudo)
+            elif tipo == "fim":
+                finalizada = True
+            elif tipo == "erro":
+                status_var.set("Erro ao atualizar cotações")
+                messagebox.showerror("Erro", "Erro ao atualizar dados")
+    except queue.Empty:
+        pass
+
+    try:
+        if recebidas:
+            linhas = aplicar_cotacoes_recebidas(recebidas)
+            if len(linhas):
+                parte = estado_carteira.df.iloc[linhas]
+                atualizar_linhas_tabela(linhas)
+                # Totais acompanham cada preço que chega, só pelas linhas alteradas
+                agregados_carteira.atualizar_linhas(parte)
+                atualizar_texto_analise()
+                notificacao_alertas.mostrar(motor_alertas.atualizar(parte), motor_alertas.papeis_abaixo_de(1.0))
+    except Exception as e:
+        logging.error(f"Erro ao aplicar cotações: {str(e)}", exc_info=True)
+    if finalizada:
+        status_var.set("Cotações atualizadas!")
+    janela.after(INTERVALO_FILA_INTERFACE, processar_fila_interface)
+
+
 def mostrar_secao(secao):
     for f in frames_secoes.values():
         f.pack_forget()
@@ -350,68 +425,38 @@ def mostrar_secao(secao):
         montar_aba_edicao()
 
 
+rotulo_analise = None
+
+
 def atualizar_analise():
+    global rotulo_analise
     frame = frames_secoes["Análise Geral"]
     for widget in frame.winfo_children():
         widget.destroy()
 
-    total_investido = df["Total Investido"].sum()
-    valor_atual = df["Valor Atual"].sum()
-    rentabilidade_media = df["Rentabilidade"].mean()
-    positivos = df[df["Rentabilidade"] > 0].shape[0]
-    negativos = df[df["Rentabilidade"] <= 0].shape[0]
-    top_rent = df.sort_values("Rentabilidade", ascending=False).head(3)[["Papel", "Rentabilidade"]]
-    top_div = df.sort_values("Dividendos", ascending=False).head(3)[["Papel", "Dividendos"]]
+    # Totais e rankings já mantidos pelos agregados: nada de reler a carteira
+    resumo = agregados_carteira.texto()
+    rotulo_analise = tk.Label(frame, text=resumo, justify="left", font=("Courier New", 10))
+    rotulo_analise.pack(padx=20, pady=20)
 
-    resumo = f"""📊 ANÁLISE GERAL
 
-💰 Total Investido: R$ {total_investido:,.2f}
-📈 Valor Atual: R$ {valor_atual:,.2f}
-📊 Rent. Média: {rentabilidade_media:.2f}%
-🟢 Positivos: {positivos} | 🔴 Negativos: {negativos}
+def atualizar_texto_analise():
+    # Com a Análise Geral já montada, o texto acompanha as cotações que chegam
+    if rotulo_analise is not None and rotulo_analise.winfo_exists():
+        rotulo_analise.config(text=agregados_carteira.texto())
 
-🥇 Top Rentabilidade:
-{top_rent.to_string(index=False)}
 
-💵 Top Dividendos:
-{top_div.to_string(index=False)}"""
-
-    tk.Label(frame, text=resumo, justify="left", font=("Courier New", 10)).pack(padx=20, pady=20)
+painel_graficos = None
 
 
 def atualizar_graficos():
-    frame = frames_secoes["Gráficos"]
-    for widget in frame.winfo_children():
-        widget.destroy()
-
+    # Painel criado na primeira visita; as imagens são renderizadas fora da thread da interface
+    global painel_graficos
     try:
-        notebook = ttk.Notebook(frame)
-        notebook.pack(fill="both", expand=True)
-
-        # Gráfico de Rentabilidade
-        frame_rent = ttk.Frame(notebook)
-        fig1 = plt.Figure(figsize=(10, 4), dpi=100)
-        ax1 = fig1.add_subplot(111)
-        df.plot.bar(x='Papel', y='Rentabilidade', ax=ax1, color='skyblue')
-        ax1.set_title('Rentabilidade por Ativo (%)')
-        ax1.tick_params(axis='x', rotation=45)
-        canvas1 = FigureCanvasTkAgg(fig1, master=frame_rent)
-        canvas1.draw()
-        canvas1.get_tk_widget().pack(fill='both', expand=True)
-        notebook.add(frame_rent, text="Rentabilidade")
-
-        # Gráfico de Distribuição
-        frame_dist = ttk.Frame(notebook)
-        fig2 = plt.Figure(figsize=(10, 4), dpi=100)
-        ax2 = fig2.add_subplot(111)
-        df.plot.pie(y='Valor Atual', labels=df['Papel'], ax=ax2, autopct='%1.1f%%')
-        ax2.set_title('Distribuição da Carteira')
-        ax2.set_ylabel('')
-        canvas2 = FigureCanvasTkAgg(fig2, master=frame_dist)
-        canvas2.draw()
-        canvas2.get_tk_widget().pack(fill='both', expand=True)
-        notebook.add(frame_dist, text="Distribuição")
-
+        if painel_graficos is None:
+            from graficos import PainelGraficos
+            painel_graficos = PainelGraficos(frames_secoes["Gráficos"])
+        painel_graficos.atualizar(estado_carteira.df)
     except Exception as e:
         messagebox.showerror("Erro", f"Falha ao gerar gráficos:\n{str(e)}")
 
@@ -438,8 +483,8 @@ def montar_aba_edicao():
         tk.Entry(form, textvariable=var).grid(row=i, column=1, pady=2)
 
     def adicionar():
-        global df
         novo = {k: v.get() for k, v in campos.items()}
+        novo["Papel"] = novo["Papel"].strip()
         novo["Preço Atual"] = np.nan
         novo["Valor Atual"] = 0
         novo["Total Investido"] = novo["Preço Médio"] * novo["Quantidade"]
@@ -448,12 +493,88 @@ def montar_aba_edicao():
         novo["Dividendos/Ação"] = 0.0
         novo["PT Bazin"] = round((novo["Dividendos/Ação"] * 100 / 6), 2)
 
-        df = pd.concat([df, pd.DataFrame([novo])], ignore_index=True)
-        salvar_dados()
-        atualizar_tabela()
+        # Grava só o registro no diário e publica a nova versão da carteira;
+        # agregados e tabela recebem só a linha nova
+        try:
+            estado_carteira.alterar(lambda df: diario_carteira.adicionar(df, novo))
+        except ValueError as e:
+            messagebox.showerror("Erro", str(e))
+            return
+        agregados_carteira.atualizar_linha(diario_carteira.rotulo(novo["Papel"]), novo["Papel"],
+                                           novo["Total Investido"], novo["Valor Atual"],
+                                           novo["Rentabilidade"], novo["Dividendos"])
+        acrescentar_linha_tabela()
         messagebox.showinfo("Sucesso", f"{novo['Papel']} adicionado!")
 
     tk.Button(form, text="Adicionar", command=adicionar).grid(row=len(campos), columnspan=2, pady=10)
+
+    tk.Label(frame, text="✏️ Atualizar Ativo", font=("Segoe UI", 11, "bold")).pack(pady=10)
+    form_atualizar = tk.Frame(frame)
+    form_atualizar.pack(pady=5)
+    campos_atualizar = {
+        "Papel": tk.StringVar(),
+        "Quantidade": tk.IntVar(),
+        "Preço Médio": tk.DoubleVar()
+    }
+    for i, (label, var) in enumerate(campos_atualizar.items()):
+        tk.Label(form_atualizar, text=label).grid(row=i, column=0, sticky="e", padx=5, pady=2)
+        tk.Entry(form_atualizar, textvariable=var).grid(row=i, column=1, pady=2)
+
+    def atualizar_ativo():
+        papel = campos_atualizar["Papel"].get().strip()
+        rotulo = diario_carteira.rotulo(papel)
+        if rotulo is None:
+            messagebox.showerror("Erro", f"{papel} não está na carteira")
+            return
+        try:
+            quantidade = campos_atualizar["Quantidade"].get()
+            preco_medio = campos_atualizar["Preço Médio"].get()
+        except tk.TclError:
+            messagebox.showerror("Erro", "Quantidade e Preço Médio devem ser números")
+            return
+        campos_novos = {"Quantidade": quantidade, "Preço Médio": preco_medio,
+                        "Total Investido": round(preco_medio * quantidade, 2)}
+        posicao = estado_carteira.df.index.get_loc(rotulo)
+
+        def aplicar(df):
+            diario_carteira.atualizar(df, papel, **campos_novos)
+            # Com cotação já recebida, Valor Atual e Rentabilidade são refeitos só nesta linha
+            preco = df.at[rotulo, "Preço Atual"]
+            if pd.notna(preco) and preco:
+                ticker = tickers_da_carteira(df.iloc[[posicao]]).iloc[0]
+                aplicar_cotacoes_parciais(df, {ticker: preco}, {ticker: np.array([posicao])})
+
+        estado_carteira.alterar(aplicar)
+        linha = estado_carteira.df.iloc[posicao]
+        agregados_carteira.atualizar_linha(rotulo, papel, linha["Total Investido"], linha["Valor Atual"],
+                                           linha["Rentabilidade"], linha["Dividendos"])
+        atualizar_linhas_tabela([posicao])
+        messagebox.showinfo("Sucesso", f"{papel} atualizado!")
+
+    tk.Button(form_atualizar, text="Atualizar", command=atualizar_ativo).grid(row=len(campos_atualizar),
+                                                                             columnspan=2, pady=10)
+
+    tk.Label(frame, text="➖ Remover Ativo", font=("Segoe UI", 11, "bold")).pack(pady=10)
+    form_remover = tk.Frame(frame)
+    form_remover.pack(pady=5)
+    papel_remover = tk.StringVar()
+    tk.Label(form_remover, text="Papel").grid(row=0, column=0, sticky="e", padx=5, pady=2)
+    tk.Entry(form_remover, textvariable=papel_remover).grid(row=0, column=1, pady=2)
+
+    def remover():
+        papel = papel_remover.get().strip()
+        rotulo = diario_carteira.rotulo(papel)
+        if rotulo is None:
+            messagebox.showerror("Erro", f"{papel} não está na carteira")
+            return
+        posicao = estado_carteira.df.index.get_loc(rotulo)
+        estado_carteira.alterar(lambda df: diario_carteira.remover(df, papel))
+        agregados_carteira.remover(rotulo)
+        motor_alertas.remover([rotulo])
+        remover_linha_tabela(posicao)
+        messagebox.showinfo("Sucesso", f"{papel} removido!")
+
+    tk.Button(form_remover, text="Remover", command=remover).grid(row=1, columnspan=2, pady=10)
     tk.Button(frame, text="🔄 Limpar Cache", command=cache_cotacoes.limpar_cache).pack(pady=10)
 
 
@@ -463,8 +584,29 @@ status_var.set("Pronto")
 status_bar = tk.Label(janela, textvariable=status_var, bd=1, relief="sunken", anchor="w")
 status_bar.pack(side="bottom", fill="x")
 
-# Inicialização
+# Agendador: durante o pregão atualiza só as cotações vencidas, das maiores
+# posições para as menores; com o mercado fechado não busca nada
+agendador_cotacoes = AgendadorCotacoes(cache_cotacoes, lambda: pesos_da_carteira(estado_carteira.df))
+
+
+def fechar_janela():
+    agendador_cotacoes.parar()
+    cache_cotacoes.fechar()
+    diario_carteira.fechar()
+    janela.destroy()
+
+
+janela.protocol("WM_DELETE_WINDOW", fechar_janela)
+
+# Inicialização: a tabela aparece com os dados salvos antes de buscar as cotações
 mostrar_secao("Ações")
+atualizar_tabela()
+if perfil.ativo:
+    janela.update()
+    perfil.marcar("primeira_tabela_visivel")
+    perfil.finalizar()
+processar_fila_interface()
 inicializar_precos()
+agendador_cotacoes.iniciar(ao_atualizar=fim_do_ciclo_agendador, ao_receber=receber_do_agendador)
 
 janela.mainloop()
\ No newline at end of file
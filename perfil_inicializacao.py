@@ -0,0 +1,112 @@
+import sys
+import time
+import logging
+import importlib.abc
+
+# Perfil de inicialização, ativado com --startup-profile na linha de comando:
+#   python monitor_investimentos.py --startup-profile
+#   streamlit run main.py -- --startup-profile
+# Mede o tempo de import de cada módulo (acumulado e próprio, como o
+# "python -X importtime") e marcos como a primeira tabela visível.
+# Precisa ser importado antes de qualquer outro módulo da aplicação.
+
+_INICIO = time.perf_counter()
+
+
+class _CarregadorCronometrado:
+    def __init__(self, carregador, perfil):
+        self._carregador = carregador
+        self._perfil = perfil
+
+    def create_module(self, spec):
+        return self._carregador.create_module(spec)
+
+    def exec_module(self, modulo):
+        self._perfil._entrar()
+        inicio = time.perf_counter()
+        try:
+            self._carregador.exec_module(modulo)
+        finally:
+            self._perfil._sair(modulo.__name__, time.perf_counter() - inicio)
+
+    def __getattr__(self, nome):
+        return getattr(self._carregador, nome)
+
+
+class _LocalizadorCronometrado(importlib.abc.MetaPathFinder):
+    def __init__(self, perfil):
+        self._perfil = perfil
+
+    def find_spec(self, nome, caminho, alvo=None):
+        for localizador in sys.meta_path:
+            if localizador is self or not hasattr(localizador, "find_spec"):
+                continue
+            spec = localizador.find_spec(nome, caminho, alvo)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _CarregadorCronometrado(spec.loader, self._perfil)
+            return spec
+        return None
+
+
+class PerfilInicializacao:
+    def __init__(self, ativo=False):
+        self.ativo = ativo
+        self.imports = {}
+        self.marcos = []
+        self._filhos = []
+        self._finalizado = False
+        self._localizador = None
+        if ativo:
+            self.instalar()
+
+    def instalar(self):
+        if self._localizador is None:
+            self._localizador = _LocalizadorCronometrado(self)
+            sys.meta_path.insert(0, self._localizador)
+
+    def desinstalar(self):
+        if self._localizador is not None:
+            sys.meta_path.remove(self._localizador)
+            self._localizador = None
+
+    def _entrar(self):
+        self._filhos.append(0.0)
+
+    def _sair(self, nome, acumulado):
+        filhos = self._filhos.pop()
+        if self._filhos:
+            self._filhos[-1] += acumulado
+        self.imports[nome] = (acumulado, acumulado - filhos)
+
+    def marcar(self, nome):
+        if self.ativo:
+            self.marcos.append((nome, time.perf_counter() - _INICIO))
+
+    def relatorio(self, limite=15):
+        linhas = ["Perfil de inicialização", "", "Imports mais lentos (acumulado / próprio, ms):"]
+        # Só módulos de primeiro nível: o tempo dos submódulos já está no acumulado do pacote
+        raizes = {n: t for n, t in self.imports.items() if "." not in n}
+        for nome, (acumulado, proprio) in sorted(raizes.items(), key=lambda i: -i[1][0])[:limite]:
+            linhas.append(f"  {nome:<32} {acumulado * 1000:>9.1f} {proprio * 1000:>9.1f}")
+        total = sum(t[1] for t in self.imports.values())
+        linhas.append(f"  {'(total em imports)':<32} {total * 1000:>9.1f}")
+        if self.marcos:
+            linhas += ["", "Marcos (ms desde o início):"]
+            for nome, instante in self.marcos:
+                linhas.append(f"  {nome:<32} {instante * 1000:>9.1f}")
+        return "\n".join(linhas)
+
+    def finalizar(self):
+        # Imprime o relatório uma única vez e para de medir
+        if not self.ativo or self._finalizado:
+            return
+        self._finalizado = True
+        self.desinstalar()
+        texto = self.relatorio()
+        print(texto, file=sys.stderr)
+        logging.info(texto)
+
+
+perfil = PerfilInicializacao(ativo="--startup-profile" in sys.argv)
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from datetime import timedelta
+
+
+class ErroProvedor(Exception):
+    pass
+
+
+# Interface dos provedores de cotações usados pelo CotacaoCache.
+# buscar devolve {'preco': ..., 'variacao': ...}; buscar_lote devolve
+# {ticker: cotacao} e pode omitir tickers que não conseguiu trazer.
+# buscar_historico devolve um DataFrame diário (índice de datas; colunas Open,
+# High, Low, Close, Volume) entre inicio e fim, inclusive.
+class ProvedorCotacoes:
+    def buscar(self, ticker):
+        raise NotImplementedError
+
+    def buscar_historico(self, ticker, inicio, fim):
+        raise NotImplementedError
+
+    def buscar_lote(self, tickers):
+        cotacoes = {}
+        for ticker in tickers:
+            try:
+                cotacoes[ticker] = self.buscar(ticker)
+            except Exception as e:
+                logging.warning(f"Falha ao buscar {ticker}: {str(e)}")
+        return cotacoes
+
+
+class ProvedorYFinance(ProvedorCotacoes):
+    # period="5d": com um único pregão o pct_change não tem com o que comparar
+    def buscar(self, ticker):
+        import yfinance as yf
+        dados = yf.Ticker(ticker).history(period="5d")
+        return {
+            'preco': round(dados['Close'].iloc[-1], 2),
+            'variacao': round(dados['Close'].pct_change().iloc[-1] * 100, 2)
+        }
+
+    def buscar_lote(self, tickers):
+        import pandas as pd
+        import yfinance as yf
+        # Uma única chamada ao provedor para todos os tickers
+        dados = yf.download(list(tickers), period="5d", group_by="ticker",
+                            progress=False, threads=True)
+        cotacoes = {}
+        if dados is None or dados.empty:
+            return cotacoes
+        for ticker in tickers:
+            try:
+                if isinstance(dados.columns, pd.MultiIndex):
+                    fechamento = dados[ticker]["Close"].dropna()
+                else:
+                    fechamento = dados["Close"].dropna()
+            except KeyError:
+                continue
+            if fechamento.empty:
+                continue
+            cotacoes[ticker] = {
+                'preco': round(float(fechamento.iloc[-1]), 2),
+                'variacao': round(float(fechamento.pct_change().iloc[-1]) * 100, 2)
+            }
+        return cotacoes
+
+    def buscar_historico(self, ticker, inicio, fim):
+        import yfinance as yf
+        # O "end" do yfinance é exclusivo
+        dados = yf.Ticker(ticker).history(start=inicio.isoformat(), end=(fim + timedelta(days=1)).isoformat(),
+                                          interval="1d", auto_adjust=False)
+        return dados[["Open", "High", "Low", "Close", "Volume"]]
+
+
+class ProvedorReplay(ProvedorCotacoes):
+    # Provedor local e determinístico para testes e benchmarks sem rede.
+    # Serve as séries gravadas em disco ({ticker: [preços]}) em ordem, voltando
+    # ao início quando acabam; tickers sem série recebem um passeio aleatório
+    # sintético derivado da semente. A latência (por chamada) e a taxa de
+    # falhas são artificiais e configuráveis.
+    def __init__(self, caminho=None, latencia=0.0, latencia_lote=None, taxa_falhas=0.0, semente=0):
+        self.latencia = latencia
+        self.latencia_lote = latencia if latencia_lote is None else latencia_lote
+        self.taxa_falhas = taxa_falhas
+        self.semente = semente
+        self.series = carregar_series(caminho) if caminho else {}
+        self._estado = {}
+        self._lock = threading.Lock()
+        self.chamadas = 0
+        self.chamadas_historico = 0
+
+    def _proximo(self, ticker):
+        with self._lock:
+            self.chamadas += 1
+            posicao, anterior, gerador = self._estado.get(ticker, (0, None, None))
+            if self._falhou(ticker, posicao):
+                self._estado[ticker] = (posicao + 1, anterior, gerador)
+                raise ErroProvedor(f"Falha simulada para {ticker}")
+
+            serie = self.series.get(ticker)
+            if serie:
+                preco = float(serie[posicao % len(serie)])
+            else:
+                if gerador is None:
+                    gerador = random.Random(f"{self.semente}:{ticker}")
+                    preco = gerador.uniform(5, 100)
+                else:
+                    preco = anterior * (1 + gerador.gauss(0, 0.01))
+            self._estado[ticker] = (posicao + 1, preco, gerador)
+
+        variacao = (preco / anterior - 1) * 100 if anterior else float("nan")
+        return {'preco': round(preco, 2), 'variacao': round(variacao, 2)}
+
+    def _falhou(self, ticker, posicao):
+        if not self.taxa_falhas:
+            return False
+        return random.Random(f"{self.semente}:{ticker}:{posicao}:falha").random() < self.taxa_falhas
+
+    def buscar(self, ticker):
+        if self.latencia:
+            time.sleep(self.latencia)
+        return self._proximo(ticker)
+
+    def buscar_lote(self, tickers):
+        if self.latencia_lote:
+            time.sleep(self.latencia_lote)
+        cotacoes = {}
+        for ticker in tickers:
+            try:
+                cotacoes[ticker] = self._proximo(ticker)
+            except ErroProvedor:
+                continue
+        return cotacoes
+
+    def buscar_historico(self, ticker, inicio, fim):
+        # Um pregão por dia útil; o preço de cada data depende só da semente,
+        # do ticker e da data, então intervalos pedidos em partes coincidem
+        import numpy as np
+        import pandas as pd
+        with self._lock:
+            self.chamadas_historico += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        datas = pd.bdate_range(inicio, fim)
+        base = random.Random(f"{self.semente}:{ticker}").uniform(5, 100)
+        dia = datas.to_numpy().astype("datetime64[D]").astype(np.int64)
+        fechamento = base * (1 + 0.2 * np.sin(dia / 30.0)) * (1 + 0.01 * np.cos(dia * 1.7))
+        abertura = fechamento * (1 + 0.005 * np.sin(dia * 0.9))
+        return pd.DataFrame({
+            "Open": abertura.round(2),
+            "High": (np.maximum(abertura, fechamento) * 1.01).round(2),
+            "Low": (np.minimum(abertura, fechamento) * 0.99).round(2),
+            "Close": fechamento.round(2),
+            "Volume": (1000 + (dia * 7919) % 100000).astype(float),
+        }, index=datas)
+
+
+class GravadorCotacoes(ProvedorCotacoes):
+    # Repassa as chamadas a outro provedor e grava os preços recebidos,
+    # para depois reproduzi-los com o ProvedorReplay
+    def __init__(self, provedor, caminho):
+        self.provedor = provedor
+        self.caminho = caminho
+        self.series = carregar_series(caminho) if os.path.exists(caminho) else {}
+        self._lock = threading.Lock()
+
+    def _gravar(self, cotacoes):
+        with self._lock:
+            for ticker, cotacao in cotacoes.items():
+                if cotacao and cotacao.get('preco') is not None:
+                    self.series.setdefault(ticker, []).append(cotacao['preco'])
+
+    def buscar(self, ticker):
+        cotacao = self.provedor.buscar(ticker)
+        self._gravar({ticker: cotacao})
+        return cotacao
+
+    def buscar_lote(self, tickers):
+        cotacoes = self.provedor.buscar_lote(tickers)
+        self._gravar(cotacoes)
+        return cotacoes
+
+    def salvar(self):
+        with self._lock:
+            salvar_series(self.caminho, self.series)
+
+
+def carregar_series(caminho):
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def salvar_series(caminho, series):
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(series, f, separators=(",", ":"))
+
+
+def criar_provedor(nome, **opcoes):
+    if nome == "yfinance":
+        return ProvedorYFinance()
+    if nome == "replay":
+        return ProvedorReplay(**opcoes)
+    raise ValueError(f"Provedor de cotações desconhecido: {nome}")
@@ -1,35 +1,158 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+import io
+import os
+import logging
+import tempfile
+import threading
+
 from tkinter import messagebox
 
-def exportar_pdf(df):
-    try:
-        df_exportar = df.copy()
-        df_exportar = df_exportar[["Papel", "Empresa", "Preço Médio", "Preço Atual",
-                                   "Quantidade", "Total Investido", "Valor Atual",
-                                   "Dividendos", "Dividendos/Ação", "Rentabilidade"]]
+CAMINHO_RELATORIO = "relatorio_acoes.pdf"
+COLUNAS_RELATORIO = ["Papel", "Empresa", "Preço Médio", "Preço Atual",
+                     "Quantidade", "Total Investido", "Valor Atual",
+                     "Dividendos", "Dividendos/Ação", "Rentabilidade"]
+
+# Mesma paginação do relatório original: linhas a cada 20pt, de y=750
+# (primeira página, abaixo do cabeçalho) ou y=800 até y=50
+ALTURA_LINHA = 20
+LINHAS_PRIMEIRA_PAGINA = 36
+LINHAS_POR_PAGINA = 38
+
+
+def _paginas(total):
+    inicio, tamanho = 0, LINHAS_PRIMEIRA_PAGINA
+    while inicio < total:
+        yield inicio, min(inicio + tamanho, total)
+        inicio += tamanho
+        tamanho = LINHAS_POR_PAGINA
+
+
+def _textos(pagina):
+    # str() de cada célula, convertido coluna a coluna pelo numpy
+    return [pagina[coluna].to_numpy().astype(str) for coluna in pagina.columns]
+
+
+def _desenhar_pagina(c, pagina, y):
+    # Um objeto de texto por coluna em vez de um drawString por célula
+    for i, valores in enumerate(_textos(pagina)):
+        texto = c.beginText(50 + i * 100, y)
+        texto.setFont("Helvetica", 8)
+        texto.setLeading(ALTURA_LINHA)
+        for valor in valores:
+            texto.textLine(valor)
+        c.drawText(texto)
+
+
+def _desenhar_graficos(c, imagens):
+    # Página final com os PNGs do cache de gráficos (1000x400 px), um abaixo do outro
+    from reportlab.lib.utils import ImageReader
+    c.showPage()
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, 800, "Gráficos")
+    for y, tipo in [(570, "rentabilidade"), (330, "distribuicao")]:
+        if tipo in imagens:
+            c.drawImage(ImageReader(io.BytesIO(imagens[tipo])), 50, y, width=495, height=198)
+
+
+def gerar_pdf(df, pdf_path=CAMINHO_RELATORIO, progresso=None, cancelar=None, imagens=None):
+    # Formata e desenha uma página por vez. progresso(feitas, total) é chamado a
+    # cada página; se o evento cancelar for acionado, nada é gravado e devolve None.
+    # imagens ({tipo: png}, do cache de gráficos) acrescenta uma página com os gráficos.
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    df_exportar = df[COLUNAS_RELATORIO]
+    total = len(df_exportar)
 
-        pdf_path = "relatorio_acoes.pdf"
-        c = canvas.Canvas(pdf_path, pagesize=A4)
+    # Grava num temporário e renomeia: um PDF antigo nunca é substituído pela metade
+    diretorio = os.path.dirname(os.path.abspath(pdf_path))
+    fd, temporario = tempfile.mkstemp(dir=diretorio, prefix=".relatorio_", suffix=".pdf")
+    os.close(fd)
+    try:
+        c = canvas.Canvas(temporario, pagesize=A4)
         c.setFont("Helvetica-Bold", 14)
         c.drawString(50, 800, "Relatório de Ações")
 
         c.setFont("Helvetica-Bold", 10)
-        headers = df_exportar.columns
-        for i, header in enumerate(headers):
+        for i, header in enumerate(COLUNAS_RELATORIO):
             c.drawString(50 + i * 100, 770, header)
 
-        c.setFont("Helvetica", 8)
         y = 750
-        for _, row in df_exportar.iterrows():
-            for i, val in enumerate(row):
-                c.drawString(50 + i * 100, y, str(val))
-            y -= 20
-            if y < 50:
+        for inicio, fim in _paginas(total):
+            if cancelar is not None and cancelar.is_set():
+                os.remove(temporario)
+                logging.info("Exportação de PDF cancelada")
+                return None
+            if inicio:
                 c.showPage()
                 y = 800
+            _desenhar_pagina(c, df_exportar.iloc[inicio:fim], y)
+            if progresso is not None:
+                progresso(fim, total)
 
+        if imagens:
+            _desenhar_graficos(c, imagens)
         c.save()
+        os.replace(temporario, pdf_path)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    return pdf_path
+
+
+class ExportacaoPDF:
+    # Gera o relatório numa thread de fundo. A interface consulta progresso
+    # (0 a 1) e concluida() periodicamente e pode chamar cancelar().
+    def __init__(self, df, pdf_path=CAMINHO_RELATORIO, com_graficos=True):
+        # Cópia das colunas do relatório: a carteira pode mudar durante a exportação
+        self.df = df[COLUNAS_RELATORIO].copy()
+        self.pdf_path = pdf_path
+        self.com_graficos = com_graficos
+        self.progresso = 0.0
+        self.caminho = None
+        self.erro = None
+        self._cancelar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    @property
+    def cancelada(self):
+        return self._cancelar.is_set()
+
+    def concluida(self):
+        return self._thread.ident is not None and not self._thread.is_alive()
+
+    def aguardar(self, timeout=None):
+        self._thread.join(timeout)
+        return self.concluida()
+
+    def _atualizar(self, feitas, total):
+        self.progresso = feitas / total if total else 1.0
+
+    def _executar(self):
+        try:
+            imagens = None
+            if self.com_graficos:
+                from graficos import cache_imagens_padrao
+                imagens = cache_imagens_padrao().renderizar(self.df)
+            self.caminho = gerar_pdf(self.df, self.pdf_path, self._atualizar, self._cancelar, imagens)
+            if self.caminho:
+                self.progresso = 1.0
+                logging.info(f"PDF exportado para {self.caminho}")
+        except Exception as e:
+            self.erro = e
+            logging.error(f"Erro ao exportar PDF: {str(e)}", exc_info=True)
+
+
+def exportar_pdf(df):
+    try:
+        pdf_path = gerar_pdf(df)
         messagebox.showinfo("Sucesso", f"PDF exportado para:\n{pdf_path}")
     except Exception as e:
         messagebox.showerror("Erro", f"Falha ao exportar PDF:\n{str(e)}")
@@ -0,0 +1,293 @@
+import os
+import sys
+import json
+import socket
+import logging
+import threading
+import socketserver
+from datetime import date
+
+from config import ENDERECO_SERVIDOR_COTACOES, TIMEOUT_SERVIDOR_COTACOES
+from provedores import ProvedorCotacoes, ErroProvedor
+
+# Servidor local de cotações: um único processo é dono do provedor e do cache,
+# e as janelas do app Tk e as sessões do Streamlit são clientes dele. Com
+# qualquer número de clientes, cada ticker é buscado uma vez por validade.
+#   python servidor_cotacoes.py [host:porta | caminho do socket Unix]
+# Protocolo: uma mensagem JSON por linha, em UTF-8.
+#   {"op": "cotacoes", "tickers": [...]}       -> {"ok": true, "cotacoes": {ticker: dados}}
+#   {"op": "historico", "ticker", "inicio", "fim"} -> {"ok": true, "historico": {coluna: [...]}}
+#   {"op": "assinar", "tickers": [...]}        -> {"ok": true}; depois, a cada
+#       atualização do agendador: {"evento": "cotacoes", "cotacoes": {...}}
+#   {"op": "estatisticas"}                     -> {"ok": true, "estatisticas": {...}}
+# Erros: {"ok": false, "erro": "..."}
+
+COLUNAS_HISTORICO = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def interpretar_endereco(endereco):
+    # "host:porta" é TCP; qualquer outra coisa é o caminho de um socket Unix
+    host, separador, porta = endereco.rpartition(":")
+    if separador and porta.isdigit():
+        return socket.AF_INET, (host or "127.0.0.1", int(porta))
+    return socket.AF_UNIX, endereco
+
+
+def _linha(mensagem):
+    return (json.dumps(mensagem, default=str) + "\n").encode("utf-8")
+
+
+class _Conexao(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self._lock_envio = threading.Lock()
+
+    def enviar(self, mensagem):
+        # Respostas e eventos de assinatura saem de threads diferentes
+        with self._lock_envio:
+            self.wfile.write(_linha(mensagem))
+            self.wfile.flush()
+
+    def handle(self):
+        servidor = self.server.cotacoes
+        try:
+            for linha in self.rfile:
+                try:
+                    resposta = servidor.responder(json.loads(linha), self)
+                except Exception as e:
+                    logging.warning(f"Pedido inválido ao servidor de cotações: {str(e)}")
+                    resposta = {"ok": False, "erro": str(e)}
+                self.enviar(resposta)
+        except OSError:
+            pass
+        finally:
+            servidor.cancelar_assinatura(self)
+
+
+class _ServidorTCP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _ServidorUnix(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:
+    _ServidorUnix = None
+
+
+class ServidorCotacoes:
+    # Atende os clientes com um único CotacaoCache: pedidos simultâneos do
+    # mesmo ticker viram uma busca só (single-flight do cache). O agendador
+    # mantém frescos os tickers assinados e avisa os assinantes.
+    def __init__(self, cache=None, endereco=ENDERECO_SERVIDOR_COTACOES, com_agendador=True):
+        from agendador import AgendadorCotacoes, politica_validade_padrao
+        from cotacoes import CotacaoCache
+        self.cache = cache or CotacaoCache(politica=politica_validade_padrao())
+        familia, endereco = interpretar_endereco(endereco)
+        if familia == socket.AF_UNIX:
+            if _ServidorUnix is None:
+                raise ValueError("Sockets Unix não são suportados neste sistema")
+            if os.path.exists(endereco):
+                os.remove(endereco)
+            self._servidor = _ServidorUnix(endereco, _Conexao)
+        else:
+            self._servidor = _ServidorTCP(endereco, _Conexao)
+        self._servidor.cotacoes = self
+        self._assinaturas = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.agendador = AgendadorCotacoes(self.cache, self.pesos) if com_agendador else None
+
+    @property
+    def endereco(self):
+        # Texto no formato de ENDERECO_SERVIDOR_COTACOES (com a porta real, se era 0)
+        endereco = self._servidor.server_address
+        if isinstance(endereco, tuple):
+            return f"{endereco[0]}:{endereco[1]}"
+        return endereco
+
+    def pesos(self):
+        # Tickers assinados, pesados pelo número de assinantes
+        pesos = {}
+        with self._lock:
+            for tickers in self._assinaturas.values():
+                for ticker in tickers:
+                    pesos[ticker] = pesos.get(ticker, 0) + 1
+        return pesos
+
+    def responder(self, pedido, conexao):
+        op = pedido.get("op")
+        if op == "cotacoes":
+            return {"ok": True, "cotacoes": self.cache.obter_cotacoes(pedido["tickers"])}
+        if op == "historico":
+            dados = self.cache.provedor.buscar_historico(
+                pedido["ticker"], date.fromisoformat(pedido["inicio"]), date.fromisoformat(pedido["fim"]))
+            historico = {"datas": [d.date().isoformat() for d in dados.index]}
+            historico.update({c: dados[c].astype(float).tolist() for c in COLUNAS_HISTORICO})
+            return {"ok": True, "historico": historico}
+        if op == "assinar":
+            with self._lock:
+                self._assinaturas.setdefault(conexao, set()).update(pedido["tickers"])
+            return {"ok": True}
+        if op == "estatisticas":
+            return {"ok": True, "estatisticas": self.cache.obter_estatisticas()}
+        raise ValueError(f"Operação desconhecida: {op}")
+
+    def cancelar_assinatura(self, conexao):
+        with self._lock:
+            self._assinaturas.pop(conexao, None)
+
+    def publicar(self, tickers):
+        # Chamado pelo agendador depois de cada ciclo com buscas
+        cotacoes = self.cache.obter_cotacoes(tickers)
+        with self._lock:
+            assinaturas = list(self._assinaturas.items())
+        for conexao, assinados in assinaturas:
+            parte = {t: d for t, d in cotacoes.items() if t in assinados and d is not None}
+            if not parte:
+                continue
+            try:
+                conexao.enviar({"evento": "cotacoes", "cotacoes": parte})
+            except OSError:
+                self.cancelar_assinatura(conexao)
+
+    def iniciar(self):
+        # Atende numa thread de fundo (o uso em testes e embutido em outro programa)
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True,
+                                        name="servidor_cotacoes")
+        self._thread.start()
+        if self.agendador is not None:
+            self.agendador.iniciar(ao_atualizar=self.publicar)
+        logging.info(f"Servidor de cotações em {self.endereco}")
+        return self
+
+    def parar(self):
+        if self.agendador is not None:
+            self.agendador.parar()
+        self._servidor.shutdown()
+        self._servidor.server_close()
+        if self._servidor.address_family == socket.AF_UNIX and os.path.exists(self.endereco):
+            os.remove(self.endereco)
+        self.cache.fechar()
+
+
+class ProvedorServidor(ProvedorCotacoes):
+    # Provedor do CotacaoCache em modo cliente: repassa os pedidos ao servidor
+    # local. Uma conexão por thread, já que o cache busca em paralelo.
+    def __init__(self, endereco=ENDERECO_SERVIDOR_COTACOES, timeout=TIMEOUT_SERVIDOR_COTACOES):
+        self.familia, self.endereco = interpretar_endereco(endereco)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._assinaturas = []
+
+    def _conectar(self):
+        conexao = socket.socket(self.familia, socket.SOCK_STREAM)
+        conexao.settimeout(self.timeout)
+        try:
+            conexao.connect(self.endereco)
+        except OSError:
+            conexao.close()
+            raise
+        return conexao
+
+    def _fechar(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is not None:
+            conexao.close()
+        self._local.conexao = None
+
+    def _pedir(self, pedido):
+        # Uma nova tentativa com conexão nova se a antiga caiu (ex.: servidor reiniciado)
+        for tentativa in range(2):
+            try:
+                if getattr(self._local, "conexao", None) is None:
+                    self._local.conexao = self._conectar()
+                    self._local.arquivo = self._local.conexao.makefile("rb")
+                self._local.conexao.sendall(_linha(pedido))
+                linha = self._local.arquivo.readline()
+                if not linha:
+                    raise ConnectionError("conexão encerrada pelo servidor")
+                break
+            except OSError as e:
+                self._fechar()
+                if tentativa:
+                    raise ErroProvedor(f"Servidor de cotações indisponível: {str(e)}") from e
+        resposta = json.loads(linha)
+        if not resposta.get("ok"):
+            raise ErroProvedor(resposta.get("erro", "erro desconhecido no servidor"))
+        return resposta
+
+    def disponivel(self):
+        try:
+            self._pedir({"op": "estatisticas"})
+            return True
+        except ErroProvedor:
+            return False
+
+    def buscar(self, ticker):
+        cotacao = self.buscar_lote([ticker]).get(ticker)
+        if cotacao is None:
+            raise ErroProvedor(f"Sem cotação para {ticker}")
+        return cotacao
+
+    def buscar_lote(self, tickers):
+        cotacoes = self._pedir({"op": "cotacoes", "tickers": list(tickers)})["cotacoes"]
+        return {t: d for t, d in cotacoes.items() if d is not None}
+
+    def buscar_historico(self, ticker, inicio, fim):
+        import pandas as pd
+        historico = self._pedir({"op": "historico", "ticker": ticker,
+                                 "inicio": inicio.isoformat(), "fim": fim.isoformat()})["historico"]
+        datas = pd.DatetimeIndex(historico.pop("datas"))
+        return pd.DataFrame(historico, index=datas, columns=COLUNAS_HISTORICO)
+
+    def estatisticas(self):
+        return self._pedir({"op": "estatisticas"})["estatisticas"]
+
+    def assinar(self, tickers, ao_receber):
+        # ao_receber({ticker: dados}) é chamado numa thread própria a cada
+        # atualização publicada pelo servidor, até fechar()
+        conexao = self._conectar()
+        conexao.settimeout(None)
+        conexao.sendall(_linha({"op": "assinar", "tickers": list(tickers)}))
+        arquivo = conexao.makefile("rb")
+        resposta = json.loads(arquivo.readline() or b"{}")
+        if not resposta.get("ok"):
+            conexao.close()
+            raise ErroProvedor(resposta.get("erro", "assinatura recusada"))
+
+        def ouvir():
+            try:
+                for linha in arquivo:
+                    mensagem = json.loads(linha)
+                    if mensagem.get("evento") == "cotacoes":
+                        ao_receber(mensagem["cotacoes"])
+            except (OSError, ValueError):
+                pass
+
+        threading.Thread(target=ouvir, daemon=True, name="assinatura_cotacoes").start()
+        self._assinaturas.append(conexao)
+
+    def fechar(self):
+        for conexao in self._assinaturas:
+            try:
+                conexao.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conexao.close()
+        self._assinaturas = []
+        self._fechar()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    servidor = ServidorCotacoes(endereco=sys.argv[1] if len(sys.argv) > 1 else ENDERECO_SERVIDOR_COTACOES)
+    servidor.iniciar()
+    print(f"Servidor de cotações em {servidor.endereco} (Ctrl+C para encerrar)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.parar()
@@ -0,0 +1,249 @@
+import numpy as np
+import pandas as pd
+
+
+def calcular_tags(df):
+    # "barato" quando o preço atual está abaixo do PT Bazin; senão pela rentabilidade
+    preco_atual = pd.to_numeric(df["Preço Atual"], errors="coerce").to_numpy(dtype=float)
+    pt_bazin = pd.to_numeric(df["PT Bazin"], errors="coerce").to_numpy(dtype=float)
+    rentabilidade = pd.to_numeric(df["Rentabilidade"], errors="coerce").to_numpy(dtype=float)
+    with np.errstate(invalid="ignore"):
+        barato = preco_atual < pt_bazin
+        positivo = rentabilidade > 0
+    return np.where(barato, "barato", np.where(positivo, "positivo", "negativo"))
+
+
+def chaves_linhas(papeis):
+    # O Papel identifica a linha no Treeview; repetidos ganham sufixo (#2, #3...).
+    # "#" no próprio Papel vira "##", então um sufixo nunca coincide com um
+    # Papel real, e o Papel vazio sempre leva sufixo ("" é a raiz do Treeview)
+    vistos = {}
+    chaves = []
+    for papel in papeis:
+        papel = str(papel)
+        n = vistos.get(papel, 0) + 1
+        vistos[papel] = n
+        chaves.append(_chave_linha(papel, n))
+    return chaves
+
+
+def _chave_linha(papel, n):
+    chave = str(papel).replace("#", "##")
+    return chave if n == 1 and chave else f"{chave}#{n}"
+
+
+def diferencas(anteriores, novas):
+    # anteriores/novas: {chave: (valores, tag)}. Devolve chaves a inserir,
+    # alterar e remover; linhas idênticas não aparecem em nenhuma lista.
+    inserir = [c for c in novas if c not in anteriores]
+    alterar = [c for c, linha in novas.items() if c in anteriores and anteriores[c] != linha]
+    remover = [c for c in anteriores if c not in novas]
+    return inserir, alterar, remover
+
+
+class TabelaIncremental:
+    # Mantém um ttk.Treeview em sincronia com a carteira mexendo só nas linhas
+    # que mudaram: seleção e posição de rolagem são preservadas.
+    def __init__(self, tabela, colunas):
+        self.tabela = tabela
+        self.colunas = colunas
+        self._ordem = []
+        self._chaves = set()
+        self._texto = np.empty((0, len(colunas)), dtype=str)
+        self._tags = np.empty(0, dtype=str)
+
+    def atualizar(self, df_exibicao, tags):
+        chaves = chaves_linhas(df_exibicao["Papel"])
+        # Comparado como texto, que é o que o Treeview exibe (e NaN != NaN)
+        texto = df_exibicao[self.colunas].to_numpy(dtype=object).astype(str)
+        tags = np.asarray(tags).astype(str)
+
+        if chaves == self._ordem:
+            # Caso comum (só preços mudaram): comparação vetorizada linha a linha
+            mudou = (texto != self._texto).any(axis=1) | (tags != self._tags)
+            alterar = [chaves[i] for i in np.flatnonzero(mudou)]
+            inserir, remover = [], []
+            novas = None
+        else:
+            anteriores = {c: (tuple(v), t) for c, v, t in zip(self._ordem, self._texto, self._tags)}
+            novas = {c: (tuple(v), t) for c, v, t in zip(chaves, texto, tags)}
+            inserir, alterar, remover = diferencas(anteriores, novas)
+
+        posicoes = {chave: i for i, chave in enumerate(chaves)} if (alterar or inserir) else {}
+        if remover:
+            self.tabela.delete(*remover)
+        for chave in alterar:
+            i = posicoes[chave]
+            self.tabela.item(chave, values=texto[i].tolist(), tags=(str(tags[i]),))
+        for chave in inserir:
+            i = posicoes[chave]
+            self.tabela.insert("", i, iid=chave, values=texto[i].tolist(), tags=(str(tags[i]),))
+
+        # Reposiciona só se a ordem relativa das linhas mudou
+        if novas is not None:
+            atual = list(self.tabela.get_children("")) if inserir else [c for c in self._ordem if c in novas]
+            if atual != chaves:
+                for i, chave in enumerate(chaves):
+                    self.tabela.move(chave, "", i)
+
+        self._ordem = chaves
+        self._chaves = set(chaves)
+        self._texto = texto
+        self._tags = tags
+        return len(inserir), len(alterar), len(remover)
+
+    def __len__(self):
+        return len(self._ordem)
+
+    def atualizar_linhas(self, posicoes, df_exibicao, tags):
+        # Atualiza só as linhas nas posições dadas (posições da última chamada
+        # de atualizar, que continua valendo: nenhuma linha entrou ou saiu)
+        texto = df_exibicao[self.colunas].to_numpy(dtype=object).astype(str)
+        tags = np.asarray(tags).astype(str)
+        # Textos de largura fixa: um valor mais longo seria truncado
+        if texto.dtype.itemsize > self._texto.dtype.itemsize:
+            self._texto = self._texto.astype(texto.dtype)
+        if tags.dtype.itemsize > self._tags.dtype.itemsize:
+            self._tags = self._tags.astype(tags.dtype)
+
+        alteradas = 0
+        for i, linha, tag in zip(posicoes, texto, tags):
+            if (linha != self._texto[i]).any() or tag != self._tags[i]:
+                self.tabela.item(self._ordem[i], values=linha.tolist(), tags=(str(tag),))
+                self._texto[i] = linha
+                self._tags[i] = tag
+                alteradas += 1
+        return alteradas
+
+    def acrescentar(self, df_exibicao, tags):
+        # Linhas novas no fim da carteira (ativo adicionado): só elas entram
+        # no Treeview, com a numeração de chaves_linhas para Papéis repetidos
+        texto = df_exibicao[self.colunas].to_numpy(dtype=object).astype(str)
+        tags = np.asarray(tags).astype(str)
+        for papel, linha, tag in zip(df_exibicao["Papel"], texto, tags):
+            n = 1
+            while _chave_linha(papel, n) in self._chaves:
+                n += 1
+            chave = _chave_linha(papel, n)
+            self.tabela.insert("", len(self._ordem), iid=chave, values=linha.tolist(), tags=(str(tag),))
+            self._ordem.append(chave)
+            self._chaves.add(chave)
+        self._texto = np.concatenate([self._texto, texto])
+        self._tags = np.concatenate([self._tags, tags])
+        return len(texto)
+
+    def remover_linha(self, posicao):
+        # Ativo removido da carteira: apaga só a linha daquela posição
+        chave = self._ordem.pop(posicao)
+        self._chaves.discard(chave)
+        self._texto = np.delete(self._texto, posicao, axis=0)
+        self._tags = np.delete(self._tags, posicao)
+        self.tabela.delete(chave)
+
+    def limpar(self):
+        if self._ordem:
+            self.tabela.delete(*self._ordem)
+        self._ordem = []
+        self._chaves = set()
+        self._texto = np.empty((0, len(self.colunas)), dtype=str)
+        self._tags = np.empty(0, dtype=str)
+
+
+class JanelaVirtual:
+    # Posição da janela de linhas visíveis sobre uma carteira de "total" linhas
+    def __init__(self, linhas_visiveis=30):
+        self.linhas_visiveis = max(1, linhas_visiveis)
+        self.total = 0
+        self.inicio = 0
+
+    def _limitar(self):
+        self.inicio = max(0, min(self.inicio, self.total - self.linhas_visiveis))
+
+    def redefinir(self, total=None, linhas_visiveis=None):
+        if total is not None:
+            self.total = total
+        if linhas_visiveis is not None:
+            self.linhas_visiveis = max(1, linhas_visiveis)
+        self._limitar()
+
+    def rolar(self, linhas):
+        self.inicio += linhas
+        self._limitar()
+
+    def mover_para(self, fracao):
+        self.inicio = int(round(float(fracao) * self.total))
+        self._limitar()
+
+    def fatia(self):
+        return self.inicio, min(self.inicio + self.linhas_visiveis, self.total)
+
+    def fracoes(self):
+        # Formato esperado por Scrollbar.set
+        if not self.total:
+            return 0.0, 1.0
+        inicio, fim = self.fatia()
+        return inicio / self.total, fim / self.total
+
+
+def fatia_pagina(total, pagina, tamanho):
+    # Páginas numeradas a partir de 1; páginas fora do intervalo vão para a última/primeira
+    paginas = max(1, -(-total // tamanho))
+    pagina = max(1, min(pagina, paginas))
+    inicio = (pagina - 1) * tamanho
+    return inicio, min(inicio + tamanho, total), paginas
+
+
+class TabelaVirtual:
+    # Modo para carteiras muito grandes: o Treeview só tem as linhas visíveis.
+    # A barra de rolagem controla a JanelaVirtual, e a cada movimento só a
+    # fatia visível é formatada e repassada à TabelaIncremental.
+    ALTURA_LINHA = 20
+    ALTURA_CABECALHO = 25
+
+    def __init__(self, tabela, barra, colunas, pt_br=False):
+        from utils import formatar_colunas
+        self._formatar = lambda df: formatar_colunas(df, pt_br)
+        self.tabela = tabela
+        self.barra = barra
+        self.janela = JanelaVirtual()
+        self.incremental = TabelaIncremental(tabela, colunas)
+        self.df = None
+
+        barra.configure(command=self.yview)
+        tabela.configure(yscrollcommand="")
+        tabela.bind("<Configure>", self._redimensionar)
+        tabela.bind("<MouseWheel>", lambda e: self._rolar(-1 if e.delta > 0 else 1, "units"))
+        tabela.bind("<Button-4>", lambda e: self._rolar(-1, "units"))
+        tabela.bind("<Button-5>", lambda e: self._rolar(1, "units"))
+
+    def atualizar(self, df):
+        self.df = df
+        self.janela.redefinir(total=len(df))
+        self._desenhar()
+
+    def yview(self, acao, valor, unidade=None):
+        if acao == "moveto":
+            self.janela.mover_para(valor)
+            self._desenhar()
+        else:
+            self._rolar(int(valor), unidade)
+
+    def _rolar(self, quantidade, unidade):
+        passo = self.janela.linhas_visiveis if unidade == "pages" else 3
+        self.janela.rolar(quantidade * passo)
+        self._desenhar()
+        return "break"
+
+    def _redimensionar(self, evento):
+        linhas = (evento.height - self.ALTURA_CABECALHO) // self.ALTURA_LINHA
+        if linhas != self.janela.linhas_visiveis:
+            self.janela.redefinir(linhas_visiveis=linhas)
+            self._desenhar()
+
+    def _desenhar(self):
+        if self.df is None:
+            return
+        inicio, fim = self.janela.fatia()
+        visivel = self.df.iloc[inicio:fim]
+        self.incremental.atualizar(self._formatar(visivel), calcular_tags(visivel))
+        self.barra.set(*self.janela.fracoes())
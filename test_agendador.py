@@ -0,0 +1,118 @@
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from unittest import mock
+
+from agendador import (AgendadorCotacoes, CalendarioB3, FUSO_B3, PoliticaValidadePregao, pascoa)
+from armazenamento import ArmazenamentoMemoria
+from cotacoes import CotacaoCache
+from provedores import ProvedorReplay
+
+
+def b3(*args):
+    return datetime(*args, tzinfo=FUSO_B3)
+
+
+class TestCalendarioB3(unittest.TestCase):
+    def setUp(self):
+        self.calendario = CalendarioB3()
+
+    def test_pascoa(self):
+        self.assertEqual(pascoa(2024), date(2024, 3, 31))
+        self.assertEqual(pascoa(2025), date(2025, 4, 20))
+        self.assertEqual(pascoa(2026), date(2026, 4, 5))
+
+    def test_feriados_moveis_e_fim_de_ano(self):
+        feriados = self.calendario.feriados(2025)
+        for dia in [date(2025, 3, 3), date(2025, 3, 4), date(2025, 4, 18), date(2025, 6, 19),
+                    date(2025, 11, 20), date(2025, 12, 24), date(2025, 12, 31)]:
+            self.assertIn(dia, feriados)
+        self.assertNotIn(date(2023, 11, 20), self.calendario.feriados(2023))
+        self.assertTrue(self.calendario.dia_de_pregao(date(2025, 3, 5)))
+        self.assertFalse(self.calendario.dia_de_pregao(date(2025, 3, 8)))  # sábado
+
+    def test_horario_do_pregao(self):
+        self.assertFalse(self.calendario.aberto(b3(2025, 3, 6, 9, 59)))
+        self.assertTrue(self.calendario.aberto(b3(2025, 3, 6, 10, 0)))
+        self.assertFalse(self.calendario.aberto(b3(2025, 3, 6, 18, 30)))
+        # Quarta-feira de Cinzas: só à tarde
+        self.assertFalse(self.calendario.aberto(b3(2025, 3, 5, 11, 0)))
+        self.assertTrue(self.calendario.aberto(b3(2025, 3, 5, 13, 0)))
+        # Mesmo instante em outro fuso
+        self.assertTrue(self.calendario.aberto(datetime(2025, 3, 6, 13, 30, tzinfo=timezone.utc)))
+
+    def test_proxima_abertura_e_ultimo_fechamento_pulam_feriados(self):
+        # Sexta-feira Santa (18/04/2025), fim de semana e Tiradentes (21/04)
+        self.assertEqual(self.calendario.proxima_abertura(b3(2025, 4, 17, 19, 0)), datetime(2025, 4, 22, 10, 0))
+        self.assertEqual(self.calendario.ultimo_fechamento(b3(2025, 4, 22, 9, 0)), datetime(2025, 4, 17, 18, 30))
+        self.assertEqual(self.calendario.ultimo_fechamento(b3(2025, 4, 17, 18, 30)), datetime(2025, 4, 17, 18, 30))
+
+
+class TestPoliticaValidadePregao(unittest.TestCase):
+    def setUp(self):
+        self.politica = PoliticaValidadePregao(validade_pregao={"acao": 5})
+
+    def test_validade_curta_durante_o_pregao(self):
+        agora = b3(2025, 3, 6, 15, 0)
+        self.assertTrue(self.politica.fresca("acao", agora - timedelta(minutes=4), agora))
+        self.assertFalse(self.politica.fresca("acao", agora - timedelta(minutes=6), agora))
+
+    def test_fechamento_vale_ate_a_proxima_abertura(self):
+        buscada = b3(2025, 3, 7, 18, 45)  # sexta, depois do fechamento
+        self.assertTrue(self.politica.fresca("acao", buscada, b3(2025, 3, 10, 9, 59)))
+        self.assertFalse(self.politica.fresca("acao", buscada, b3(2025, 3, 10, 10, 0)))
+        # Buscada antes do fechamento: vence uma vez, para trazer o preço final
+        self.assertFalse(self.politica.fresca("acao", b3(2025, 3, 7, 18, 0), b3(2025, 3, 7, 22, 0)))
+
+    def test_classe_fora_da_b3_fica_com_a_validade_do_cache(self):
+        self.assertIsNone(self.politica.fresca("cripto", b3(2025, 3, 8, 12, 0), b3(2025, 3, 8, 12, 1)))
+
+
+class TestAgendadorCotacoes(unittest.TestCase):
+    def novo_cache(self, **kwargs):
+        cache = CotacaoCache(armazenamento=ArmazenamentoMemoria(), provedor=ProvedorReplay(), **kwargs)
+        self.addCleanup(cache.flush)
+        return cache
+
+    def test_busca_so_vencidos_em_ordem_de_peso(self):
+        cache = self.novo_cache()
+        agora = datetime.now()
+        cache._cache["PETR4.SA"] = ({"preco": 30.0, "variacao": 0.0}, agora)
+        cache._cache["VALE3.SA"] = ({"preco": 60.0, "variacao": 0.0}, agora - timedelta(hours=2))
+        cache._cache["ITUB4.SA"] = ({"preco": 25.0, "variacao": 0.0}, agora - timedelta(hours=2))
+        pesos = {"PETR4.SA": 900.0, "VALE3.SA": 100.0, "ITUB4.SA": 500.0, "BBAS3.SA": 300.0}
+        agendador = AgendadorCotacoes(cache, lambda: pesos, calendario=CalendarioB3(), lote=2)
+
+        with mock.patch.object(cache.provedor, "buscar_lote", wraps=cache.provedor.buscar_lote) as buscar:
+            atualizados = agendador.executar_ciclo()
+
+        self.assertEqual(atualizados, ["ITUB4.SA", "BBAS3.SA", "VALE3.SA"])
+        self.assertEqual([c.args[0] for c in buscar.call_args_list], [["ITUB4.SA", "BBAS3.SA"], ["VALE3.SA"]])
+        self.assertEqual(agendador.executar_ciclo(), [])
+
+    def test_entrega_cada_parte_durante_o_ciclo(self):
+        cache = self.novo_cache()
+        cache.lote_entrega = 2
+        pesos = {f"T{i:02d}3.SA": float(i) for i in range(5)}
+        agendador = AgendadorCotacoes(cache, lambda: pesos, calendario=CalendarioB3(), lote=10)
+        partes = []
+        atualizados = agendador.executar_ciclo(ao_receber=partes.append)
+        self.assertGreater(len(partes), 1)
+        self.assertEqual(sorted(t for parte in partes for t in parte), sorted(atualizados))
+
+    def test_mercado_fechado_nao_busca(self):
+        cache = self.novo_cache(politica=PoliticaValidadePregao())
+        cache._cache["PETR4.SA"] = ({"preco": 30.0, "variacao": 0.0}, b3(2025, 3, 7, 18, 45))
+        cache._cache["VALE3.SA"] = ({"preco": 60.0, "variacao": 0.0}, b3(2025, 3, 7, 17, 0))
+        agendador = AgendadorCotacoes(cache, lambda: {"PETR4.SA": 1.0, "VALE3.SA": 2.0})
+
+        # Só a cotação buscada antes do fechamento de sexta vence no domingo
+        domingo = b3(2025, 3, 9, 12, 0)
+        self.assertEqual(agendador.pendentes(domingo), ["VALE3.SA"])
+        # Espera até a abertura de segunda, limitada a uma hora
+        self.assertEqual(agendador.espera(domingo), AgendadorCotacoes.ESPERA_MAXIMA)
+        self.assertEqual(agendador.espera(b3(2025, 3, 10, 9, 50)), 600)
+        self.assertEqual(agendador.espera(b3(2025, 3, 10, 11, 0)), agendador.intervalo)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from agregados import AgregadosCarteira
+from benchmark import gerar_carteira
+from graficos import calcular_analise
+
+
+def carteira(n=200, semente=0):
+    rng = np.random.default_rng(semente)
+    df = gerar_carteira(n, semente)
+    df["Valor Atual"] = (df["Total Investido"] * rng.uniform(0.7, 1.4, n)).round(2)
+    df["Rentabilidade"] = ((df["Valor Atual"] / df["Total Investido"] - 1) * 100).round(1)
+    df.loc[rng.choice(n, 10, replace=False), "Rentabilidade"] = np.nan
+    return df
+
+
+class TestAgregadosCarteira(unittest.TestCase):
+    def assertMesmoTexto(self, agregados, df):
+        self.assertEqual(agregados.texto(), calcular_analise(df))
+
+    def test_igual_ao_calculo_completo(self):
+        df = carteira()
+        agregados = AgregadosCarteira()
+        agregados.sincronizar(df)
+        self.assertMesmoTexto(agregados, df)
+
+    def test_atualiza_so_linhas_alteradas(self):
+        df = carteira()
+        agregados = AgregadosCarteira()
+        agregados.sincronizar(df)
+        self.assertEqual(agregados.sincronizar(df.copy()), 0)
+
+        rng = np.random.default_rng(1)
+        for _ in range(20):
+            i = rng.integers(len(df))
+            df.loc[i, "Valor Atual"] = round(df.loc[i, "Total Investido"] * rng.uniform(0.5, 2), 2)
+            df.loc[i, "Rentabilidade"] = round((df.loc[i, "Valor Atual"] / df.loc[i, "Total Investido"] - 1) * 100, 1)
+            self.assertEqual(agregados.sincronizar(df), 1)
+            self.assertMesmoTexto(agregados, df)
+
+    def test_atualizar_linhas_recebidas(self):
+        df = carteira()
+        agregados = AgregadosCarteira()
+        agregados.sincronizar(df)
+        linhas = [5, 17, 42]
+        df.loc[linhas, "Valor Atual"] = df.loc[linhas, "Total Investido"] * 3
+        df.loc[linhas, "Rentabilidade"] = 200.0
+        self.assertEqual(agregados.atualizar_linhas(df.iloc[linhas]), 3)
+        self.assertMesmoTexto(agregados, df)
+        # A comparação completa depois disso continua certa
+        agregados.sincronizar(df)
+        self.assertMesmoTexto(agregados, df)
+
+    def test_empates_e_nan_no_ranking(self):
+        df = pd.DataFrame({"Papel": ["A", "B", "C", "D"], "Total Investido": [1.0, 1.0, 1.0, 1.0],
+                           "Valor Atual": [1.0, 1.0, 1.0, 1.0], "Rentabilidade": [np.nan, 5.0, 5.0, np.nan],
+                           "Dividendos": [np.nan, np.nan, 2.0, np.nan]})
+        agregados = AgregadosCarteira()
+        agregados.sincronizar(df)
+        self.assertEqual([p for p, _ in agregados.top_rentabilidade()], ["B", "C", "A"])
+        self.assertEqual([p for p, _ in agregados.top_dividendos()], ["C", "A", "B"])
+        self.assertEqual((agregados.positivos, agregados.negativos), (2, 0))
+
+    def test_ativos_adicionados_e_removidos(self):
+        df = carteira(50)
+        agregados = AgregadosCarteira()
+        agregados.sincronizar(df)
+        df = df.drop(index=[3, 7])
+        df.loc[100] = df.loc[0].copy()
+        df.loc[100, "Papel"] = "NOVO3"
+        df.loc[100, "Rentabilidade"] = 500.0
+        # Só as duas removidas e a nova: as demais linhas não são reaplicadas
+        self.assertEqual(agregados.sincronizar(df), 3)
+        self.assertMesmoTexto(agregados, df)
+        self.assertEqual(agregados.top_rentabilidade()[0], ("NOVO3", 500.0))
+
+        df.loc[10, "Valor Atual"] += 1.0
+        df = df.drop(index=20)
+        self.assertEqual(agregados.sincronizar(df), 2)
+        self.assertMesmoTexto(agregados, df)
+
+
+if __name__ == "__main__":
+    unittest.main()
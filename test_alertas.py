@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from alertas import MotorAlertasBazin, texto_alerta
+
+
+def carteira():
+    return pd.DataFrame({
+        "Papel": ["PETR4", "VALE3", "ITSA4", "BBAS3"],
+        "Preço Atual": [np.nan, np.nan, np.nan, np.nan],
+        "PT Bazin": [30.0, 50.0, 10.0, np.nan],
+    })
+
+
+class TestMotorAlertasBazin(unittest.TestCase):
+    def setUp(self):
+        self.motor = MotorAlertasBazin(histerese=0.02)
+        self.df = carteira()
+
+    def precos(self, **valores):
+        # Aplica os preços e devolve só as linhas alteradas, como a interface faz
+        linhas = []
+        for papel, preco in valores.items():
+            i = int(np.flatnonzero(self.df["Papel"] == papel)[0])
+            self.df.loc[i, "Preço Atual"] = preco
+            linhas.append(i)
+        return self.motor.atualizar(self.df.iloc[linhas])
+
+    def test_alerta_so_na_travessia(self):
+        alertas = self.precos(PETR4=29.0, VALE3=60.0, ITSA4=10.0, BBAS3=1.0)
+        self.assertEqual([a[0] for a in alertas], ["PETR4", "ITSA4"])
+        self.assertEqual(texto_alerta(alertas[0]), "PETR4 (Atual: R$ 29.00 | Teto Bazin: R$ 30.00)")
+        # Continua abaixo do teto: nada de novo
+        self.assertEqual(self.precos(PETR4=28.0), [])
+        self.assertEqual([a[0] for a in self.precos(VALE3=49.0)], ["VALE3"])
+
+    def test_histerese(self):
+        self.precos(PETR4=29.0)
+        # Sobe só um pouco acima do teto e volta: não repete
+        self.assertEqual(self.precos(PETR4=30.5), [])
+        self.assertEqual(self.precos(PETR4=29.5), [])
+        # Sai de verdade (acima de 2%) e volta: alerta de novo
+        self.assertEqual(self.precos(PETR4=31.0), [])
+        self.assertEqual([a[0] for a in self.precos(PETR4=29.9)], ["PETR4"])
+
+    def test_papel_repetido_alerta_uma_vez(self):
+        df = pd.DataFrame({"Papel": ["PETR4", "PETR4"], "Preço Atual": [20.0, 20.0], "PT Bazin": [30.0, 30.0]})
+        self.assertEqual(len(self.motor.atualizar(df)), 1)
+
+    def test_papel_repetido_em_chamadas_separadas(self):
+        df = pd.DataFrame({"Papel": ["PETR4", "PETR4"], "Preço Atual": [20.0, 20.0], "PT Bazin": [30.0, 30.0]})
+        self.assertEqual(len(self.motor.atualizar(df.iloc[[0]])), 1)
+        self.assertEqual(self.motor.atualizar(df.iloc[[1]]), [])
+        # Removida uma das linhas, o Papel continua alertado pela outra
+        self.motor.remover([0])
+        self.assertEqual(self.motor.atualizar(df.iloc[[1]]), [])
+        self.motor.remover([1])
+        self.assertEqual(len(self.motor.atualizar(df.iloc[[1]])), 1)
+
+    def test_indice_por_razao_e_remocao(self):
+        self.precos(PETR4=15.0, VALE3=45.0, ITSA4=11.0)
+        self.assertEqual(self.motor.abaixo_de(1.0), [0, 1])
+        self.assertEqual(self.motor.abaixo_de(2.0), [0, 1, 2])
+
+        self.assertEqual(self.motor.papeis_abaixo_de(1.0), [("PETR4", 0.5), ("VALE3", 0.9)])
+
+        self.motor.remover([0])
+        self.assertEqual(self.motor.abaixo_de(2.0), [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
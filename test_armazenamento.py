@@ -0,0 +1,80 @@
+
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+from armazenamento import ArmazenamentoJSON, ArmazenamentoSQLite, criar_armazenamento
+from cotacoes import CotacaoCache
+
+
+class TestArmazenamentoSQLite(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.tmp.name, "cotacoes.db")
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_upsert_e_consulta_pontual(self):
+        banco = ArmazenamentoSQLite(self.caminho)
+        self.addCleanup(banco.fechar)
+        agora = datetime.now()
+        banco.salvar({"PETR4.SA": ({"preco": 30.0, "variacao": 1.0}, agora),
+                      "VALE3.SA": ({"preco": 60.0, "variacao": 0.0}, agora)})
+        banco.salvar({"PETR4.SA": ({"preco": 31.0, "variacao": 2.0}, agora + timedelta(minutes=1))})
+
+        self.assertEqual(banco.obter("PETR4.SA")[0]["preco"], 31.0)
+        self.assertIsNone(banco.obter("ITUB4.SA"))
+        self.assertEqual(set(banco.obter_varios(["VALE3.SA", "ITUB4.SA"])), {"VALE3.SA"})
+
+    def test_nao_sobrescreve_cotacao_mais_nova(self):
+        banco = ArmazenamentoSQLite(self.caminho)
+        self.addCleanup(banco.fechar)
+        agora = datetime.now()
+        banco.salvar({"PETR4.SA": ({"preco": 31.0}, agora)})
+        banco.salvar({"PETR4.SA": ({"preco": 30.0}, agora - timedelta(minutes=5))})
+        self.assertEqual(banco.obter("PETR4.SA")[0]["preco"], 31.0)
+
+    def test_dois_caches_compartilham_o_banco(self):
+        primeiro = CotacaoCache(armazenamento=ArmazenamentoSQLite(self.caminho))
+        segundo = CotacaoCache(armazenamento=ArmazenamentoSQLite(self.caminho))
+        self.addCleanup(primeiro._armazenamento.fechar)
+        self.addCleanup(segundo._armazenamento.fechar)
+        primeiro._marcar_sujos({"PETR4.SA": ({"preco": 30.0, "variacao": 0.0}, datetime.now())})
+        primeiro.flush()
+
+        resultado = []
+        thread = threading.Thread(target=lambda: resultado.append(segundo.obter_cotacoes(["PETR4.SA"])))
+        thread.start()
+        thread.join()
+        self.assertEqual(resultado[0]["PETR4.SA"]["preco"], 30.0)
+
+    def test_fechar_cache_fecha_as_conexoes_de_todas_as_threads(self):
+        banco = ArmazenamentoSQLite(self.caminho)
+        cache = CotacaoCache(armazenamento=banco)
+        thread = threading.Thread(target=lambda: banco.obter("PETR4.SA"))
+        thread.start()
+        thread.join()
+        conexoes = list(banco._conexoes)
+        self.assertEqual(len(conexoes), 2)
+
+        cache._marcar_sujos({"PETR4.SA": ({"preco": 30.0, "variacao": 0.0}, datetime.now())})
+        cache.fechar()
+        for conexao in conexoes:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conexao.execute("SELECT 1")
+        reaberto = ArmazenamentoSQLite(self.caminho)
+        self.addCleanup(reaberto.fechar)
+        self.assertEqual(reaberto.obter("PETR4.SA")[0]["preco"], 30.0)
+
+    def test_migra_cache_json_existente(self):
+        caminho_json = os.path.join(self.tmp.name, "cache.json")
+        ArmazenamentoJSON(caminho_json).salvar({"ITSA4.SA": ({"preco": 9.5}, datetime.now())})
+        banco = criar_armazenamento("sqlite", caminho_json, self.caminho)
+        self.addCleanup(banco.fechar)
+        self.assertEqual(banco.obter("ITSA4.SA")[0]["preco"], 9.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
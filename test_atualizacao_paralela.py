@@ -0,0 +1,73 @@
+
+import threading
+import time
+import unittest
+
+from atualizacao_paralela import buscar_em_paralelo
+
+
+class TestBuscarEmParalelo(unittest.TestCase):
+    def test_ticker_lento_nao_trava_os_demais(self):
+        def buscar(ticker):
+            time.sleep(1.0 if ticker == "LENTO" else 0.01)
+            return {"preco": 1.0, "variacao": 0.0}
+
+        resultados, relatorio = buscar_em_paralelo(buscar, ["A", "LENTO", "B", "C"],
+                                                   max_concorrencia=4, timeout=0.2)
+        self.assertEqual(set(resultados), {"A", "B", "C"})
+        self.assertEqual(relatorio.expirados, ["LENTO"])
+        self.assertLess(relatorio.tempo_total, 0.8)
+
+    def test_respeita_limite_de_concorrencia(self):
+        ativos = []
+        maximo = []
+        lock = threading.Lock()
+
+        def buscar(ticker):
+            with lock:
+                ativos.append(ticker)
+                maximo.append(len(ativos))
+            time.sleep(0.02)
+            with lock:
+                ativos.remove(ticker)
+            return ticker
+
+        resultados, relatorio = buscar_em_paralelo(buscar, [str(i) for i in range(12)], max_concorrencia=3)
+        self.assertEqual(len(resultados), 12)
+        self.assertLessEqual(max(maximo), 3)
+
+    def test_prazo_conta_desde_a_entrada_na_fila(self):
+        chamados = []
+
+        def buscar(ticker):
+            chamados.append(ticker)
+            time.sleep(0.3)
+            return ticker
+
+        resultados, relatorio = buscar_em_paralelo(buscar, ["A", "B"], max_concorrencia=1, timeout=0.2)
+        self.assertEqual(resultados, {})
+        self.assertEqual(relatorio.expirados, ["A", "B"])
+        self.assertEqual(chamados, ["A"])
+
+    def test_relatorio_nao_muda_depois_de_devolvido(self):
+        def buscar(ticker):
+            time.sleep(0.3 if ticker == "LENTO" else 0.01)
+            return ticker
+
+        resultados, relatorio = buscar_em_paralelo(buscar, ["A", "LENTO"], max_concorrencia=2, timeout=0.1)
+        latencias = dict(relatorio.latencias)
+        time.sleep(0.4)
+        self.assertEqual(relatorio.latencias, latencias)
+        self.assertNotIn("LENTO", relatorio.latencias)
+
+    def test_falhas_sao_reportadas(self):
+        def buscar(ticker):
+            raise ValueError("sem dados")
+
+        resultados, relatorio = buscar_em_paralelo(buscar, ["X"])
+        self.assertEqual(resultados, {})
+        self.assertIn("X", relatorio.falhas)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,23 @@
+
+import unittest
+
+from benchmark import executar, comparar
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_ciclo_completo_carteira_pequena(self):
+        resultado = executar([10], memoria=False)
+        etapas = resultado["resultados"]["10"]
+        self.assertEqual(set(etapas), {"importar_json", "carregar_dados", "atualizar_dados_financeiros",
+                                       "formatar_valores", "analise", "editar_carteira", "exportar_pdf"})
+        self.assertTrue(all(e["segundos"] > 0 for e in etapas.values()))
+
+    def test_comparacao_aponta_regressao(self):
+        base = {"resultados": {"10": {"analise": {"segundos": 1.0}}}}
+        atual = {"resultados": {"10": {"analise": {"segundos": 1.5}}}}
+        self.assertEqual(comparar(atual, base, tolerancia=0.2), [("10", "analise", 1.5)])
+        self.assertEqual(comparar(atual, base, tolerancia=0.6), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
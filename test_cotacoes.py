@@ -0,0 +1,247 @@
+
+import gc
+import os
+import tempfile
+import threading
+import time
+import unittest
+import weakref
+from datetime import datetime, timedelta
+from unittest import mock
+
+from armazenamento import ArmazenamentoJSON
+import cotacoes
+from cotacoes import CotacaoCache, classificar_ticker
+from provedores import ProvedorReplay
+
+
+class _BaseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.arquivo = os.path.join(self.tmp.name, "cache.json")
+        self.addCleanup(self.tmp.cleanup)
+
+    def novo_cache(self, **kwargs):
+        kwargs.setdefault("provedor", ProvedorReplay())
+        cache = CotacaoCache(armazenamento=ArmazenamentoJSON(self.arquivo), **kwargs)
+        self.addCleanup(cache.flush)
+        return cache
+
+
+class TestObterCotacoes(_BaseCache):
+    def test_busca_faltantes_em_um_unico_lote(self):
+        cache = self.novo_cache()
+        cache._cache["PETR4.SA"] = ({"preco": 30.0, "variacao": 0.0}, datetime.now())
+        lote = {"VALE3.SA": {"preco": 60.0, "variacao": 1.0},
+                "ITUB4.SA": {"preco": 25.0, "variacao": -1.0}}
+        with mock.patch.object(cache._provedor, "buscar_lote", return_value=lote) as buscar:
+            resultado = cache.obter_cotacoes(["PETR4.SA", "VALE3.SA", "ITUB4.SA", "VALE3.SA"])
+
+        buscar.assert_called_once_with(["VALE3.SA", "ITUB4.SA"])
+        self.assertEqual(resultado["PETR4.SA"]["preco"], 30.0)
+        self.assertEqual(resultado["VALE3.SA"]["preco"], 60.0)
+        self.assertIn("ITUB4.SA", cache._cache)
+
+    def test_falha_no_lote_devolve_cotacao_antiga(self):
+        cache = self.novo_cache()
+        antiga = {"preco": 10.0, "variacao": 0.0}
+        cache._cache["BBAS3.SA"] = (antiga, datetime.now() - timedelta(hours=2))
+        with mock.patch.object(cache._provedor, "buscar_lote", side_effect=Exception("offline")), \
+                mock.patch.object(cache._provedor, "buscar", side_effect=Exception("offline")):
+            resultado = cache.obter_cotacoes(["BBAS3.SA", "WEGE3.SA"])
+
+        self.assertEqual(resultado["BBAS3.SA"], antiga)
+        self.assertIsNone(resultado["WEGE3.SA"])
+
+    def test_faltantes_do_lote_buscados_individualmente(self):
+        cache = self.novo_cache()
+        lote = {"VALE3.SA": {"preco": 60.0, "variacao": 1.0}}
+        with mock.patch.object(cache._provedor, "buscar_lote", return_value=lote), \
+                mock.patch.object(cache._provedor, "buscar",
+                                  return_value={"preco": 8.0, "variacao": 0.5}) as individual:
+            resultado = cache.obter_cotacoes(["VALE3.SA", "ABEV3.SA"])
+
+        individual.assert_called_once_with("ABEV3.SA")
+        self.assertEqual(resultado["ABEV3.SA"]["preco"], 8.0)
+        self.assertEqual(cache.ultimo_relatorio.latencias.keys(), {"ABEV3.SA"})
+
+    def test_entrega_em_partes_a_medida_que_chegam(self):
+        cache = self.novo_cache()
+        cache.lote_entrega = 2
+        cache._cache["PETR4.SA"] = ({"preco": 30.0, "variacao": 0.0}, datetime.now())
+        partes = []
+        tickers = ["PETR4.SA", "VALE3.SA", "ITUB4.SA", "BBAS3.SA"]
+        with mock.patch.object(cache._provedor, "buscar_lote",
+                               side_effect=lambda lote: {t: {"preco": 1.0, "variacao": 0.0} for t in lote}) as buscar:
+            resultado = cache.obter_cotacoes(tickers, ao_receber=partes.append)
+
+        self.assertEqual([list(p) for p in partes], [["PETR4.SA"], ["VALE3.SA", "ITUB4.SA"], ["BBAS3.SA"]])
+        self.assertEqual(buscar.call_count, 2)
+        self.assertEqual(list(resultado), tickers)
+
+
+class TestPersistenciaWriteBehind(_BaseCache):
+    def test_lote_faz_uma_unica_escrita_compacta(self):
+        cache = self.novo_cache()
+        lote = {f"T{i}.SA": {"preco": float(i), "variacao": 0.0} for i in range(50)}
+        with mock.patch.object(cache._provedor, "buscar_lote", return_value=lote), \
+                mock.patch.object(cache._armazenamento, "salvar", wraps=cache._armazenamento.salvar) as salvar:
+            cache.obter_cotacoes(lote)
+        self.assertEqual(salvar.call_count, 1)
+        with open(self.arquivo, encoding="utf-8") as f:
+            conteudo = f.read()
+        self.assertNotIn("\n", conteudo)
+        self.assertEqual(len(ArmazenamentoJSON(self.arquivo).obter_varios(lote)), 50)
+
+    def test_buscas_avulsas_esperam_o_flush(self):
+        cache = self.novo_cache()
+        cache.intervalo_flush = 60
+        with mock.patch.object(cache._provedor, "buscar", return_value={"preco": 1.0, "variacao": 0.0}), \
+                mock.patch.object(cache._armazenamento, "salvar", wraps=cache._armazenamento.salvar) as salvar:
+            for ticker in ["A.SA", "B.SA", "C.SA"]:
+                cache.obter_cotacao(ticker)
+            self.assertEqual(salvar.call_count, 0)
+            cache.flush()
+            cache.flush()
+        self.assertEqual(salvar.call_count, 1)
+        salvas = ArmazenamentoJSON(self.arquivo).obter_varios(["A.SA", "B.SA", "C.SA", "D.SA"])
+        self.assertEqual(set(salvas), {"A.SA", "B.SA", "C.SA"})
+
+    def test_saida_grava_so_caches_abertos(self):
+        cache = self.novo_cache()
+        cache.intervalo_flush = 60
+        with mock.patch.object(cache._provedor, "buscar", return_value={"preco": 1.0, "variacao": 0.0}):
+            cache.obter_cotacao("A.SA")
+        cotacoes._flush_caches_abertos()
+        self.assertIn("A.SA", ArmazenamentoJSON(self.arquivo).obter_varios(["A.SA"]))
+
+        cache.fechar()
+        self.assertNotIn(cache, cotacoes._caches_abertos)
+        # Um cache descartado não fica preso pela rotina de saída
+        referencia = weakref.ref(CotacaoCache(armazenamento=ArmazenamentoJSON(self.arquivo),
+                                              provedor=ProvedorReplay()))
+        gc.collect()
+        self.assertIsNone(referencia())
+
+
+class TestConcorrencia(_BaseCache):
+    def test_buscas_simultaneas_do_mesmo_ticker_viram_uma(self):
+        cache = self.novo_cache()
+        chamadas = []
+
+        def buscar(ticker):
+            chamadas.append(ticker)
+            time.sleep(0.1)
+            return {"preco": 42.0, "variacao": 0.0}
+
+        resultados = []
+        with mock.patch.object(cache._provedor, "buscar", side_effect=buscar):
+            threads = [threading.Thread(target=lambda: resultados.append(cache.obter_cotacao("PETR4.SA")))
+                       for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(chamadas, ["PETR4.SA"])
+        self.assertEqual([r["preco"] for r in resultados], [42.0] * 8)
+
+    def test_atualizacoes_sobrepostas_nao_duplicam_chamadas(self):
+        cache = self.novo_cache()
+        buscados = []
+        lock = threading.Lock()
+
+        def buscar_lote(tickers):
+            with lock:
+                buscados.extend(tickers)
+            time.sleep(0.1)
+            return {t: {"preco": 1.0, "variacao": 0.0} for t in tickers}
+
+        carteira = [f"T{i}.SA" for i in range(20)]
+        resultados = []
+        with mock.patch.object(cache._provedor, "buscar_lote", side_effect=buscar_lote):
+            threads = [threading.Thread(target=lambda: resultados.append(cache.obter_cotacoes(carteira)))
+                       for _ in range(3)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(sorted(buscados), sorted(carteira))
+        for resultado in resultados:
+            self.assertEqual(list(resultado), carteira)
+            self.assertTrue(all(c["preco"] == 1.0 for c in resultado.values()))
+
+
+class TestValidadeEDespejo(_BaseCache):
+    def test_classes_de_ticker(self):
+        self.assertEqual(classificar_ticker("PETR4.SA"), "acao")
+        self.assertEqual(classificar_ticker("HGLG11.SA"), "fii")
+        self.assertEqual(classificar_ticker("AAPL34.SA"), "bdr")
+        self.assertEqual(classificar_ticker("^BVSP"), "indice")
+        self.assertEqual(classificar_ticker("USDBRL=X"), "cambio")
+        self.assertEqual(classificar_ticker("BTC-USD"), "cripto")
+
+    def test_validade_por_classe(self):
+        cache = self.novo_cache()
+        cache.validade_por_classe = {"acao": timedelta(minutes=30), "cripto": timedelta(minutes=5)}
+        dez_minutos = datetime.now() - timedelta(minutes=10)
+        cache._cache["PETR4.SA"] = ({"preco": 30.0}, dez_minutos)
+        cache._cache["BTC-USD"] = ({"preco": 1.0}, dez_minutos)
+        with mock.patch.object(cache._provedor, "buscar_lote",
+                               return_value={"BTC-USD": {"preco": 2.0}}) as buscar:
+            resultado = cache.obter_cotacoes(["PETR4.SA", "BTC-USD"])
+        buscar.assert_called_once_with(["BTC-USD"])
+        self.assertEqual(resultado["BTC-USD"]["preco"], 2.0)
+
+    def test_despejo_lru(self):
+        cache = self.novo_cache()
+        cache.max_entradas = 3
+        lote = {t: {"preco": 1.0} for t in ["A.SA", "B.SA", "C.SA"]}
+        def buscar_lote(tickers):
+            return {t: lote.get(t, {"preco": 2.0}) for t in tickers}
+
+        with mock.patch.object(cache._provedor, "buscar_lote", side_effect=buscar_lote):
+            cache.obter_cotacoes(["A.SA", "B.SA", "C.SA"])
+            cache.obter_cotacoes(["A.SA"])
+            cache.obter_cotacoes(["D.SA"])
+        self.assertEqual(list(cache._cache), ["C.SA", "A.SA", "D.SA"])
+        self.assertEqual(cache.obter_estatisticas()["despejos"], 1)
+
+    def test_stale_while_revalidate(self):
+        cache = self.novo_cache(stale_while_revalidate=True)
+        antiga = {"preco": 10.0, "variacao": 0.0}
+        cache._cache["BBAS3.SA"] = (antiga, datetime.now() - timedelta(hours=2))
+        liberar = threading.Event()
+
+        def buscar_lote(tickers):
+            liberar.wait(2)
+            return {t: {"preco": 11.0, "variacao": 0.0} for t in tickers}
+
+        with mock.patch.object(cache._provedor, "buscar_lote", side_effect=buscar_lote):
+            self.assertEqual(cache.obter_cotacoes(["BBAS3.SA"])["BBAS3.SA"], antiga)
+            liberar.set()
+            cache._revalidador.shutdown(wait=True)
+
+        self.assertEqual(cache.obter_cotacao("BBAS3.SA")["preco"], 11.0)
+        estatisticas = cache.obter_estatisticas()
+        self.assertEqual(estatisticas["obsoletas_servidas"], 1)
+        self.assertEqual(estatisticas["revalidacoes"], 1)
+        self.assertEqual(estatisticas["acertos"], 1)
+
+
+class TestProvedorReplayNoCache(_BaseCache):
+    def test_atualizacao_offline_com_latencia_e_falhas(self):
+        provedor = ProvedorReplay(latencia=0.001, latencia_lote=0.01, taxa_falhas=0.2, semente=7)
+        cache = self.novo_cache(provedor=provedor)
+        cache.requisicoes_por_segundo = None
+        carteira = [f"T{i:03d}.SA" for i in range(200)]
+        resultado = cache.obter_cotacoes(carteira)
+        self.assertEqual(list(resultado), carteira)
+        # Os que falharam no lote são tentados de novo individualmente
+        self.assertGreater(sum(r is not None for r in resultado.values()), 190)
+        self.assertGreater(provedor.chamadas, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from dados import (aplicar_cotacoes, aplicar_cotacoes_parciais, tickers_da_carteira, salvar_snapshot, ler_snapshot,
+                   carregar_dados, exportar_json)
+
+
+def _referencia(df, precos):
+    # Implementação linha a linha usada antes da versão vetorizada
+    df = df.copy()
+    df["Valor Atual"] = df["Valor Atual"].astype(float)
+    for idx, row in df.iterrows():
+        papel = row["Papel"]
+        ticker = f"{papel}.SA" if not str(papel).endswith(".SA") else papel
+        preco_atual = precos.get(ticker)
+        if preco_atual:
+            df.at[idx, "Preço Atual"] = preco_atual
+            df.at[idx, "Valor Atual"] = round(row["Quantidade"] * preco_atual, 2)
+            if row["Total Investido"] > 0:
+                rentabilidade = ((df.at[idx, "Valor Atual"] - row["Total Investido"]) / row["Total Investido"]) * 100
+                df.at[idx, "Rentabilidade"] = round(rentabilidade, 2)
+    return df
+
+
+class TestAplicarCotacoes(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        n = 2000
+        self.df = pd.DataFrame({
+            "Papel": [f"P{i:04d}" if i % 7 else f"P{i:04d}.SA" for i in range(n)],
+            "Quantidade": rng.integers(0, 1000, n),
+            "Total Investido": np.where(rng.random(n) < 0.1, 0.0, rng.uniform(10, 50000, n).round(2)),
+            "Preço Atual": np.nan,
+            "Valor Atual": 0,
+            "Rentabilidade": 0.0,
+        })
+        tickers = tickers_da_carteira(self.df)
+        self.precos = {t: round(float(p), 2) for t, p in zip(tickers, rng.uniform(1, 200, n)) if p > 20}
+
+    def test_resultado_identico_ao_loop(self):
+        esperado = _referencia(self.df, self.precos)
+        obtido = aplicar_cotacoes(self.df.copy(), self.precos)
+        for coluna in ["Preço Atual", "Valor Atual", "Rentabilidade"]:
+            np.testing.assert_array_equal(obtido[coluna].to_numpy(), esperado[coluna].to_numpy())
+
+    def test_total_investido_zero_mantem_rentabilidade(self):
+        df = pd.DataFrame({"Papel": ["ABCD3"], "Quantidade": [10], "Total Investido": [0.0],
+                           "Preço Atual": [np.nan], "Valor Atual": [0], "Rentabilidade": [0.0]})
+        aplicar_cotacoes(df, {"ABCD3.SA": 12.5})
+        self.assertEqual(df.at[0, "Valor Atual"], 125.0)
+        self.assertEqual(df.at[0, "Rentabilidade"], 0.0)
+
+    def test_parcial_so_altera_linhas_recebidas(self):
+        precos = dict(list(self.precos.items())[:50])
+        esperado = aplicar_cotacoes(self.df.copy(), precos)
+        obtido = self.df.copy()
+        linhas = aplicar_cotacoes_parciais(obtido, precos)
+
+        self.assertEqual(len(linhas), 50)
+        self.assertTrue(tickers_da_carteira(obtido).iloc[linhas].isin(list(precos)).all())
+        for coluna in ["Preço Atual", "Valor Atual", "Rentabilidade"]:
+            np.testing.assert_array_equal(obtido[coluna].to_numpy(), esperado[coluna].to_numpy())
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.snapshot = os.path.join(self.tmp.name, "dados.arrow")
+        self.json = os.path.join(self.tmp.name, "dados.json")
+        self.diario = os.path.join(self.tmp.name, "diario.jsonl")
+        self.df = pd.DataFrame({
+            "Papel": ["PETR4", "VALE3"], "Empresa": ["Petrobras", None],
+            "Preço Médio": [30.5, 60.0], "Quantidade": ["10", 5], "Total Investido": [305.0, 300.0],
+            "Dividendos": [12.0, "-"], "Dividendos/Ação": [1.2, np.nan],
+        })
+
+    def test_ida_e_volta_com_tipos_e_metadados(self):
+        salvar_snapshot(self.df, self.snapshot, metadados={"seq_diario": 12})
+        lido = ler_snapshot(self.snapshot)
+        self.assertEqual(lido["Quantidade"].tolist(), [10, 5])
+        self.assertEqual(lido["Quantidade"].dtype, np.int64)
+        self.assertTrue(np.isnan(lido.at[1, "Dividendos"]))
+        self.assertTrue(pd.isna(lido.at[1, "Empresa"]))
+        self.assertEqual(lido.attrs["seq_diario"], 12)
+
+    def test_versao_desconhecida_e_recusada(self):
+        with mock.patch("dados.VERSAO_SNAPSHOT", 99):
+            salvar_snapshot(self.df, self.snapshot)
+        with self.assertRaises(ValueError):
+            ler_snapshot(self.snapshot)
+
+    def test_importa_json_antigo_na_primeira_carga(self):
+        exportar_json(self.df, self.json)
+        df = carregar_dados(self.snapshot, self.json, self.diario)
+        self.assertTrue(os.path.exists(self.snapshot))
+        self.assertEqual(df["Papel"].tolist(), ["PETR4", "VALE3"])
+        self.assertEqual(df.at[0, "PT Bazin"], 20.0)
+
+        os.remove(self.json)
+        self.assertEqual(carregar_dados(self.snapshot, self.json, self.diario)["Papel"].tolist(), ["PETR4", "VALE3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
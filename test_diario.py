@@ -0,0 +1,100 @@
+
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from dados import salvar_snapshot, ler_carteira
+from diario import DiarioCarteira, ler_registros
+
+
+class TestDiarioCarteira(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.snapshot = os.path.join(self.tmp.name, "dados.arrow")
+        self.caminho = os.path.join(self.tmp.name, "diario.jsonl")
+        salvar_snapshot(pd.DataFrame({
+            "Papel": ["PETR4", "VALE3"], "Empresa": ["Petrobras", "Vale"],
+            "Preço Médio": [30.0, 60.0], "Quantidade": [10, 5], "Total Investido": [300.0, 300.0],
+        }), self.snapshot)
+
+    def novo_diario(self, **kwargs):
+        diario = DiarioCarteira(self.caminho, self.snapshot, **kwargs)
+        self.addCleanup(diario.fechar)
+        return diario
+
+    def test_edicoes_alteram_no_lugar_e_sobrevivem_a_queda(self):
+        diario = self.novo_diario()
+        df = diario.carregar()
+        diario.adicionar(df, {"Papel": "ITSA4", "Empresa": "Itaúsa", "Preço Médio": 9.0,
+                              "Quantidade": 100, "Total Investido": 900.0})
+        diario.atualizar(df, "PETR4", Quantidade=20, **{"Total Investido": 600.0})
+        diario.remover(df, "VALE3")
+        self.assertEqual(df["Papel"].tolist(), ["PETR4", "ITSA4"])
+        self.assertEqual(df.loc[df["Papel"] == "PETR4", "Quantidade"].item(), 20)
+
+        # Sem fechar nem compactar: um novo processo lê snapshot + diário
+        recarregado = ler_carteira(self.snapshot, caminho_diario=self.caminho)
+        self.assertEqual(recarregado["Papel"].tolist(), ["PETR4", "ITSA4"])
+        self.assertEqual(recarregado.loc[recarregado["Papel"] == "ITSA4", "Total Investido"].item(), 900.0)
+        self.assertEqual(recarregado.attrs["seq_diario"], 3)
+
+    def test_recusa_papel_repetido_ou_vazio(self):
+        diario = self.novo_diario()
+        df = diario.carregar()
+        for papel in ["PETR4", "", "  "]:
+            with self.assertRaises(ValueError):
+                diario.adicionar(df, {"Papel": papel, "Quantidade": 1, "Preço Médio": 1.0})
+        self.assertEqual(df["Papel"].tolist(), ["PETR4", "VALE3"])
+        self.assertEqual(df.loc[df["Papel"] == "PETR4", "Quantidade"].item(), 10)
+        self.assertEqual(ler_registros(self.caminho), [])
+
+        diario.remover(df, "PETR4")
+        diario.adicionar(df, {"Papel": "PETR4", "Quantidade": 1, "Preço Médio": 1.0})
+        self.assertEqual(df["Papel"].tolist(), ["VALE3", "PETR4"])
+        self.assertEqual(diario.rotulo("PETR4"), 2)
+
+    def test_compactacao_em_segundo_plano(self):
+        diario = self.novo_diario(limite_compactacao=3)
+        df = diario.carregar()
+        for i in range(5):
+            diario.adicionar(df, {"Papel": f"NOVO{i}", "Quantidade": i, "Preço Médio": 1.0})
+        diario.fechar()
+
+        self.assertEqual(len(ler_registros(self.caminho)), 2)
+        self.assertFalse(os.path.exists(self.caminho + ".compactando"))
+        recarregado = ler_carteira(self.snapshot, caminho_diario=self.caminho)
+        self.assertEqual(len(recarregado), 7)
+        self.assertEqual(recarregado["Papel"].tolist()[-1], "NOVO4")
+
+    def test_reaplicar_e_idempotente(self):
+        diario = self.novo_diario()
+        df = diario.carregar()
+        diario.adicionar(df, {"Papel": "ITSA4", "Quantidade": 100, "Preço Médio": 9.0})
+        # Snapshot gravado sem a marca de sequência: o diário inteiro é reaplicado por cima
+        salvar_snapshot(df, self.snapshot)
+        recarregado = ler_carteira(self.snapshot, caminho_diario=self.caminho)
+        self.assertEqual(recarregado["Papel"].tolist(), ["PETR4", "VALE3", "ITSA4"])
+
+    def test_linha_incompleta_e_ignorada(self):
+        diario = self.novo_diario()
+        df = diario.carregar()
+        diario.remover(df, "VALE3")
+        diario.fechar()
+        with open(self.caminho, "a", encoding="utf-8") as f:
+            f.write('{"seq": 2, "op": "rem')
+        recarregado = ler_carteira(self.snapshot, caminho_diario=self.caminho)
+        self.assertEqual(recarregado["Papel"].tolist(), ["PETR4"])
+        self.assertEqual(recarregado.attrs["seq_diario"], 1)
+
+        # O próximo registro não se mistura com a linha quebrada
+        diario = self.novo_diario()
+        df = diario.carregar()
+        diario.remover(df, "PETR4")
+        self.assertEqual(len(ler_registros(self.caminho)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
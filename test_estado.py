@@ -0,0 +1,83 @@
+import threading
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from dados import aplicar_cotacoes_parciais
+from diario import aplicar_registro
+from estado import EstadoCarteira
+
+
+def carteira():
+    return pd.DataFrame({
+        "Papel": ["PETR4", "VALE3", "ITSA4"],
+        "Quantidade": [10, 5, 100],
+        "Total Investido": [300.0, 300.0, 900.0],
+        "Preço Atual": [np.nan, np.nan, np.nan],
+        "Valor Atual": [0.0, 0.0, 0.0],
+        "Rentabilidade": [0.0, 0.0, 0.0],
+    })
+
+
+class TestEstadoCarteira(unittest.TestCase):
+    def test_versao_antiga_nao_muda(self):
+        estado = EstadoCarteira(carteira())
+        antiga = estado.atual
+
+        linhas = estado.alterar(lambda df: aplicar_cotacoes_parciais(df, {"VALE3.SA": 70.0}))
+        estado.alterar(lambda df: aplicar_registro(df, {"op": "remover", "papel": "ITSA4"}))
+
+        self.assertEqual(list(linhas), [1])
+        self.assertEqual(estado.versao, 2)
+        self.assertEqual(estado.df.at[1, "Valor Atual"], 350.0)
+        self.assertEqual(list(estado.df["Papel"]), ["PETR4", "VALE3"])
+        # Quem ainda lê a versão antiga continua com ela inteira
+        self.assertEqual(antiga.versao, 0)
+        self.assertTrue(antiga.df["Preço Atual"].isna().all())
+        self.assertEqual(len(antiga.df), 3)
+
+    def test_falha_mantem_versao_publicada(self):
+        estado = EstadoCarteira(carteira())
+
+        def falhar(df):
+            df.loc[0, "Quantidade"] = 999
+            raise ValueError("erro no meio da alteração")
+
+        with self.assertRaises(ValueError):
+            estado.alterar(falhar)
+        self.assertEqual(estado.versao, 0)
+        self.assertEqual(estado.df.at[0, "Quantidade"], 10)
+
+    def test_leitores_sempre_veem_versao_consistente(self):
+        # O escritor muda duas colunas que devem andar juntas; nenhum leitor
+        # pode ver uma sem a outra
+        estado = EstadoCarteira(pd.DataFrame({"a": np.zeros(1000), "b": np.zeros(1000)}))
+        parar = threading.Event()
+        inconsistentes = []
+
+        def ler():
+            while not parar.is_set():
+                df = estado.df
+                if not (df["a"].to_numpy() == df["b"].to_numpy()).all():
+                    inconsistentes.append(1)
+
+        def escrever(df, i):
+            df["a"] = float(i)
+            df.iloc[:, df.columns.get_loc("b")] = float(i)
+
+        leitores = [threading.Thread(target=ler) for _ in range(3)]
+        for t in leitores:
+            t.start()
+        for i in range(1, 300):
+            estado.alterar(lambda df: escrever(df, i))
+        parar.set()
+        for t in leitores:
+            t.join()
+
+        self.assertEqual(inconsistentes, [])
+        self.assertEqual(estado.versao, 299)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+from graficos import GraficosCarteira, CacheImagensGraficos, agregar_top_n, OUTROS
+
+
+def carteira():
+    return pd.DataFrame({
+        "Papel": ["PETR4", "VALE3", "ITSA4"],
+        "Rentabilidade": [5.0, -2.0, np.nan],
+        "Valor Atual": [100.0, 300.0, 0.0],
+    })
+
+
+class TestGraficosCarteira(unittest.TestCase):
+    def test_atualiza_no_lugar_e_evita_redesenho(self):
+        graficos = GraficosCarteira()
+        df = carteira()
+        self.assertTrue(graficos.atualizar(df))
+        barras = list(graficos._barras)
+        fatias = list(graficos._fatias[0])
+        self.assertFalse(graficos.atualizar(df.copy()))
+
+        df.loc[0, "Rentabilidade"] = 8.0
+        df.loc[2, "Valor Atual"] = 100.0
+        self.assertTrue(graficos.atualizar(df))
+        self.assertEqual(list(graficos._barras), barras)
+        self.assertEqual(list(graficos._fatias[0]), fatias)
+        self.assertEqual([b.get_height() for b in barras], [8.0, -2.0, 0.0])
+
+    def test_fatias_iguais_ao_pie_do_matplotlib(self):
+        graficos = GraficosCarteira()
+        df = carteira()
+        graficos.atualizar(df)
+        referencia = Figure().add_subplot(111).pie(df["Valor Atual"], labels=df["Papel"], autopct='%1.1f%%')
+        wedges, textos, autotextos = referencia
+        fatias, rotulos, percentuais = graficos._fatias
+        for nova, ref in zip(fatias, wedges):
+            self.assertAlmostEqual(nova.theta1, ref.theta1)
+            self.assertAlmostEqual(nova.theta2, ref.theta2)
+        for novo, ref in zip(list(rotulos) + list(percentuais), list(textos) + list(autotextos)):
+            np.testing.assert_allclose(novo.get_position(), ref.get_position(), atol=1e-9)
+            self.assertEqual(novo.get_text(), ref.get_text())
+
+    def test_carteira_sem_valor(self):
+        graficos = GraficosCarteira()
+        df = carteira()
+        df["Valor Atual"] = 0.0
+        graficos.atualizar(df)
+        self.assertTrue(graficos._aviso.get_visible())
+        self.assertFalse(any(f.get_visible() for f in graficos._fatias[0]))
+
+
+class TestTopN(unittest.TestCase):
+    def test_agrega_o_restante_em_outros(self):
+        papeis = ["A", "B", "C", "D"]
+        rentabilidade = np.array([10.0, 1.0, 20.0, 4.0])
+        valor = np.array([50.0, 10.0, 100.0, 30.0])
+        novos_papeis, nova_rent, novo_valor = agregar_top_n(papeis, rentabilidade, valor, 2)
+        self.assertEqual(novos_papeis, ["A", "C", OUTROS])
+        np.testing.assert_allclose(novo_valor, [50.0, 100.0, 40.0])
+        self.assertAlmostEqual(nova_rent[-1], (1.0 * 10 + 4.0 * 30) / 40)
+
+    def test_carteira_grande_desenha_no_maximo_n_mais_um(self):
+        n = 2000
+        df = pd.DataFrame({"Papel": [f"P{i}" for i in range(n)],
+                           "Rentabilidade": np.linspace(-5, 5, n), "Valor Atual": np.arange(n, dtype=float)})
+        graficos = GraficosCarteira(limite=10)
+        graficos.atualizar(df)
+        self.assertEqual(len(graficos._barras), 11)
+        self.assertEqual(len(graficos._fatias[0]), 11)
+
+
+class TestCacheImagensGraficos(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_reaproveita_imagem_pelo_hash_dos_dados(self):
+        cache = CacheImagensGraficos(diretorio=self.tmp.name)
+        df = carteira()
+        imagens = cache.renderizar(df)
+        self.assertTrue(imagens["rentabilidade"].startswith(b"\x89PNG"))
+        self.assertTrue(imagens["distribuicao"].startswith(b"\x89PNG"))
+        self.assertIs(cache.renderizar(df.copy()), imagens)
+        self.assertEqual(cache.renderizacoes, 1)
+
+        df.loc[0, "Valor Atual"] = 150.0
+        cache.renderizar(df)
+        self.assertEqual(cache.renderizacoes, 2)
+
+        # Outra instância (outro processo) lê do disco sem renderizar
+        outro = CacheImagensGraficos(diretorio=self.tmp.name)
+        self.assertEqual(outro.renderizar(df), cache.renderizar(df))
+        self.assertEqual(outro.renderizacoes, 0)
+
+    def test_pedidos_iguais_em_andamento_sao_compartilhados(self):
+        cache = CacheImagensGraficos(diretorio=None)
+        df = carteira()
+        futuros = [cache.renderizar_em_segundo_plano(df) for _ in range(5)]
+        resultados = [f.result() for f in futuros]
+        self.assertEqual(cache.renderizacoes, 1)
+        self.assertTrue(all(r is resultados[0] for r in resultados))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+import numpy as np
+
+from historico import HistoricoPrecos
+from provedores import ProvedorReplay
+
+
+class TestHistoricoPrecos(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.provedor = ProvedorReplay(semente=2)
+        self.hoje = date(2024, 3, 15)  # sexta-feira
+
+    def novo(self):
+        return HistoricoPrecos(self.tmp.name, self.provedor, dias_iniciais=60)
+
+    def test_primeira_carga_e_consulta_sem_provedor(self):
+        historico = self.novo()
+        historico.atualizar("PETR4.SA", hoje=self.hoje)
+        self.assertEqual(self.provedor.chamadas_historico, 1)
+
+        chamadas = self.provedor.chamadas_historico
+        fatia = historico.consultar("PETR4.SA", date(2024, 3, 1), date(2024, 3, 8))
+        self.assertEqual(list(fatia["data"].astype(str)),
+                         ["2024-03-01", "2024-03-04", "2024-03-05", "2024-03-06", "2024-03-07", "2024-03-08"])
+        self.assertEqual(self.provedor.chamadas_historico, chamadas)
+
+    def test_so_busca_o_intervalo_que_falta(self):
+        historico = self.novo()
+        historico.atualizar("VALE3.SA", hoje=self.hoje)
+        intervalos = []
+        original = self.provedor.buscar_historico
+
+        def registrar(ticker, inicio, fim):
+            intervalos.append((inicio, fim))
+            return original(ticker, inicio, fim)
+
+        self.provedor.buscar_historico = registrar
+        # Segunda-feira seguinte: busca de sexta (ainda aberta) até hoje
+        segunda = self.hoje + timedelta(days=3)
+        historico.atualizar("VALE3.SA", hoje=segunda)
+        self.assertEqual(intervalos, [(self.hoje, segunda)])
+
+        # Na mesma segunda, só o dia corrente é buscado de novo
+        intervalos.clear()
+        historico.atualizar("VALE3.SA", hoje=segunda)
+        self.assertEqual(intervalos, [(segunda, segunda)])
+
+        # Pedido anterior ao início coberto só busca o trecho mais antigo
+        intervalos.clear()
+        primeiro = historico.intervalo_coberto("VALE3.SA")[0]
+        historico.atualizar("VALE3.SA", inicio=primeiro - timedelta(days=10), fim=primeiro, hoje=segunda)
+        self.assertEqual(intervalos, [(primeiro - timedelta(days=10), primeiro - timedelta(days=1))])
+
+    def test_incremental_igual_a_carga_unica(self):
+        incremental = self.novo()
+        dia = self.hoje - timedelta(days=30)
+        while dia <= self.hoje:
+            incremental.atualizar("ITSA4.SA", hoje=dia)
+            dia += timedelta(days=1)
+
+        outro_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(outro_dir.cleanup)
+        unico = HistoricoPrecos(outro_dir.name, ProvedorReplay(semente=2), dias_iniciais=60)
+        unico.atualizar("ITSA4.SA", inicio=incremental.intervalo_coberto("ITSA4.SA")[0], hoje=self.hoje)
+        np.testing.assert_array_equal(incremental.consultar("ITSA4.SA"), unico.consultar("ITSA4.SA"))
+        datas = incremental.consultar("ITSA4.SA")["data"]
+        self.assertTrue(np.all(np.diff(datas.astype(np.int64)) > 0))
+
+    def test_resposta_vazia_nao_marca_cobertura(self):
+        historico = self.novo()
+        original = self.provedor.buscar_historico
+        self.provedor.buscar_historico = lambda ticker, inicio, fim: original(ticker, inicio, fim).iloc[:0]
+        self.assertEqual(historico.atualizar("WEGE3.SA", hoje=self.hoje), 0)
+        self.assertIsNone(historico.intervalo_coberto("WEGE3.SA"))
+
+        # Provedor de volta: o mesmo intervalo é pedido de novo e preenchido
+        self.provedor.buscar_historico = original
+        historico.atualizar("WEGE3.SA", hoje=self.hoje)
+        self.assertEqual(historico.intervalo_coberto("WEGE3.SA"),
+                         (self.hoje - timedelta(days=60), self.hoje - timedelta(days=1)))
+
+        # Um trecho novo vazio não avança o fim da cobertura
+        self.provedor.buscar_historico = lambda ticker, inicio, fim: original(ticker, inicio, fim).iloc[:0]
+        historico.atualizar("WEGE3.SA", hoje=self.hoje + timedelta(days=7))
+        self.assertEqual(historico.intervalo_coberto("WEGE3.SA")[1], self.hoje - timedelta(days=1))
+
+    def test_fim_de_semana_vazio_nao_e_pedido_de_novo(self):
+        historico = self.novo()
+        sabado, domingo = self.hoje + timedelta(days=1), self.hoje + timedelta(days=2)
+        historico.atualizar("ITSA4.SA", hoje=sabado)
+        self.assertEqual(historico.intervalo_coberto("ITSA4.SA")[1], self.hoje)
+
+        intervalos = []
+        original = self.provedor.buscar_historico
+
+        def registrar(ticker, inicio, fim):
+            intervalos.append((inicio, fim))
+            return original(ticker, inicio, fim)
+
+        self.provedor.buscar_historico = registrar
+        historico.atualizar("ITSA4.SA", hoje=domingo)
+        self.assertEqual(historico.intervalo_coberto("ITSA4.SA")[1], sabado)
+        intervalos.clear()
+        historico.atualizar("ITSA4.SA", hoje=domingo)
+        self.assertEqual(intervalos, [(domingo, domingo)])
+
+    def test_persistencia_e_variacao(self):
+        self.novo().atualizar("BBAS3.SA", hoje=self.hoje)
+        chamadas = self.provedor.chamadas_historico
+        reaberto = self.novo()
+        self.assertEqual(len(reaberto.consultar("BBAS3.SA")), len(self.novo().consultar("BBAS3.SA")))
+        fechamentos = reaberto.consultar("BBAS3.SA")["fechamento"]
+        self.assertEqual(reaberto.variacao("BBAS3.SA"), round((fechamentos[-1] / fechamentos[-2] - 1) * 100, 2))
+        self.assertEqual(self.provedor.chamadas_historico, chamadas)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "BBAS3.SA.npy")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from perfil_inicializacao import PerfilInicializacao
+
+
+class TestPerfilInicializacao(unittest.TestCase):
+    def test_mede_imports_e_marcos(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "modulo_perfil_filho.py"), "w", encoding="utf-8") as f:
+                f.write("X = 1\n")
+            with open(os.path.join(tmp, "modulo_perfil_pai.py"), "w", encoding="utf-8") as f:
+                f.write("import modulo_perfil_filho\n")
+            sys.path.insert(0, tmp)
+            perfil = PerfilInicializacao(ativo=True)
+            try:
+                import modulo_perfil_pai  # noqa: F401
+                perfil.marcar("primeira_tabela_visivel")
+            finally:
+                perfil.desinstalar()
+                sys.path.remove(tmp)
+                sys.modules.pop("modulo_perfil_pai", None)
+                sys.modules.pop("modulo_perfil_filho", None)
+
+        acumulado_pai, proprio_pai = perfil.imports["modulo_perfil_pai"]
+        acumulado_filho, _ = perfil.imports["modulo_perfil_filho"]
+        self.assertGreaterEqual(acumulado_pai, acumulado_filho)
+        self.assertAlmostEqual(proprio_pai, acumulado_pai - acumulado_filho)
+        texto = perfil.relatorio()
+        self.assertIn("modulo_perfil_pai", texto)
+        self.assertIn("primeira_tabela_visivel", texto)
+
+    def test_inativo_nao_instala(self):
+        perfil = PerfilInicializacao()
+        perfil.marcar("x")
+        self.assertEqual(perfil.marcos, [])
+        self.assertNotIn(perfil._localizador, sys.meta_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
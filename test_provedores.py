@@ -0,0 +1,49 @@
+
+import os
+import tempfile
+import unittest
+
+from provedores import ProvedorReplay, GravadorCotacoes, ErroProvedor, salvar_series
+
+
+class TestProvedorReplay(unittest.TestCase):
+    def test_serie_sintetica_deterministica(self):
+        primeiro = ProvedorReplay(semente=3)
+        segundo = ProvedorReplay(semente=3)
+        for _ in range(5):
+            self.assertEqual(primeiro.buscar("PETR4.SA")["preco"], segundo.buscar("PETR4.SA")["preco"])
+        self.assertNotEqual(ProvedorReplay(semente=4).buscar("PETR4.SA")["preco"],
+                            ProvedorReplay(semente=3).buscar("PETR4.SA")["preco"])
+
+    def test_reproduz_serie_gravada(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            caminho = os.path.join(tmp, "series.json")
+            salvar_series(caminho, {"VALE3.SA": [60.0, 66.0]})
+            provedor = ProvedorReplay(caminho)
+            self.assertEqual(provedor.buscar("VALE3.SA")["preco"], 60.0)
+            self.assertEqual(provedor.buscar("VALE3.SA"), {"preco": 66.0, "variacao": 10.0})
+            self.assertEqual(provedor.buscar("VALE3.SA")["preco"], 60.0)
+
+    def test_taxa_de_falhas(self):
+        provedor = ProvedorReplay(taxa_falhas=0.3, semente=1)
+        tickers = [f"T{i}.SA" for i in range(1000)]
+        lote = provedor.buscar_lote(tickers)
+        self.assertTrue(600 < len(lote) < 800)
+        falhou = next(t for t in tickers if t not in lote)
+        with self.assertRaises(ErroProvedor):
+            ProvedorReplay(taxa_falhas=0.3, semente=1).buscar(falhou)
+
+    def test_gravador_alimenta_o_replay(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            caminho = os.path.join(tmp, "gravado.json")
+            origem = ProvedorReplay(semente=9)
+            gravador = GravadorCotacoes(origem, caminho)
+            precos = [gravador.buscar_lote(["ITSA4.SA"])["ITSA4.SA"]["preco"] for _ in range(3)]
+            gravador.salvar()
+
+            replay = ProvedorReplay(caminho)
+            self.assertEqual([replay.buscar("ITSA4.SA")["preco"] for _ in range(3)], precos)
+
+
+if __name__ == "__main__":
+    unittest.main()
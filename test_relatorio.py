@@ -0,0 +1,65 @@
+import os
+import re
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import graficos
+from benchmark import gerar_carteira
+from graficos import CacheImagensGraficos
+from relatorio import gerar_pdf, ExportacaoPDF
+
+
+def contar_paginas(caminho):
+    with open(caminho, "rb") as f:
+        return len(re.findall(rb"/Type /Page[^s]", f.read()))
+
+
+class TestRelatorio(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.caminho = os.path.join(self.tmp.name, "relatorio.pdf")
+
+    def test_paginacao_e_progresso(self):
+        chamadas = []
+        # 36 linhas na primeira página e 38 nas seguintes
+        gerar_pdf(gerar_carteira(36 + 38 + 1), self.caminho, progresso=lambda f, t: chamadas.append((f, t)))
+        self.assertEqual(contar_paginas(self.caminho), 3)
+        self.assertEqual(chamadas, [(36, 75), (74, 75), (75, 75)])
+        self.assertEqual([n for n in os.listdir(self.tmp.name)], ["relatorio.pdf"])
+
+    def test_cancelamento_nao_grava_arquivo(self):
+        cancelar = threading.Event()
+        cancelar.set()
+        self.assertIsNone(gerar_pdf(gerar_carteira(100), self.caminho, cancelar=cancelar))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_exportacao_em_segundo_plano(self):
+        exportacao = ExportacaoPDF(gerar_carteira(200), self.caminho, com_graficos=False).iniciar()
+        self.assertTrue(exportacao.aguardar(30))
+        self.assertIsNone(exportacao.erro)
+        self.assertEqual(exportacao.caminho, self.caminho)
+        self.assertEqual(exportacao.progresso, 1.0)
+        self.assertTrue(os.path.exists(self.caminho))
+
+    def test_erro_fica_registrado(self):
+        exportacao = ExportacaoPDF(gerar_carteira(10), os.path.join(self.tmp.name, "nao", "existe.pdf"),
+                                   com_graficos=False)
+        exportacao.iniciar().aguardar(30)
+        self.assertIsNotNone(exportacao.erro)
+        self.assertIsNone(exportacao.caminho)
+
+    def test_pagina_de_graficos_do_cache(self):
+        cache = CacheImagensGraficos(diretorio=None)
+        with mock.patch.object(graficos, "_cache_padrao", cache):
+            exportacao = ExportacaoPDF(gerar_carteira(10), self.caminho).iniciar()
+            self.assertTrue(exportacao.aguardar(60))
+        self.assertIsNone(exportacao.erro)
+        self.assertEqual(cache.renderizacoes, 1)
+        self.assertEqual(contar_paginas(self.caminho), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from datetime import date
+from unittest import mock
+
+from armazenamento import ArmazenamentoMemoria
+from cotacoes import CotacaoCache, criar_cache
+from provedores import ErroProvedor, ProvedorReplay
+from servidor_cotacoes import ProvedorServidor, ServidorCotacoes, interpretar_endereco
+
+
+class _BaseServidor(unittest.TestCase):
+    def novo_servidor(self, endereco="127.0.0.1:0", **opcoes):
+        self.provedor = ProvedorReplay(latencia_lote=0.05)
+        cache = CotacaoCache(armazenamento=ArmazenamentoMemoria(), provedor=self.provedor)
+        servidor = ServidorCotacoes(cache, endereco=endereco, com_agendador=False, **opcoes).iniciar()
+        self.addCleanup(servidor.parar)
+        return servidor
+
+    def novo_cliente(self, servidor):
+        provedor = ProvedorServidor(servidor.endereco, timeout=5)
+        self.addCleanup(provedor.fechar)
+        return CotacaoCache(armazenamento=ArmazenamentoMemoria(), provedor=provedor, fallback_individual=False)
+
+
+class TestServidorCotacoes(_BaseServidor):
+    def test_carga_no_provedor_nao_cresce_com_os_clientes(self):
+        servidor = self.novo_servidor()
+        tickers = [f"T{i:02d}3.SA" for i in range(20)]
+        clientes = [self.novo_cliente(servidor) for _ in range(4)]
+        resultados = [None] * len(clientes)
+
+        def pedir(i):
+            resultados[i] = clientes[i].obter_cotacoes(tickers)
+
+        threads = [threading.Thread(target=pedir, args=(i,)) for i in range(len(clientes))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(self.provedor.chamadas, len(tickers))
+        for resultado in resultados:
+            self.assertEqual(resultado, resultados[0])
+            self.assertEqual(set(resultado), set(tickers))
+
+    def test_historico_pelo_servidor(self):
+        servidor = self.novo_servidor()
+        cliente = ProvedorServidor(servidor.endereco, timeout=5)
+        self.addCleanup(cliente.fechar)
+
+        obtido = cliente.buscar_historico("PETR4.SA", date(2024, 3, 1), date(2024, 3, 8))
+        esperado = ProvedorReplay().buscar_historico("PETR4.SA", date(2024, 3, 1), date(2024, 3, 8))
+        self.assertEqual(list(obtido.index), list(esperado.index))
+        self.assertEqual(obtido["Close"].tolist(), esperado["Close"].tolist())
+
+    def test_assinatura_recebe_atualizacoes(self):
+        servidor = self.novo_servidor()
+        cliente = ProvedorServidor(servidor.endereco, timeout=5)
+        self.addCleanup(cliente.fechar)
+        recebidas = []
+        chegou = threading.Event()
+        cliente.assinar(["PETR4.SA"], lambda cotacoes: (recebidas.append(cotacoes), chegou.set()))
+
+        self.assertEqual(servidor.pesos(), {"PETR4.SA": 1})
+        servidor.publicar(["PETR4.SA", "VALE3.SA"])
+        self.assertTrue(chegou.wait(5))
+        self.assertEqual(list(recebidas[0]), ["PETR4.SA"])
+
+    def test_erro_e_servidor_fora_do_ar(self):
+        servidor = self.novo_servidor()
+        cliente = ProvedorServidor(servidor.endereco, timeout=5)
+        self.addCleanup(cliente.fechar)
+        with self.assertRaises(ErroProvedor):
+            cliente._pedir({"op": "inexistente"})
+
+        with socket.socket() as livre:
+            livre.bind(("127.0.0.1", 0))
+            porta = livre.getsockname()[1]
+        self.assertFalse(ProvedorServidor(f"127.0.0.1:{porta}", timeout=1).disponivel())
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "sem sockets Unix")
+    def test_socket_unix(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        caminho = os.path.join(tmp.name, "cotacoes.sock")
+        self.assertEqual(interpretar_endereco(caminho), (socket.AF_UNIX, caminho))
+
+        servidor = self.novo_servidor(endereco=caminho)
+        cliente = self.novo_cliente(servidor)
+        self.assertIn("PETR4.SA", cliente.obter_cotacoes(["PETR4.SA"]))
+
+    def test_criar_cache_em_modo_cliente(self):
+        servidor = self.novo_servidor()
+        with mock.patch("cotacoes.USAR_SERVIDOR_COTACOES", True), \
+                mock.patch("cotacoes.ENDERECO_SERVIDOR_COTACOES", servidor.endereco):
+            cache = criar_cache()
+        self.addCleanup(cache.provedor.fechar)
+        self.assertIsInstance(cache.provedor, ProvedorServidor)
+        self.assertFalse(cache.fallback_individual)
+        self.assertFalse(cache.stale_while_revalidate)
+        cache.obter_cotacoes(["PETR4.SA"])
+        self.assertEqual(self.provedor.chamadas, 1)
+
+    def test_criar_cache_servindo_vencidas(self):
+        servidor = self.novo_servidor()
+        with mock.patch("cotacoes.USAR_SERVIDOR_COTACOES", True), \
+                mock.patch("cotacoes.ENDERECO_SERVIDOR_COTACOES", servidor.endereco), \
+                mock.patch("cotacoes.SERVIR_COTACOES_VENCIDAS", True):
+            cache = criar_cache()
+        self.addCleanup(cache.provedor.fechar)
+        self.assertTrue(cache.stale_while_revalidate)
+
+
+if __name__ == "__main__":
+    unittest.main()
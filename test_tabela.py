@@ -0,0 +1,189 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from tabela import TabelaIncremental, JanelaVirtual, calcular_tags, chaves_linhas, fatia_pagina
+
+
+class TreeviewFalso:
+    # Imita a parte do ttk.Treeview usada pela TabelaIncremental e conta as chamadas
+    def __init__(self):
+        self.itens = {}
+        self.ordem = []
+        self.chamadas = []
+
+    def insert(self, pai, indice, iid, values, tags):
+        self.chamadas.append(("insert", iid))
+        self.itens[iid] = (tuple(values), tuple(tags))
+        self.ordem.insert(indice, iid)
+
+    def item(self, iid, values, tags):
+        self.chamadas.append(("item", iid))
+        self.itens[iid] = (tuple(values), tuple(tags))
+
+    def delete(self, *iids):
+        self.chamadas.append(("delete",) + iids)
+        for iid in iids:
+            del self.itens[iid]
+            self.ordem.remove(iid)
+
+    def move(self, iid, pai, indice):
+        self.chamadas.append(("move", iid))
+        self.ordem.remove(iid)
+        self.ordem.insert(indice, iid)
+
+    def get_children(self, pai=""):
+        return tuple(self.ordem)
+
+
+def carteira():
+    return pd.DataFrame({
+        "Papel": ["PETR4", "VALE3", "ITSA4"],
+        "Preço Atual": [30.0, 60.0, np.nan],
+        "PT Bazin": [35.0, 50.0, 10.0],
+        "Rentabilidade": [5.0, -2.0, 1.0],
+    })
+
+
+class TestTabela(unittest.TestCase):
+    def test_tags_iguais_ao_loop_original(self):
+        df = carteira()
+        esperado = []
+        for _, row in df.iterrows():
+            if not pd.isna(row["Preço Atual"]) and row["Preço Atual"] < row["PT Bazin"]:
+                esperado.append("barato")
+            else:
+                esperado.append("positivo" if row["Rentabilidade"] > 0 else "negativo")
+        self.assertEqual(list(calcular_tags(df)), esperado)
+
+    def test_chaves_repetidas(self):
+        self.assertEqual(chaves_linhas(["A", "B", "A", "A"]), ["A", "B", "A#2", "A#3"])
+
+    def test_chaves_nunca_colidem_nem_ficam_vazias(self):
+        chaves = chaves_linhas(["PETR4", "PETR4#2", "PETR4", "", "", "#"])
+        self.assertEqual(len(set(chaves)), 6)
+        self.assertNotIn("", chaves)
+        self.assertEqual(chaves[:3], ["PETR4", "PETR4##2", "PETR4#2"])
+
+    def test_papel_vazio_nao_vira_raiz(self):
+        tree = TreeviewFalso()
+        tabela = TabelaIncremental(tree, ["Papel", "Preço Atual"])
+        df = pd.DataFrame({"Papel": ["", "VALE3"], "Preço Atual": ["1", "2"]})
+        tabela.atualizar(df, ["positivo", "positivo"])
+        self.assertEqual(len(tree.get_children("")), 2)
+        self.assertNotIn("", tree.get_children(""))
+
+    def test_so_toca_linhas_alteradas(self):
+        tree = TreeviewFalso()
+        tabela = TabelaIncremental(tree, ["Papel", "Preço Atual"])
+        df = carteira()
+        self.assertEqual(tabela.atualizar(df, calcular_tags(df)), (3, 0, 0))
+
+        tree.chamadas = []
+        self.assertEqual(tabela.atualizar(df, calcular_tags(df)), (0, 0, 0))
+        self.assertEqual(tree.chamadas, [])
+
+        df.loc[1, "Preço Atual"] = 40.0
+        self.assertEqual(tabela.atualizar(df, calcular_tags(df)), (0, 1, 0))
+        self.assertEqual(tree.chamadas, [("item", "VALE3")])
+        self.assertEqual(tree.itens["VALE3"], (("VALE3", "40.0"), ("barato",)))
+
+    def test_atualiza_so_as_posicoes_recebidas(self):
+        tree = TreeviewFalso()
+        tabela = TabelaIncremental(tree, ["Papel", "Preço Atual"])
+        df = carteira()
+        tabela.atualizar(df, calcular_tags(df))
+
+        tree.chamadas = []
+        df.loc[[0, 2], "Preço Atual"] = [31.0, 1234.5678]
+        parte = df.iloc[[0, 2]]
+        self.assertEqual(tabela.atualizar_linhas([0, 2], parte, calcular_tags(parte)), 2)
+        self.assertEqual(tree.chamadas, [("item", "PETR4"), ("item", "ITSA4")])
+        # Texto mais longo que o anterior não é truncado
+        self.assertEqual(tree.itens["ITSA4"][0], ("ITSA4", "1234.5678"))
+        self.assertEqual(tabela.atualizar(df, calcular_tags(df)), (0, 0, 0))
+
+    def test_insere_e_remove_na_posicao_certa(self):
+        tree = TreeviewFalso()
+        tabela = TabelaIncremental(tree, ["Papel", "Preço Atual"])
+        df = carteira()
+        tabela.atualizar(df, calcular_tags(df))
+
+        df = pd.concat([df.iloc[:1], pd.DataFrame([{"Papel": "BBAS3", "Preço Atual": 20.0,
+                                                    "PT Bazin": 30.0, "Rentabilidade": 1.0}]),
+                        df.iloc[2:]], ignore_index=True)
+        tree.chamadas = []
+        self.assertEqual(tabela.atualizar(df, calcular_tags(df)), (1, 0, 1))
+        self.assertEqual(tree.ordem, ["PETR4", "BBAS3", "ITSA4"])
+        self.assertNotIn(("item", "PETR4"), tree.chamadas)
+
+        df = df.iloc[::-1].reset_index(drop=True)
+        tabela.atualizar(df, calcular_tags(df))
+        self.assertEqual(tree.ordem, ["ITSA4", "BBAS3", "PETR4"])
+
+    def test_acrescenta_e_remove_uma_linha(self):
+        tree = TreeviewFalso()
+        tabela = TabelaIncremental(tree, ["Papel", "Preço Atual"])
+        df = carteira()
+        tabela.atualizar(df, calcular_tags(df))
+
+        df = pd.concat([df, pd.DataFrame([{"Papel": "PETR4", "Preço Atual": 31.0, "PT Bazin": 35.0,
+                                           "Rentabilidade": 1.0}])], ignore_index=True)
+        tree.chamadas = []
+        tabela.acrescentar(df.iloc[[3]], calcular_tags(df.iloc[[3]]))
+        df = df.drop(index=1).reset_index(drop=True)
+        tabela.remover_linha(1)
+        self.assertEqual(tree.chamadas, [("insert", "PETR4#2"), ("delete", "VALE3")])
+        self.assertEqual(tree.ordem, ["PETR4", "ITSA4", "PETR4#2"])
+
+        # O estado interno continua alinhado com a carteira: nada a refazer
+        tree.chamadas = []
+        self.assertEqual(tabela.atualizar(df, calcular_tags(df)), (0, 0, 0))
+        self.assertEqual(tree.chamadas, [])
+
+
+class TestJanelaVirtual(unittest.TestCase):
+    def test_limites_da_rolagem(self):
+        janela = JanelaVirtual(linhas_visiveis=10)
+        janela.redefinir(total=100)
+        self.assertEqual(janela.fatia(), (0, 10))
+        janela.rolar(-5)
+        self.assertEqual(janela.fatia(), (0, 10))
+        janela.rolar(95)
+        self.assertEqual(janela.fatia(), (90, 100))
+        self.assertEqual(janela.fracoes(), (0.9, 1.0))
+        janela.mover_para("0.5")
+        self.assertEqual(janela.fatia(), (50, 60))
+        janela.redefinir(total=55)
+        self.assertEqual(janela.fatia(), (45, 55))
+
+    def test_carteira_menor_que_a_janela(self):
+        janela = JanelaVirtual(linhas_visiveis=10)
+        janela.redefinir(total=3)
+        janela.rolar(5)
+        self.assertEqual(janela.fatia(), (0, 3))
+
+    def test_rolagem_so_troca_linhas_que_entram_e_saem(self):
+        tree = TreeviewFalso()
+        tabela = TabelaIncremental(tree, ["Papel"])
+        df = pd.DataFrame({"Papel": [f"P{i}" for i in range(1000)], "Preço Atual": 1.0,
+                           "PT Bazin": 0.0, "Rentabilidade": 1.0})
+        janela = JanelaVirtual(linhas_visiveis=20)
+        janela.redefinir(total=len(df))
+        inicio, fim = janela.fatia()
+        tabela.atualizar(df.iloc[inicio:fim], calcular_tags(df.iloc[inicio:fim]))
+        janela.rolar(1)
+        inicio, fim = janela.fatia()
+        self.assertEqual(tabela.atualizar(df.iloc[inicio:fim], calcular_tags(df.iloc[inicio:fim])), (1, 0, 1))
+        self.assertEqual(tree.ordem, [f"P{i}" for i in range(1, 21)])
+
+    def test_fatia_pagina(self):
+        self.assertEqual(fatia_pagina(250, 1, 100), (0, 100, 3))
+        self.assertEqual(fatia_pagina(250, 3, 100), (200, 250, 3))
+        self.assertEqual(fatia_pagina(250, 9, 100), (200, 250, 3))
+        self.assertEqual(fatia_pagina(0, 1, 100), (0, 0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
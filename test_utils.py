@@ -1,6 +1,12 @@
 
 import unittest
-from utils import formatar_valores
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import utils
+from utils import formatar_valores, formatar_colunas, FormatadorValores
 
 class TestFormatarValores(unittest.TestCase):
     def test_preco_medio_formatado(self):
@@ -13,5 +19,88 @@ class TestFormatarValores(unittest.TestCase):
         self.assertTrue(resultado["Dividendos"].startswith("R$"))
         self.assertTrue(resultado["PT Bazin"].startswith("R$"))
 
+def _carteira():
+    return pd.DataFrame({
+        "Papel": ["PETR4", "VALE3", "ITSA4"],
+        "Empresa": ["Petrobras", "Vale", None],
+        "Preço Médio": [12.3456, 60.0, np.nan],
+        "Preço Atual": [10.0, np.nan, 9.999],
+        "Quantidade": [100, 5, 0],
+        "Total Investido": [1234.5, 300.0, 0.0],
+        "Valor Atual": [1000.0, 0, 0],
+        "Dividendos": [50.0, np.nan, "-"],
+        "Dividendos/Ação": [2.5, "1.2", np.nan],
+        "Rentabilidade": [-10.0, 0.0, 1234.567],
+        "PT Bazin": [41.67, np.nan, 20.0],
+    })
+
+
+class TestFormatarColunas(unittest.TestCase):
+    def test_igual_ao_formatar_valores_por_linha(self):
+        df = _carteira()
+        esperado = df.apply(formatar_valores, axis=1)
+        obtido = formatar_colunas(df)
+        self.assertEqual(list(obtido.columns), list(esperado.columns))
+        for coluna in esperado.columns:
+            self.assertEqual(obtido[coluna].tolist(), esperado[coluna].tolist(), coluna)
+
+    def test_formato_pt_br(self):
+        df = _carteira()
+        obtido = formatar_colunas(df, pt_br=True)
+        self.assertEqual(obtido.at[0, "Total Investido"], "R$ 1.234,50")
+        self.assertEqual(obtido.at[1, "Dividendos"], "R$ 0,00")
+        self.assertEqual(obtido.at[2, "Rentabilidade"], "1.234,57%")
+
+
+class TestFormatadorValores(unittest.TestCase):
+    def test_reformata_apenas_linhas_alteradas(self):
+        df = _carteira()
+        formatador = FormatadorValores()
+        formatador.formatar(df)
+
+        df.at[1, "Preço Atual"] = 61.0
+        with mock.patch.object(utils, "formatar_colunas", wraps=utils.formatar_colunas) as espiao:
+            obtido = formatador.formatar(df)
+        self.assertEqual(espiao.call_count, 1)
+        self.assertEqual(list(espiao.call_args[0][0].index), [1])
+        self.assertEqual(obtido.at[1, "Preço Atual"], "R$ 61.00")
+        self.assertEqual(obtido.at[0, "Preço Médio"], "R$ 12.35")
+
+        with mock.patch.object(utils, "formatar_colunas") as espiao:
+            formatador.formatar(df)
+        espiao.assert_not_called()
+
+    def test_linhas_removidas_e_adicionadas(self):
+        df = _carteira()
+        formatador = FormatadorValores()
+        formatador.formatar(df)
+        df = pd.concat([df.drop(index=0), _carteira().iloc[[0]].set_axis([7])])
+        obtido = formatador.formatar(df)
+        self.assertEqual(list(obtido.index), [1, 2, 7])
+        self.assertEqual(obtido.at[7, "Papel"], "PETR4")
+
+    def test_indice_repetido_nao_fica_em_cache(self):
+        df = _carteira()
+        formatador = FormatadorValores()
+        repetido = pd.concat([df.iloc[[0]], df.iloc[[1]]]).set_axis([0, 0])
+        self.assertEqual(list(formatador.formatar(repetido)["Papel"]), list(repetido["Papel"]))
+        obtido = formatador.formatar(repetido.reset_index(drop=True))
+        self.assertEqual(list(obtido.index), [0, 1])
+        self.assertEqual(obtido.at[1, "Papel"], repetido["Papel"].iloc[1])
+
+    def test_linhas_formatadas_a_parte_entram_no_cache(self):
+        df = _carteira()
+        formatador = FormatadorValores()
+        formatador.formatar(df)
+
+        df.at[2, "Preço Atual"] = 9.5
+        parte = formatador.formatar_linhas(df.iloc[[2]])
+        self.assertEqual(parte.at[2, "Preço Atual"], "R$ 9.50")
+        with mock.patch.object(utils, "formatar_colunas") as espiao:
+            obtido = formatador.formatar(df)
+        espiao.assert_not_called()
+        self.assertEqual(obtido.at[2, "Preço Atual"], "R$ 9.50")
+
+
 if __name__ == "__main__":
     unittest.main()
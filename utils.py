@@ -1,4 +1,5 @@
 
+import numpy as np
 import pandas as pd
 
 def formatar_valores(row):
@@ -13,3 +14,106 @@ def formatar_valores(row):
     row["Dividendos/Ação"] = f"R$ {pd.to_numeric(row['Dividendos/Ação'], errors='coerce'):.2f}" if pd.notna(row['Dividendos/Ação']) else "R$ 0.00"
     row["PT Bazin"] = f"R$ {row['PT Bazin']:.2f}" if pd.notna(row["PT Bazin"]) else "-"
     return row
+
+COLUNAS_MOEDA = ["Preço Médio", "Preço Atual", "Preço Teto", "Total Investido", "Valor Atual",
+                 "Dividendos", "Dividendos/Ação", "PT Bazin"]
+
+
+def _numeros(serie):
+    return pd.to_numeric(serie, errors="coerce").to_numpy(dtype=float)
+
+
+def _texto_numeros(valores, pt_br=False):
+    if not pt_br:
+        return np.char.mod("%.2f", valores).astype(object)
+    # "1,234.56" -> "1.234,56"
+    return np.array([f"{v:,.2f}".translate(_TROCA_PT_BR) for v in valores], dtype=object)
+
+
+_TROCA_PT_BR = str.maketrans({",": ".", ".": ","})
+
+
+def formatar_colunas(df, pt_br=False):
+    # Mesmo resultado de df.apply(formatar_valores, axis=1), coluna por coluna
+    saida = df.astype(object)
+    vazio = np.full(len(df), "-", dtype=object)
+    zero = "R$ 0,00" if pt_br else "R$ 0.00"
+
+    def moeda(valores):
+        return "R$ " + _texto_numeros(valores, pt_br)
+
+    for coluna in ["Preço Médio", "Total Investido", "Valor Atual"]:
+        saida[coluna] = moeda(_numeros(df[coluna]))
+
+    for coluna in ["Preço Atual", "PT Bazin"]:
+        valores = _numeros(df[coluna])
+        saida[coluna] = np.where(np.isnan(valores), vazio, moeda(valores))
+
+    if "Preço Teto" in df.columns:
+        saida["Preço Teto"] = moeda(_numeros(df["Preço Teto"]))
+    else:
+        saida["Preço Teto"] = vazio
+
+    for coluna in ["Dividendos", "Dividendos/Ação"]:
+        ausente = df[coluna].isna().to_numpy()
+        saida[coluna] = np.where(ausente, zero, moeda(_numeros(df[coluna])))
+
+    rentabilidade = _texto_numeros(_numeros(df["Rentabilidade"]), pt_br)
+    saida["Rentabilidade"] = rentabilidade + "%"
+    return saida
+
+
+class FormatadorValores:
+    # Mantém a versão formatada da carteira e só reformata as linhas cujo
+    # conteúdo mudou desde a última chamada (comparando o hash de cada linha).
+    def __init__(self, pt_br=False):
+        self.pt_br = pt_br
+        self._hashes = None
+        self._formatado = None
+
+    def formatar(self, df):
+        if not df.index.is_unique:
+            # Sem rótulos únicos não há como casar as linhas: nada fica em cache
+            self.invalidar()
+            return formatar_colunas(df, self.pt_br)
+        hashes = pd.util.hash_pandas_object(df, index=True)
+        if (self._formatado is None
+                or list(self._formatado.columns) != list(df.columns) + _colunas_extras(df)):
+            self._formatado = formatar_colunas(df, self.pt_br)
+            self._hashes = hashes
+            return self._formatado
+
+        conhecidos = hashes.index.isin(self._hashes.index)
+        iguais = np.zeros(len(df), dtype=bool)
+        iguais[conhecidos] = (hashes[conhecidos].to_numpy()
+                              == self._hashes.reindex(hashes.index[conhecidos]).to_numpy())
+        alterados = df.index[~iguais]
+
+        if len(alterados) or len(self._formatado) != len(df):
+            mantidos = self._formatado.loc[self._formatado.index.intersection(df.index[iguais])]
+            if len(alterados):
+                mantidos = pd.concat([mantidos, formatar_colunas(df.loc[alterados], self.pt_br)])
+            self._formatado = mantidos.reindex(df.index)
+        elif not self._formatado.index.equals(df.index):
+            self._formatado = self._formatado.reindex(df.index)
+        self._hashes = hashes
+        return self._formatado
+
+    def formatar_linhas(self, df):
+        # Formata só as linhas recebidas (ex.: as que ganharam cotação nova) e
+        # guarda o resultado no cache, para formatar() não refazê-las depois
+        parte = formatar_colunas(df, self.pt_br)
+        if (self._formatado is not None and df.index.is_unique
+                and list(self._formatado.columns) == list(parte.columns)
+                and df.index.isin(self._formatado.index).all()):
+            self._formatado.loc[df.index] = parte
+            self._hashes.loc[df.index] = pd.util.hash_pandas_object(df, index=True)
+        return parte
+
+    def invalidar(self):
+        self._hashes = None
+        self._formatado = None
+
+
+def _colunas_extras(df):
+    return [] if "Preço Teto" in df.columns else ["Preço Teto"]